@@ -0,0 +1,64 @@
+"""
+Helpers shared by the benchmarks: a widget whose messages are recorded rather
+than sent, and a timer.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from anywidget import AnyWidget
+
+
+@contextmanager
+def recording_widget(features=None):
+    """
+    Yield a mounted `~ipywwt.WWTWidget` and the list that the messages it
+    sends, as ``(content, buffers)`` pairs, are appended to.
+
+    By default the frontend handles all the messages that we send; pass
+    ``features=[]`` to measure the fallbacks for older frontends.
+    """
+    import ipywwt
+
+    if features is None:
+        features = sorted(ipywwt.EXTENDED_EVENTS | {"upload_start"})
+
+    sent = []
+
+    def send(self, content, buffers=None):
+        # The comm serializes the content to JSON, which is part of the cost.
+        json.dumps(content)
+        sent.append((content, buffers))
+
+    with mock.patch.object(AnyWidget, "send", send), mock.patch.object(
+        ipywwt, "load_imagery_layers"
+    ), mock.patch.object(ipywwt, "get_imagery_layers", return_value={}):
+        widget = ipywwt.WWTWidget()
+        with widget.hold_trait_notifications():
+            widget.frontend_features = features
+            widget.mounted = True
+        sent.clear()
+        yield widget, sent
+
+
+def wire_size(sent):
+    """
+    The number of bytes of the recorded messages on the wire.
+    """
+    from ipywwt.upload import message_size
+
+    return sum(message_size(content, buffers) for content, buffers in sent)
+
+
+def best_time(func, repeat=3):
+    """
+    The shortest of ``repeat`` timings of ``func()``, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
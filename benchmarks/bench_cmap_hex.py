@@ -0,0 +1,66 @@
+"""
+Benchmark of the hex colors of custom colormaps: the lookup table of
+`ipywwt.layers.cmap_hex_values` against converting every row with
+``to_hex``, as table layers used to.
+
+Usage::
+
+    python benchmarks/bench_cmap_hex.py [--rows 10000 100000 1000000]
+"""
+
+import argparse
+
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.colors import to_hex
+
+from ipywwt.layers import cmap_hex_lut, cmap_hex_values
+
+from _harness import best_time
+
+
+def hex_loop(cmap, values, vmin, vmax):
+    # The previous implementation.
+    rgb = cmap((values - vmin) / (vmax - vmin))[:, :-1]
+    return [to_hex(x) for x in rgb]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument("--cmap", default="cividis")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cmap = colormaps[args.cmap]
+    rng = np.random.default_rng(0)
+
+    # The table is built once per colormap object, outside of the timings.
+    lut_time = best_time(lambda: cmap_hex_lut(cmap.copy()), args.repeat)
+    print("lookup table for {0}: {1:.1f} ms".format(cmap.name, lut_time * 1e3))
+
+    print(
+        "{0:>10} {1:>10} {2:>10} {3:>8}".format(
+            "rows", "loop (ms)", "lut (ms)", "speedup"
+        )
+    )
+
+    for n_rows in args.rows:
+        values = rng.normal(0, 1, n_rows)
+        values[::97] = np.nan
+
+        expected = hex_loop(cmap, values, -2, 2)
+        assert cmap_hex_values(cmap, values, -2, 2).tolist() == expected
+
+        loop_time = best_time(lambda: hex_loop(cmap, values, -2, 2), args.repeat)
+        lut_time = best_time(lambda: cmap_hex_values(cmap, values, -2, 2), args.repeat)
+
+        print(
+            "{0:>10} {1:>10.1f} {2:>10.1f} {3:>7.0f}x".format(
+                n_rows, loop_time * 1e3, lut_time * 1e3, loop_time / lut_time
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Load test of the file server: concurrent clients fetching every tile of a
+local toasty pyramid, the way the WWT frontend does when a tiled image layer
+is shown.
+
+Each client fetches all the tiles once over a keep-alive connection, then
+fetches them again with ``If-None-Match``, as a browser revalidating its
+cache does. By default a pyramid is tiled from a synthetic FITS image;
+``--tiles`` serves an existing toasty output directory instead.
+
+Usage::
+
+    python benchmarks/bench_file_server.py [--clients 1 8 32] [--size 4096]
+"""
+
+import argparse
+import http.client
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from ipywwt.serve import FileServer
+
+
+def make_pyramid(tmp, size):
+    import toasty
+    from astropy.io import fits
+    from astropy.wcs import WCS
+
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [10.0, 20.0]
+    wcs.wcs.crpix = [size / 2, size / 2]
+    wcs.wcs.cdelt = [-1e-4, 1e-4]
+
+    data = np.random.default_rng(0).normal(size=(size, size)).astype(np.float32)
+    filename = os.path.join(tmp, "image.fits")
+    fits.PrimaryHDU(data, wcs.to_header()).writeto(filename)
+
+    out_dir, _ = toasty.tile_fits(
+        filename, out_dir=os.path.join(tmp, "tiles"), cli_progress=False
+    )
+    return out_dir
+
+
+def tile_paths(out_dir):
+    paths = []
+    for dirpath, _, filenames in os.walk(out_dir):
+        for name in filenames:
+            relpath = os.path.relpath(os.path.join(dirpath, name), out_dir)
+            paths.append(relpath.replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def client(base_url, paths, latencies, errors, barrier):
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    etags = {}
+    paths = random.Random(threading.get_ident()).sample(paths, len(paths))
+
+    barrier.wait()
+    for revalidate in (False, True):
+        for path in paths:
+            headers = {"If-None-Match": etags[path]} if revalidate else {}
+            start = time.perf_counter()
+            conn.request("GET", url.path + path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            latencies[revalidate].append(time.perf_counter() - start)
+
+            expected = 304 if revalidate else 200
+            if response.status != expected:
+                errors.append(response.status)
+            etags[path] = response.getheader("ETag")
+    conn.close()
+
+
+def run(base_url, paths, clients):
+    latencies = {False: [], True: []}
+    errors = []
+    barrier = threading.Barrier(clients + 1)
+    threads = [
+        threading.Thread(
+            target=client, args=(base_url, paths, latencies, errors, barrier)
+        )
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--tiles", help="an existing toasty output directory")
+    parser.add_argument("--max-connections", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.tiles:
+            out_dir = args.tiles
+        else:
+            start = time.perf_counter()
+            out_dir = make_pyramid(tmp, args.size)
+            print(
+                "tiled a {0}x{0} image in {1:.1f} s".format(
+                    args.size, time.perf_counter() - start
+                )
+            )
+
+        paths = tile_paths(out_dir)
+        total = sum(os.path.getsize(os.path.join(out_dir, p)) for p in paths)
+        print("{0} files, {1:.1f} MB".format(len(paths), total / 1e6))
+
+        server = FileServer(max_connections=args.max_connections)
+        server.start()
+        try:
+            base_url = server.serve_tree(out_dir)
+            for clients in args.clients:
+                latencies, errors, elapsed = run(base_url, paths, clients)
+                requests = len(latencies[False]) + len(latencies[True])
+                print(
+                    "{0:3d} clients: {1:7.0f} requests/s, {2:6.1f} MB/s, "
+                    "p50 {3:5.1f} ms, p99 {4:5.1f} ms, 304 p50 {5:5.1f} ms, "
+                    "{6} errors".format(
+                        clients,
+                        requests / elapsed,
+                        clients * total / elapsed / 1e6,
+                        np.percentile(latencies[False], 50) * 1e3,
+                        np.percentile(latencies[False], 99) * 1e3,
+                        np.percentile(latencies[True], 50) * 1e3,
+                        len(errors),
+                    )
+                )
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
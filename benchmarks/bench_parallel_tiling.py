@@ -0,0 +1,146 @@
+"""
+Scaling of the parallel image paths with the number of workers: tiling a list
+of overlapping FITS fields with `toasty.tile_fits`, and reprojecting a large
+image in blocks with `ipywwt.utils.sanitize_image`.
+
+The speedup is relative to one worker. It can't exceed the number of CPUs,
+which is printed first: run this on a machine with at least as many CPUs as
+the largest worker count to measure scaling.
+
+Usage::
+
+    python benchmarks/bench_parallel_tiling.py [--workers 1 4 16] [--fields 16]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+
+def write_fields(tmp, count, size):
+    from astropy.io import fits
+    from astropy.wcs import WCS
+
+    # A grid of fields that overlap by a tenth, as in a survey mosaic.
+    rng = np.random.default_rng(0)
+    side = int(np.ceil(np.sqrt(count)))
+    pixel = 1e-4
+    filenames = []
+
+    for i in range(count):
+        wcs = WCS(naxis=2)
+        wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+        wcs.wcs.crval = [
+            10.0 + (i % side) * size * pixel * 0.9,
+            20.0 + (i // side) * size * pixel * 0.9,
+        ]
+        wcs.wcs.crpix = [size / 2, size / 2]
+        wcs.wcs.cdelt = [-pixel, pixel]
+
+        filename = os.path.join(tmp, "field{0}.fits".format(i))
+        data = rng.normal(size=(size, size)).astype(np.float32)
+        fits.PrimaryHDU(data, wcs.to_header()).writeto(filename)
+        filenames.append(filename)
+
+    return filenames
+
+
+def write_rotated(tmp, size):
+    from astropy.io import fits
+    from astropy.wcs import WCS
+
+    # Galactic coordinates, so that the whole image has to be reprojected.
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["GLON-TAN", "GLAT-TAN"]
+    wcs.wcs.crval = [30.0, 10.0]
+    wcs.wcs.crpix = [size / 2, size / 2]
+    wcs.wcs.cdelt = [-1e-4, 1e-4]
+
+    filename = os.path.join(tmp, "rotated.fits")
+    data = np.random.default_rng(0).normal(size=(size, size)).astype(np.float32)
+    fits.PrimaryHDU(data, wcs.to_header()).writeto(filename)
+    return filename
+
+
+def tile(filenames, tmp, workers):
+    import toasty
+
+    # toasty reuses an output directory that already exists.
+    out_dir = os.path.join(tmp, "tiles-{0}".format(workers))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        toasty.tile_fits(
+            filenames, out_dir=out_dir, cli_progress=False, parallel=workers
+        )
+
+
+def reproject(filename, tmp, workers, block_size):
+    from ipywwt.utils import sanitize_image
+
+    output = os.path.join(tmp, "sanitized-{0}.fits".format(workers))
+    sanitize_image(
+        filename, output, overwrite=True, block_size=block_size, parallel=workers
+    )
+
+
+def report(name, workers, timings):
+    base = timings[workers[0]]
+    for count in workers:
+        print(
+            "{0} with {1:2d} workers: {2:6.1f} s, speedup {3:4.2f}x".format(
+                name, count, timings[count], base / timings[count]
+            )
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--fields", type=int, default=16)
+    parser.add_argument("--field-size", type=int, default=1000)
+    parser.add_argument("--image-size", type=int, default=4096)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--only", choices=["tile", "reproject"])
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count()
+    print("{0} CPUs".format(cpus))
+    if max(args.workers) > cpus:
+        print("warning: more workers than CPUs, the speedup is capped at", cpus)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.only != "reproject":
+            filenames = write_fields(tmp, args.fields, args.field_size)
+            timings = {}
+            for workers in args.workers:
+                start = time.perf_counter()
+                tile(filenames, tmp, workers)
+                timings[workers] = time.perf_counter() - start
+            report(
+                "tiling {0} fields of {1}x{1}".format(args.fields, args.field_size),
+                args.workers,
+                timings,
+            )
+
+        if args.only != "tile":
+            filename = write_rotated(tmp, args.image_size)
+            timings = {}
+            for workers in args.workers:
+                start = time.perf_counter()
+                reproject(filename, tmp, workers, args.block_size)
+                timings[workers] = time.perf_counter() - start
+            report(
+                "reprojecting {0}x{0} in blocks of {1}".format(
+                    args.image_size, args.block_size
+                ),
+                args.workers,
+                timings,
+            )
+
+
+if __name__ == "__main__":
+    main()
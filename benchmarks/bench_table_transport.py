@@ -0,0 +1,63 @@
+"""
+Benchmark of the table layer transports: base64 CSV against binary columns.
+
+For each table size, this reports the bytes sent to the frontend and the time
+from ``add_table_layer`` to the message being handed to the comm, including
+its JSON serialization. Decoding in the browser is not measured.
+
+Usage::
+
+    python benchmarks/bench_table_transport.py [--rows 10000 100000 1000000]
+"""
+
+import argparse
+
+import numpy as np
+from astropy.table import Table
+
+from _harness import best_time, recording_widget, wire_size
+
+
+def make_table(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return Table(
+        {
+            "ra": rng.uniform(0, 360, n_rows),
+            "dec": rng.uniform(-90, 90, n_rows),
+            "mag": rng.normal(15, 2, n_rows).astype(np.float32),
+            "flag": rng.integers(0, 8, n_rows, dtype=np.int32),
+        }
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10**4, 10**5, 10**6])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print("{0:>10} {1:>8} {2:>12} {3:>10}".format("rows", "mode", "bytes", "time (ms)"))
+
+    for n_rows in args.rows:
+        table = make_table(n_rows)
+
+        for binary in (False, True):
+            with recording_widget() as (widget, sent):
+
+                def create():
+                    sent.clear()
+                    layer = widget.layers.add_table_layer(table, binary=binary)
+                    widget.layers.remove_layer(layer)
+
+                elapsed = best_time(create, args.repeat)
+                size = wire_size(sent)
+
+            print(
+                "{0:>10} {1:>8} {2:>12} {3:>10.1f}".format(
+                    n_rows, "binary" if binary else "csv", size, elapsed * 1e3
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,85 @@
+import asyncio
+import time
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
 
 import astropy.units as u
-from astropy.time import Time
 from anywidget import AnyWidget
-from traitlets import Unicode, Float, observe, default, Bool
+from traitlets import Unicode, Float, Int, List, observe, default, Bool
 import logging
 import numpy as np
-from astropy.coordinates import SkyCoord
 import ipywidgets as widgets
 
 from .messages import *
-from .imagery import get_imagery_layers
-from .layers import TableLayer, LayerManager
+from .camera import CameraHistory, CameraState, CameraSubscription
+from .imagery import get_imagery_layers, load_imagery_layers
+from .layers import (
+    TableLayer,
+    ImageLayer,
+    LayerManager,
+    binary_columns_table,
+    csv_table_b64,
+)
+from .serve import get_file_server
+from .upload import Upload, message_size
 
 bundler_output_dir = Path(__file__).parent / "static"
 
 DEFAULT_SURVEYS_URL = "https://gist.githubusercontent.com/Carifio24/e8b02488d43a0e4381648fe06c100739/raw/surveys.xml"
+DEFAULT_SURVEYS_FILE = bundler_output_dir / "surveys.xml"
 R2D = 180 / np.pi
 R2H = 12 / np.pi
 
 logger = logging.getLogger("pywwt")
 
 
+# Messages that frontends only handle if they list them in their
+# ``frontend_features``. Older frontends are sent equivalent messages that
+# they do know instead.
+EXTENDED_EVENTS = {
+    "batch",
+    "image_layer_order_multi",
+    "table_layer_append_rows",
+    "table_layer_create_binary",
+    "table_layer_set_multi",
+    "table_layer_update_binary",
+    "table_layer_upsert_columns",
+    "tiling_progress",
+}
+
+
+def _coalesce_key(msg):
+    """
+    The key under which successive messages supersede each other, or `None`
+    if every one of them must be sent.
+    """
+    if isinstance(msg, (TableLayerSetMessage, ImageLayerSetMessage)):
+        return (msg.event, msg.id, msg.setting)
+    elif isinstance(msg, (ImageLayerStretchMessage, ImageLayerCmapMessage)):
+        return (msg.event, msg.id)
+    elif isinstance(msg, SetForegroundByOpacityMessage):
+        return (msg.event,)
+    elif isinstance(msg, TilingProgressMessage):
+        return (msg.event, msg.id)
+    return None
+
+
+# A placeholder in a batch for messages that are only worked out when the
+# batch is sent.
+_Deferred = namedtuple("_Deferred", ["key", "callback"])
+
+
+@lru_cache(maxsize=8)
+def _isot_time(isot):
+    from astropy.time import Time
+
+    return Time(isot, format="isot")
+
+
 class WWTWidget(AnyWidget):
     _esm = bundler_output_dir / "main.js"
     _css = bundler_output_dir / "style.css"
@@ -43,43 +100,415 @@ class WWTWidget(AnyWidget):
     
     mounted = Bool(False, help="Whether the widget is mounted (`bool`)").tag(sync=True)
 
-    # View state that the frontend sends to us:
+    frontend_features = List(
+        Unicode(),
+        help="The extended messages that the frontend handles, as it reports "
+        "them when it is mounted (`list`)",
+    ).tag(sync=True)
+
+    message_rate = Float(
+        30.0,
+        help="The maximum rate, in Hz, at which updates to the same setting are "
+        "sent to the frontend, or zero to send every update (`float`)",
+    )
+
+    view_state_rate = Float(
+        0.0,
+        help="The maximum rate, in Hz, at which view state updates from the "
+        "frontend are processed, or zero to process every update (`float`)",
+    )
+
+    camera_history_size = Int(
+        1024, help="The number of recent camera states to keep (`int`)"
+    )
+
+    upload_chunk_size = Int(
+        0,
+        help="The size, in bytes, above which messages are sent to the frontend "
+        "in chunks of this size, or zero to send every message in one piece. "
+        "Messages are only chunked for frontends that support it (`int`)",
+    )
+
+    upload_window = Int(
+        4,
+        help="The maximum number of chunks sent to the frontend but not yet "
+        "acknowledged by it (`int`)",
+    )
+
+    upload_timeout = Float(
+        60.0,
+        help="The time, in seconds, after which a chunked message fails if the "
+        "frontend stops acknowledging it (`float`)",
+    )
+
+    # View state that the frontend sends to us. The clocks are kept as the ISOT
+    # strings we receive and only turned into `Time` objects when read.
     _raRad = 0.0
     _decRad = 0.0
     _fovDeg = 60.0
     _rollDeg = 0.0
-    _engineTime = Time("2017-03-09T12:30:00", format="isot")
-    _systemTime = Time("2017-03-09T12:30:00", format="isot")
+    _viewTime = 0.0
+    _engineClockISOT = "2017-03-09T12:30:00"
+    _systemClockISOT = "2017-03-09T12:30:00"
     _timeRate = 1.0
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.message_queue = []
+        self._batch_depth = 0
+        self._batched_messages = []
+        self._deferred_keys = set()
+        self._pending_messages = {}
+        self._flush_handle = None
+        self._last_flush = float("-inf")
+        self._latest_view_state = None
+        self._last_view_state = float("-inf")
+        self._view_state_handle = None
+        self._camera_subscriptions = []
+        self._uploads = {}
+        self._table_layers = weakref.WeakValueDictionary()
+        self._upload_progress_callback = None
+        self.camera_history = CameraHistory(self.camera_history_size)
         self._on_ready = []
         self.on_msg(self._on_app_message_received)
 
         self._callbacks = {}
         self._futures = []
 
-        self._available_layers = get_imagery_layers(DEFAULT_SURVEYS_URL)
+        # Fetch the imagery list in the background; it is only needed once
+        # someone asks for the available layers.
+        load_imagery_layers(DEFAULT_SURVEYS_URL, fallback=DEFAULT_SURVEYS_FILE)
         self.load_image_collection()
 
         self.layers = LayerManager(parent=self)
         self.current_mode = "sky"
         self.observe(self._on_mounted_change, names='mounted')
 
-    def _send_msg(self, **kwargs):
+    @property
+    def _available_layers(self):
+        return get_imagery_layers(DEFAULT_SURVEYS_URL, fallback=DEFAULT_SURVEYS_FILE)
+
+    def _send_msg(self, buffers=None, **kwargs):
         """
         Translate PyWWT-style raw dict messages to structured message classes.
         """
         msg_cls = msg_ref[kwargs["event"]]
-        self.send(msg_cls(**kwargs))
+        self.send(msg_cls(**kwargs), buffers)
 
     def send(self, msg: RemoteAPIMessage, buffers=None):
-        if self.mounted:
-            super().send(asdict(msg), buffers)
-        else:
+        if self._batch_depth:
+            self._batched_messages.append((msg, buffers))
+            return
+
+        key = _coalesce_key(msg)
+        if key is None:
+            # Anything else may depend on the pending settings, so they go first.
+            self._flush_pending()
+            self._send_now(msg, buffers)
+            return
+
+        # Only the latest value of a setting is worth sending.
+        self._pending_messages.pop(key, None)
+        self._pending_messages[key] = (msg, buffers)
+        if self._flush_handle is None:
+            self._schedule_flush()
+
+    def _send_now(self, msg, buffers=None):
+        if not self.mounted:
             self.message_queue.append({'msg':msg, 'buffers':buffers})
+            return
+
+        if msg.event in EXTENDED_EVENTS and msg.event not in self.frontend_features:
+            for legacy_msg, legacy_buffers in self._legacy_messages(msg, buffers):
+                self._send_now(legacy_msg, legacy_buffers)
+            return
+
+        content = asdict(msg)
+        if (
+            "upload_start" in self.frontend_features
+            and 0 < self.upload_chunk_size < message_size(content, buffers)
+        ):
+            self._start_upload(content, buffers)
+        else:
+            super().send(content, buffers)
+
+    def _legacy_messages(self, msg, buffers=None):
+        """
+        The messages that older frontends understand, standing in for an
+        extended one. Tiling progress has no equivalent, and is dropped.
+        """
+        if isinstance(msg, BatchMessage):
+            updated = set()
+            offset = 0
+            for submsg, count in zip(msg.messages, msg.buffer_counts):
+                submsg_buffers = buffers[offset : offset + count] if count else None
+                offset += count
+
+                if submsg.event not in self.frontend_features and isinstance(
+                    submsg,
+                    (TableLayerUpsertColumnsMessage, TableLayerAppendRowsMessage),
+                ):
+                    # These become updates of the whole table, so one per
+                    # layer is enough.
+                    if submsg.id in updated:
+                        continue
+                    updated.add(submsg.id)
+
+                yield submsg, submsg_buffers
+
+        elif isinstance(msg, TableLayerSetMultiMessage):
+            for setting, value in zip(msg.settings, msg.values):
+                submsg = TableLayerSetMessage(id=msg.id, setting=setting, value=value)
+                yield submsg, None
+
+        elif isinstance(msg, TableLayerCreateBinaryMessage):
+            table = csv_table_b64(binary_columns_table(msg.columns, buffers))
+            submsg = TableLayerCreateMessage(id=msg.id, table=table, frame=msg.frame)
+            yield submsg, None
+
+        elif isinstance(msg, TableLayerUpdateBinaryMessage):
+            table = csv_table_b64(binary_columns_table(msg.columns, buffers))
+            yield TableLayerUpdateMessage(id=msg.id, table=table), None
+
+        elif isinstance(
+            msg, (TableLayerUpsertColumnsMessage, TableLayerAppendRowsMessage)
+        ):
+            # The frontend can only replace the whole table, as it is now.
+            layer = self._table_layers.get(msg.id)
+            if layer is not None:
+                table = layer._table_b64(layer._transport_columns())
+                yield TableLayerUpdateMessage(id=msg.id, table=table), None
+
+        elif isinstance(msg, ImageLayerOrderMultiMessage):
+            for order, id in enumerate(msg.ids):
+                submsg = ImageLayerOrderMessage(id=id, order=order, version=msg.version)
+                yield submsg, None
+
+    def _start_upload(self, content, buffers=None):
+        upload = Upload(
+            super().send,
+            content,
+            buffers,
+            chunk_size=self.upload_chunk_size,
+            window=self.upload_window,
+            progress=self._on_upload_progress,
+            timeout=self.upload_timeout or None,
+        )
+        self._uploads[upload.id] = upload
+        upload.add_done_callback(self._on_upload_done)
+        upload.start()
+
+    def _on_upload_done(self, upload):
+        self._uploads.pop(upload.id, None)
+
+        error = upload.exception()
+        if error is not None:
+            logger.warning("a message could not be sent to the frontend: %s", error)
+
+    def _on_upload_progress(self, progress):
+        callback = self._upload_progress_callback
+        if callback is not None:
+            try:
+                callback(self, progress)
+            except:  # noqa: E722
+                logger.exception("unhandled Python exception during a callback")
+
+    def set_upload_progress_callback(self, callback):
+        """
+        Set a callback function that will be executed as large messages, such
+        as big tables, are received by the frontend.
+
+        Parameters
+        ----------
+        callback:
+            A callable object which takes two arguments: the WWT widget
+            instance, and a `~ipywwt.upload.UploadProgress`.
+        """
+        self._upload_progress_callback = callback
+
+    async def wait_for_uploads(self):
+        """
+        Wait until the frontend has received all the messages sent so far.
+
+        Large messages are sent in chunks, as fast as the frontend
+        acknowledges them. Acknowledgements are only processed while the
+        kernel is idle, so this should be awaited in a task, or in a later
+        cell than the one that sends the data. If the frontend stops
+        acknowledging a message for ``upload_timeout`` seconds, this raises
+        a `TimeoutError`.
+        """
+        self._flush_pending()
+        for upload in list(self._uploads.values()):
+            await upload
+
+    def _schedule_flush(self):
+        if self.message_rate > 0:
+            delay = self._last_flush + 1 / self.message_rate - time.monotonic()
+        else:
+            delay = 0
+
+        if delay <= 0:
+            self._flush_pending()
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to come back on (e.g. a plain script).
+            self._flush_pending()
+            return
+
+        self._flush_handle = loop.call_later(delay, self._flush_pending)
+
+    def _flush_pending(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self._pending_messages:
+            return
+
+        pending = self._pending_messages
+        self._pending_messages = {}
+        self._last_flush = time.monotonic()
+        for msg, buffers in pending.values():
+            self._send_now(msg, buffers)
+
+    @contextmanager
+    def batch(self, discard_on_error=False):
+        """
+        Group the messages sent inside a ``with`` block.
+
+        Table layer settings changed inside the block are coalesced into a
+        single ``table_layer_set_multi`` message per layer, keeping only the
+        last value of each setting. When the outermost block exits, the
+        messages are sent in their original order, together in a single
+        ``batch`` message. Frontends that don't handle these messages, as
+        listed in ``frontend_features``, get the individual settings instead.
+
+        Parameters
+        ----------
+        discard_on_error : bool, optional
+            If the block raises an exception, drop the messages sent inside it
+            rather than sending them, so that half-done changes never reach the
+            frontend.
+
+        Examples
+        --------
+        >>> with wwt.batch():
+        ...     layer.size_scale = 10
+        ...     layer.color = "red"
+        ...     layer.opacity = 0.5
+        """
+        self._batch_depth += 1
+        start = len(self._batched_messages)
+        try:
+            yield
+        except BaseException:
+            if discard_on_error:
+                del self._batched_messages[start:]
+                self._deferred_keys = {
+                    msg.key
+                    for msg, _ in self._batched_messages
+                    if isinstance(msg, _Deferred)
+                }
+            raise
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._flush_batch()
+
+    def _send_deferred(self, key, callback):
+        """
+        Call ``callback``, which sends messages, when the current batch is
+        sent. Its messages take the place of the first request with the same
+        ``key`` in the batch, and later ones are ignored. Outside of batches,
+        ``callback`` is called right away.
+        """
+        if not self._batch_depth:
+            callback()
+        elif key not in self._deferred_keys:
+            self._deferred_keys.add(key)
+            self._batched_messages.append((_Deferred(key, callback), None))
+
+    def _run_deferred(self, messages):
+        # Replace the placeholders of a batch with the messages they send.
+        if not self._deferred_keys:
+            return messages
+        self._deferred_keys = set()
+
+        expanded = []
+        for msg, buffers in messages:
+            if not isinstance(msg, _Deferred):
+                expanded.append((msg, buffers))
+                continue
+
+            self._batch_depth += 1
+            try:
+                msg.callback()
+            finally:
+                self._batch_depth -= 1
+            sent = self._batched_messages
+            self._batched_messages = []
+            expanded.extend(self._run_deferred(sent))
+
+        return expanded
+
+    def _flush_batch(self):
+        messages = self._batched_messages
+        self._batched_messages = []
+        messages = self._run_deferred(messages)
+
+        # The coalesced settings of a layer take the place of its last
+        # setting message, so that they follow any column uploads they need.
+        settings = {}
+        last_index = {}
+        for index, (msg, _) in enumerate(messages):
+            if isinstance(msg, TableLayerSetMessage):
+                layer_settings = settings.setdefault(msg.id, {})
+                layer_settings.pop(msg.setting, None)
+                layer_settings[msg.setting] = msg.value
+                last_index[msg.id] = index
+
+        batch = []
+        for index, (msg, buffers) in enumerate(messages):
+            if isinstance(msg, TableLayerSetMessage):
+                if last_index[msg.id] != index:
+                    continue
+                layer_settings = settings[msg.id]
+                if len(layer_settings) > 1:
+                    msg = TableLayerSetMultiMessage(
+                        id=msg.id,
+                        settings=list(layer_settings),
+                        values=list(layer_settings.values()),
+                    )
+            batch.append((msg, buffers))
+
+        if len(batch) == 1:
+            self.send(*batch[0])
+        elif batch:
+            self.send(
+                BatchMessage(
+                    messages=[msg for msg, _ in batch],
+                    buffer_counts=[len(buffers or []) for _, buffers in batch],
+                ),
+                [buffer for _, buffers in batch for buffer in buffers or []],
+            )
+
+    def _serve_file(self, filename, extension="", key=None):
+        """
+        Serve a local file to the frontend, returning its URL.
+        """
+        return get_file_server().serve_file(filename, extension=extension, key=key)
+
+    def _serve_tree(self, path, key=None):
+        """
+        Serve a local directory tree to the frontend, returning its URL.
+        """
+        return get_file_server().serve_tree(path, key=key)
+
+    def _create_image_layer(self, **kwargs):
+        return ImageLayer(parent=self, **kwargs)
 
     def load_image_collection(self, url=DEFAULT_SURVEYS_URL):
         self.send(LoadImageCollectionMessage(url))
@@ -87,7 +516,7 @@ class WWTWidget(AnyWidget):
     def _on_mounted_change(self, change):
         while self.message_queue:
             message = self.message_queue.pop(0)
-            self.send(message['msg'], message['buffers'])
+            self._send_now(message['msg'], message['buffers'])
             
         callbacks = self._on_ready
         if callbacks:
@@ -165,6 +594,9 @@ class WWTWidget(AnyWidget):
         """
         Return the view's current right ascension and declination in degrees.
         """
+        from astropy.coordinates import SkyCoord
+
+        self._update_view_state()
         return SkyCoord(
             self._raRad * R2H,
             self._decRad * R2D,
@@ -172,11 +604,110 @@ class WWTWidget(AnyWidget):
         )
 
     def get_fov(self):
+        self._update_view_state()
         return self._fovDeg * u.deg
 
     def get_roll(self):
+        self._update_view_state()
         return self._rollDeg * u.deg
 
+    @property
+    def _engineTime(self):
+        self._update_view_state()
+        return _isot_time(self._engineClockISOT)
+
+    @property
+    def _systemTime(self):
+        self._update_view_state()
+        return _isot_time(self._systemClockISOT)
+
+    def _update_view_state(self):
+        """
+        Apply the most recent view state message, if it hasn't been already.
+        """
+        if self._view_state_handle is not None:
+            self._view_state_handle.cancel()
+            self._view_state_handle = None
+
+        if self._latest_view_state is None:
+            return
+
+        received, payload = self._latest_view_state
+        self._latest_view_state = None
+        self._last_view_state = time.monotonic()
+
+        try:
+            self._raRad = float(payload["raRad"])
+            self._decRad = float(payload["decRad"])
+            self._fovDeg = float(payload["fovDeg"])
+            self._rollDeg = float(payload["rollDeg"])
+            self._engineClockISOT = payload["engineClockISOT"]
+            self._systemClockISOT = payload["systemClockISOT"]
+            self._timeRate = float(payload["engineClockRateFactor"])
+        except ValueError:
+            return  # report a warning somehow?
+
+        self._viewTime = received
+        self.camera_history.append(self.get_camera_state())
+
+        for subscription in list(self._camera_subscriptions):
+            subscription.notify()
+
+    def get_camera_state(self):
+        """
+        Return the current camera state.
+
+        Returns
+        -------
+        state : `~ipywwt.camera.CameraState`
+            The time at which the state was received, and the right
+            ascension, declination, field of view and roll of the view, in
+            degrees.
+        """
+        self._update_view_state()
+        return CameraState(
+            self._viewTime,
+            self._raRad * R2D,
+            self._decRad * R2D,
+            self._fovDeg,
+            self._rollDeg,
+        )
+
+    def subscribe_camera(self, callback, max_rate=None):
+        """
+        Call a function when the camera moves.
+
+        Updates that arrive faster than ``max_rate`` are coalesced, so that
+        the callback always sees the latest state but is called at most
+        ``max_rate`` times per second. Without a running event loop, the
+        last updates of a burst are only passed on with the next update.
+
+        Parameters
+        ----------
+        callback :
+            A callable object which takes two arguments: the WWT widget
+            instance, and a `~ipywwt.camera.CameraState`.
+        max_rate : float, optional
+            The maximum number of calls per second. By default, the callback
+            is called for every update.
+
+        Returns
+        -------
+        subscription : `~ipywwt.camera.CameraSubscription`
+            Call its ``cancel()`` method to stop receiving updates.
+        """
+        subscription = CameraSubscription(self, callback, max_rate=max_rate)
+        self._camera_subscriptions.append(subscription)
+        return subscription
+
+    @observe("camera_history_size")
+    def _on_camera_history_size_change(self, change):
+        history = CameraHistory(change["new"])
+        if hasattr(self, "camera_history"):
+            for state in self.camera_history.to_array()[-history.size :]:
+                history.append(state)
+        self.camera_history = history
+
     def _on_app_message_received(self, instance, payload, buffers=None):
         """
         Call this function when a message is received from the research app.
@@ -192,22 +723,38 @@ class WWTWidget(AnyWidget):
         updated_fields = []
 
         if ptype == "wwt_view_state":
-            try:
-                self._raRad = float(payload["raRad"])
-                self._decRad = float(payload["decRad"])
-                self._fovDeg = float(payload["fovDeg"])
-                self._rollDeg = float(payload["rollDeg"])
-                self._engineTime = Time(payload["engineClockISOT"], format="isot")
-                self._systemTime = Time(payload["systemClockISOT"], format="isot")
-                self._timeRate = float(payload["engineClockRateFactor"])
-            except ValueError:
-                pass  # report a warning somehow?
+            # Keep only the latest state; anything reading the view applies it
+            # on demand, so skipping updates here never leaves it stale.
+            self._latest_view_state = (time.time(), payload)
+
+            delay = 0
+            if self.view_state_rate > 0:
+                delay = self._last_view_state + 1 / self.view_state_rate
+                delay -= time.monotonic()
+
+            if delay <= 0:
+                self._update_view_state()
+            elif self._view_state_handle is None:
+                # Make sure the last state of a burst still gets applied.
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    pass
+                else:
+                    self._view_state_handle = loop.call_later(
+                        delay, self._update_view_state
+                    )
         elif ptype == "wwt_application_state":
             hipscat = payload.get("hipsCatalogNames")
 
             if hipscat is not None:
                 self._available_hips_catalog_names = hipscat
 
+        elif ptype == "wwt_upload_ack":
+            upload = self._uploads.get(payload.get("id"))
+            if upload is not None:
+                upload.acknowledge(payload.get("seq"))
+
         elif ptype == "wwt_selection_state":
             most_recent = payload.get("mostRecentSource")
             sources = payload.get("selectedSources")
@@ -297,6 +844,8 @@ class WWTWidget(AnyWidget):
         Reset the current view mode's coordinates and field of view to
         their original states.
         """
+        from astropy.coordinates import SkyCoord
+
         if self.current_mode == "sky":
             self.center_on_coordinates(
                 SkyCoord(0.0, 0.0, unit=u.deg), fov=60 * u.deg, instant=False
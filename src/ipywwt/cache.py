@@ -0,0 +1,436 @@
+"""
+A persistent, content-addressed cache for the data ipywwt derives from images.
+
+FITS files written out for toasty and the tile pyramids it builds are kept in
+entries named after a hash of everything that went into them, so an image that
+has been tiled once never needs to be tiled again, in this session or a later
+one. Entries are built in a temporary directory and renamed into place, so an
+entry either exists in full or not at all. Building an entry holds a lock that
+other processes respect, so kernels asking for the same entry at the same time
+share the work. When the cache grows past its size budget, the least recently
+used entries are removed, except for those that a running process may still
+be serving.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from .utils import get_cache_dir
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Whether processes can share a file lock, which msvcrt can't do.
+SHARED_LOCKS = fcntl is not None
+
+__all__ = ["DiskCache", "cache_key", "get_disk_cache"]
+
+logger = logging.getLogger("pywwt")
+
+# The default size budget of the cache, in bytes. It can be set with the
+# ``IPYWWT_CACHE_SIZE`` environment variable.
+DEFAULT_MAX_SIZE = 10 * 1024**3
+
+# The file that describes a complete entry. Its modification time records when
+# the entry was last used.
+ENTRY_META = ".entry.json"
+
+# Where shared file locks aren't available, entries used within this many
+# seconds are assumed to be in use by some process, and aren't evicted.
+IN_USE_WINDOW = 3600
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_disk_cache():
+    """
+    Return the cache shared by all widgets in this process.
+    """
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            max_size = os.environ.get("IPYWWT_CACHE_SIZE")
+            _cache = DiskCache(
+                get_cache_dir("data"),
+                max_size=int(max_size) if max_size else DEFAULT_MAX_SIZE,
+            )
+
+    return _cache
+
+
+def cache_key(*parts):
+    """
+    Return a cache key for the given parts, which can be strings, bytes, or
+    anything with a stable `repr`.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            part = repr(part).encode("utf-8")
+        # Prefix each part with its length, so that ("ab", "c") and ("a", "bc")
+        # don't collide.
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+
+    return digest.hexdigest()
+
+
+class _FileLock:
+    # A lock on a file, held across processes. It can only be shared where
+    # SHARED_LOCKS is true.
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._file = None
+
+    def acquire(self, blocking=True, shared=False):
+        f = open(self._filename, "a+b")
+
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                if not blocking:
+                    flags |= fcntl.LOCK_NB
+                fcntl.flock(f.fileno(), flags)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise BlockingIOError(self._filename) from None
+                        time.sleep(0.1)
+        except BaseException:
+            f.close()
+            raise
+
+        self._file = f
+
+    def release(self):
+        if fcntl is None:
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class DiskCache:
+    """
+    A directory of cache entries, each of which is a directory of files.
+
+    Parameters
+    ----------
+    root : str
+        The directory holding the cache.
+    max_size : int, optional
+        The size budget of the cache, in bytes. Entries that a running process
+        has used are never evicted, so the budget may be exceeded if sessions
+        use more data than that.
+
+    Notes
+    -----
+    A process marks the entries it gets or builds as in use by holding a
+    shared lock on a file for each of them, until it exits or removes the
+    entry. Eviction needs an exclusive lock on that file, so it leaves alone
+    whatever any live process may still be serving, and the locks of a
+    process that died are released by the system. Where shared locks aren't
+    available (on Windows), entries used within the last `IN_USE_WINDOW`
+    seconds are kept instead.
+    """
+
+    def __init__(self, root, max_size=DEFAULT_MAX_SIZE):
+        self.root = root
+        self.max_size = max_size
+        # The in-use locks that this process holds, by key.
+        self._used = {}
+        os.makedirs(os.path.join(root, ".locks"), exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _lock(self, key):
+        return _FileLock(os.path.join(self.root, ".locks", key + ".lock"))
+
+    def _in_use_lock(self, key):
+        return _FileLock(os.path.join(self.root, ".locks", key + ".use"))
+
+    def _mark_used(self, key):
+        # Return whether the entry wasn't marked already.
+        if key in self._used:
+            return False
+
+        lock = None
+        if SHARED_LOCKS:
+            lock = self._in_use_lock(key)
+            lock.acquire(shared=True)
+        self._used[key] = lock
+        return True
+
+    def _unmark_used(self, key):
+        lock = self._used.pop(key, None)
+        if lock is not None:
+            lock.release()
+
+    def get(self, key):
+        """
+        Return the directory of the entry for ``key``, or `None` if there
+        isn't one.
+        """
+        entry = self._entry_dir(key)
+
+        # Mark the entry first, so that it can't be evicted between checking
+        # for it and using it.
+        marked = self._mark_used(key)
+        try:
+            os.utime(os.path.join(entry, ENTRY_META))
+        except OSError:
+            if marked:
+                self._unmark_used(key)
+            return None
+
+        return entry
+
+    def fetch(self, key, write):
+        """
+        Return the directory of the entry for ``key``, building it first with
+        ``write`` if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        write : callable
+            A function that writes the files of the entry into the directory
+            that it is given.
+        """
+        entry = self.get(key)
+        if entry is None:
+            with self.build(key) as tmp:
+                if tmp is not None:
+                    write(tmp)
+            entry = self._entry_dir(key)
+        return entry
+
+    @contextmanager
+    def build(self, key):
+        """
+        Build the entry for ``key``.
+
+        This waits for any other process building the same entry, and yields
+        a temporary directory to write the entry to, or `None` if the entry
+        exists by then. The directory becomes the entry when the block exits
+        without an exception, and is removed otherwise.
+
+        Examples
+        --------
+        >>> with cache.build(key) as tmp:
+        ...     if tmp is not None:
+        ...         write_files(tmp)
+        >>> entry = cache.get(key)
+        """
+        lock = self._lock(key)
+        lock.acquire()
+
+        try:
+            tmp = self._begin(key)
+            try:
+                yield tmp
+            except BaseException:
+                if tmp is not None:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            if tmp is not None:
+                self._commit(key, tmp)
+        finally:
+            lock.release()
+
+        self.evict()
+
+    @asynccontextmanager
+    async def build_async(self, key):
+        """
+        Like `build`, but waits for other processes without blocking the
+        event loop.
+        """
+        loop = asyncio.get_running_loop()
+        lock = self._lock(key)
+        await loop.run_in_executor(None, lock.acquire)
+
+        try:
+            tmp = self._begin(key)
+            try:
+                yield tmp
+            except BaseException:
+                if tmp is not None:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            if tmp is not None:
+                self._commit(key, tmp)
+        finally:
+            lock.release()
+
+        await loop.run_in_executor(None, self.evict)
+
+    def _begin(self, key):
+        if self.get(key) is not None:
+            return None
+
+        # A directory without metadata isn't a complete entry, and would stop
+        # the new one from being renamed into place.
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+        return tempfile.mkdtemp(dir=self.root, prefix=".tmp-{}-".format(key))
+
+    def _commit(self, key, tmp):
+        size = 0
+        for dirpath, _, filenames in os.walk(tmp):
+            for filename in filenames:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+
+        with open(os.path.join(tmp, ENTRY_META), "w") as f:
+            json.dump({"size": size, "created": time.time()}, f)
+
+        self._mark_used(key)
+        os.rename(tmp, self._entry_dir(key))
+
+    def _entries(self):
+        entries = []
+
+        for name in os.listdir(self.root):
+            if name.startswith(".tmp-") or name.startswith(".trash-"):
+                self._remove_stale(name)
+            if name.startswith("."):
+                continue
+
+            meta_file = os.path.join(self.root, name, ENTRY_META)
+            try:
+                last_used = os.stat(meta_file).st_mtime
+                with open(meta_file) as f:
+                    size = json.load(f)["size"]
+            except (OSError, ValueError, KeyError):
+                continue
+
+            entries.append((last_used, size, name))
+
+        return entries
+
+    def _remove_stale(self, name):
+        # Remove what a build or an eviction left behind when its process
+        # died. A build in progress holds the lock of its key.
+        if name.startswith(".tmp-"):
+            lock = self._lock(name.split("-")[1])
+            try:
+                lock.acquire(blocking=False)
+            except BlockingIOError:
+                return
+            try:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            finally:
+                lock.release()
+        else:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def size(self):
+        """
+        Return the total size of the entries in the cache, in bytes.
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits its size
+        budget.
+
+        Entries in use by a running process, and entries being built by any
+        process, are kept.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+
+        for last_used, size, key in entries:
+            if total <= self.max_size:
+                break
+            if key in self._used:
+                continue
+            if not SHARED_LOCKS and now - last_used < IN_USE_WINDOW:
+                continue
+
+            lock = self._lock(key)
+            try:
+                lock.acquire(blocking=False)
+            except BlockingIOError:
+                continue
+
+            try:
+                in_use = None
+                if SHARED_LOCKS:
+                    in_use = self._in_use_lock(key)
+                    try:
+                        in_use.acquire(blocking=False)
+                    except BlockingIOError:
+                        continue
+                try:
+                    removed = self._remove(key)
+                finally:
+                    if in_use is not None:
+                        in_use.release()
+            finally:
+                lock.release()
+
+            if removed:
+                total -= size
+
+    def _remove(self, key):
+        # Move the entry out of the way first, so that nobody finds a
+        # half-removed entry.
+        trash = tempfile.mkdtemp(dir=self.root, prefix=".trash-")
+        try:
+            os.rename(self._entry_dir(key), os.path.join(trash, key))
+        except OSError:
+            logger.debug("could not remove cache entry %s", key, exc_info=True)
+            return False
+        finally:
+            shutil.rmtree(trash, ignore_errors=True)
+
+        return True
+
+    def remove(self, key):
+        """
+        Remove the entry for ``key``, waiting for any process building it.
+        Other processes using the entry don't stop it from being removed.
+        """
+        lock = self._lock(key)
+        lock.acquire()
+        try:
+            self._remove(key)
+        finally:
+            lock.release()
+        self._unmark_used(key)
+
+    def clear(self):
+        """
+        Remove all the entries that aren't being built or in use by a running
+        process.
+        """
+        max_size, self.max_size = self.max_size, 0
+        try:
+            self.evict()
+        finally:
+            self.max_size = max_size
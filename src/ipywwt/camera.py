@@ -0,0 +1,131 @@
+"""
+Tracking of the camera state reported by the WWT frontend.
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+
+import numpy as np
+
+__all__ = ["CameraState", "CameraHistory", "CameraSubscription"]
+
+logger = logging.getLogger("pywwt")
+
+CameraState = namedtuple("CameraState", ["time", "ra", "dec", "fov", "roll"])
+CameraState.__doc__ = """
+A snapshot of the camera: the (Unix) time at which the kernel received it,
+the right ascension and declination of the view center, the field of view
+and the roll, all in degrees.
+"""
+
+
+class CameraHistory:
+    """
+    A fixed-size ring buffer of recent camera states.
+
+    Samples are stored in a single NumPy array, so recording one doesn't
+    allocate, and reading them back gives plain arrays in chronological order.
+
+    Parameters
+    ----------
+    size : int
+        The maximum number of samples kept.
+    """
+
+    def __init__(self, size):
+        self._samples = np.zeros((size, len(CameraState._fields)))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def size(self):
+        return len(self._samples)
+
+    def append(self, state):
+        """
+        Record a sample, overwriting the oldest one if the buffer is full.
+        """
+        if self.size == 0:
+            return
+        self._samples[self._next] = state
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def to_array(self):
+        """
+        Return the samples, oldest first, as an array of shape ``(N, 5)``
+        whose columns follow `CameraState`.
+        """
+        if self._count < self.size:
+            return self._samples[: self._count].copy()
+        return np.roll(self._samples, -self._next, axis=0)
+
+    def __getattr__(self, name):
+        # time, ra, dec, fov and roll, each as a 1-d array
+        try:
+            index = CameraState._fields.index(name)
+        except ValueError:
+            raise AttributeError(name) from None
+        return self.to_array()[:, index]
+
+
+class CameraSubscription:
+    """
+    A callback that receives camera updates at no more than a given rate.
+
+    Updates arriving faster than that are coalesced: once the interval has
+    passed, the callback is called once with the latest state. Without a
+    running event loop to come back on, updates within the interval are
+    skipped instead, and the next update after it is passed on.
+    """
+
+    def __init__(self, widget, callback, max_rate=None):
+        self._widget = widget
+        self.callback = callback
+        self.max_rate = max_rate
+        self._last_call = float("-inf")
+        self._handle = None
+
+    def notify(self):
+        if self._handle is not None:
+            return
+
+        delay = 0
+        if self.max_rate:
+            delay = self._last_call + 1 / self.max_rate - time.monotonic()
+
+        if delay > 0:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # No event loop to come back on (e.g. a plain script): the
+                # next update after the interval carries the latest state.
+                return
+            self._handle = loop.call_later(delay, self._call)
+            return
+
+        self._call()
+
+    def _call(self):
+        self._handle = None
+        self._last_call = time.monotonic()
+
+        try:
+            self.callback(self._widget, self._widget.get_camera_state())
+        except:  # noqa: E722
+            logger.exception("unhandled Python exception during a callback")
+
+    def cancel(self):
+        """
+        Stop receiving camera updates.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self in self._widget._camera_subscriptions:
+            self._widget._camera_subscriptions.remove(self)
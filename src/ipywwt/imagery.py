@@ -8,39 +8,195 @@ The code in this module is fairly old and in need of updating. You won't need to
 use its functionality directly if you're not a pywwt developer.
 """
 
+import hashlib
+import json
+import os
 import re
+import tempfile
+import threading
+import time
 
 from io import BytesIO
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree.ElementTree import ElementTree
 
-import requests
+from .utils import get_cache_dir
 
 __all__ = [
     "get_imagery_layers",
+    "load_imagery_layers",
     "Bandpass",
     "ImageryLayers",
 ]
 
+# How long a downloaded collection is used before checking for a new version,
+# in seconds.
+CACHE_TTL = 24 * 3600
 
-def get_imagery_layers(url):
+# How long to wait for the server before falling back to a cached or bundled
+# copy, in seconds.
+FETCH_TIMEOUT = 10
+
+# How long a collection read from a stale or bundled copy, because the server
+# could not be reached, is used before trying the server again, in seconds.
+RETRY_INTERVAL = 300
+
+_loads = {}
+_retry_at = {}
+_loads_lock = threading.Lock()
+_executor = None
+
+
+def get_imagery_layers(url, fallback=None):
     """
     Get the list of available image layers that can be used as background
     or foreground based on the URL to a WTML (WorldWide Telescope image
     collection file).
 
+    Collections are only downloaded once per process, and are cached on disk
+    so that they are only downloaded again when they have changed on the
+    server. If the server cannot be reached, a stale cached copy is used, or
+    failing that the ``fallback`` file, until the server is tried again after
+    ``RETRY_INTERVAL`` seconds.
+
     Parameters
     ----------
     url : `str`
         The URL of the image collection.
+    fallback : `str`, optional
+        The path to a local copy of the image collection, to use when it
+        cannot be downloaded.
     """
+    return load_imagery_layers(url, fallback).result()
 
+
+def load_imagery_layers(url, fallback=None):
+    """
+    Start loading an image collection in the background, as for
+    `get_imagery_layers`, without waiting for it.
+
+    Returns
+    -------
+    future : `concurrent.futures.Future`
+        A future that resolves to the available image layers.
+    """
+    global _executor
+
+    with _loads_lock:
+        future = _loads.get(url)
+
+        if future is None or (
+            future.done()
+            and (
+                future.exception() is not None
+                or _retry_at.get(url, float("inf")) <= time.monotonic()
+            )
+        ):
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="ipywwt-imagery"
+                )
+            future = _executor.submit(_load_imagery_layers, url, fallback)
+            _loads[url] = future
+
+    return future
+
+
+def _load_imagery_layers(url, fallback):
+    import requests
+
+    _retry_at.pop(url, None)
+
+    name = hashlib.sha1(url.encode()).hexdigest()
+    try:
+        cache_file = os.path.join(get_cache_dir("imagery"), name)
+    except OSError:
+        cache_file = os.path.join(tempfile.gettempdir(), f"ipywwt-imagery-{name}")
+    meta = _read_cache_meta(cache_file)
+
+    if meta is not None and time.time() - meta["fetched"] < CACHE_TTL:
+        with open(cache_file + ".xml", "rb") as f:
+            return _parse_imagery_layers(f.read())
+
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException:
+        if meta is not None:
+            filename = cache_file + ".xml"
+        elif fallback is not None:
+            filename = fallback
+        else:
+            raise
+
+        # Don't hold on to this copy for the rest of the process: the server
+        # may well be back soon.
+        _retry_at[url] = time.monotonic() + RETRY_INTERVAL
+        with open(filename, "rb") as f:
+            return _parse_imagery_layers(f.read())
+
+    if response.status_code == 304:
+        with open(cache_file + ".xml", "rb") as f:
+            content = f.read()
+    else:
+        content = response.content
+
+    layers = _parse_imagery_layers(content)
+
+    try:
+        if response.status_code != 304:
+            _write_atomic(cache_file + ".xml", content)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": time.time(),
+        }
+        _write_atomic(cache_file + ".json", json.dumps(meta).encode())
+    except OSError:
+        # A read-only cache shouldn't stop us from using what we downloaded.
+        pass
+
+    return layers
+
+
+def _read_cache_meta(cache_file):
+    try:
+        with open(cache_file + ".json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not os.path.exists(cache_file + ".xml"):
+        return None
+
+    return meta
+
+
+def _write_atomic(filename, content):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _parse_imagery_layers(content):
     available_layers = OrderedDict()
 
     # Get the XML describing the available surveys
-    response = requests.get(url)
-    assert response.ok
-    b = BytesIO(response.content)
+    b = BytesIO(content)
     e = ElementTree()
     t = e.parse(b)
 
@@ -3,9 +3,10 @@ import uuid
 import tempfile
 from os import path
 import shutil
-import asyncio
+import weakref
+import itertools
+import operator
 
-import nest_asyncio
 from pathlib import Path
 
 import re
@@ -18,26 +19,28 @@ else:
 import warnings
 from base64 import b64encode
 from collections import OrderedDict
+from contextlib import contextmanager
 
 import numpy as np
-from astropy.io import fits
-from matplotlib.pyplot import cm
-from matplotlib.colors import Colormap
 from astropy import units as u
 import astropy.units.imperial  # noqa: F401
-from astropy.table import Column
-from astropy.table import Table
-from astropy.time import Time
-from datetime import datetime
-import toasty
-from toasty import TilingMethod
 
-from traitlets import HasTraits, validate, observe
-from .traits import Color, Bool, Float, Unicode, AstropyQuantity, Any, to_hex
-from .utils import sanitize_image, validate_traits, ensure_utc
+from traitlets import HasTraits, default, validate, observe
+from .traits import Color, Bool, Float, Int, Unicode, AstropyQuantity, Any, to_hex
+from .utils import (
+    acquire_sanitized_image,
+    digest_key,
+    ensure_utc_column,
+    new_digest,
+    release_sanitized_image,
+    sanitized_image_key,
+    update_digest_with_hdu,
+    validate_traits,
+)
 
 __all__ = [
     "CatalogHipsLayer",
+    "DensityLayer",
     "ImageLayer",
     "LayerManager",
     "TableLayer",
@@ -121,19 +124,27 @@ UI_COLORMAPS = OrderedDict(
     ]
 )
 
-# Save string types for validating ISOT strings in time series tables
-if sys.version_info[0] == 2:
-    STR_TYPE = basestring  # noqa
-    NP_STR_TYPE = np.string_
-else:
-    STR_TYPE = str
-    NP_STR_TYPE = np.str_
-
 # The following are columns that we add dynamically and internally, so we need
 # to make sure they have unique names that won't clash with existing columns
 CMAP_COLUMN_NAME = str(uuid.uuid4())
 TIME_COLUMN_NAME = str(uuid.uuid4())
 
+# The number of values of a time column that are checked when it is chosen.
+TIME_SAMPLE_SIZE = 16
+
+# The TableLayer traits that refer to columns WWT reads when rendering
+COLUMN_ATTS = [
+    "lon_att",
+    "lat_att",
+    "alt_att",
+    "x_att",
+    "y_att",
+    "z_att",
+    "size_att",
+    "cmap_att",
+    "time_att",
+]
+
 
 def guess_lon_lat_columns(colnames):
     """
@@ -227,15 +238,201 @@ def csv_table_win_newline(table):
     return re.sub(r"(?<![\r\n])(\r|\n)(?![\r\n])", "\r\n", s.read())
 
 
+# Hex lookup tables for colormaps, keyed by the id of the colormap object
+_cmap_hex_luts = {}
+
+
+def cmap_hex_lut(cmap):
+    """
+    Return the hex colors of a Matplotlib colormap as an array: its ``cmap.N``
+    entries followed by its under, over and bad colors. Tables are cached for
+    as long as the colormap object is alive.
+    """
+    key = id(cmap)
+    cached = _cmap_hex_luts.get(key)
+    if cached is not None and cached[0]() is cmap:
+        return cached[1]
+
+    rgba = np.vstack([cmap(np.arange(cmap.N)), cmap(np.array([-1.0, 2.0, np.nan]))])
+    lut = np.array([to_hex(x) for x in rgba[:, :-1]])
+
+    ref = weakref.ref(cmap, lambda _: _cmap_hex_luts.pop(key, None))
+    _cmap_hex_luts[key] = (ref, lut)
+    return lut
+
+
+def cmap_hex_values(cmap, values, vmin, vmax):
+    """
+    Map values to the hex colors of a Matplotlib colormap, normalizing them
+    between vmin and vmax. This quantizes the values exactly like calling the
+    colormap does, but looks the colors up in a precomputed table rather than
+    converting every row to hex separately. NaN and masked values get the
+    colormap's bad color.
+    """
+    lut = cmap_hex_lut(cmap)
+    n = cmap.N
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if np.ma.isMaskedArray(values):
+            # Masked arithmetic also masks out non-finite results.
+            x = (np.ma.asarray(values, dtype=float) - vmin) / (vmax - vmin)
+            x = np.ma.filled(x, np.nan)
+        else:
+            x = (np.asarray(values, dtype=float) - vmin) / (vmax - vmin)
+
+        x *= n
+        x[x == n] = n - 1
+        under = x < 0
+        over = x >= n
+        bad = np.isnan(x)
+        index = x.astype(np.intp)
+
+    index[under] = n
+    index[over] = n + 1
+    index[bad] = n + 2
+
+    return lut[index]
+
+
+def binary_table_columns(table, colnames=None):
+    """
+    Helper function to get Astropy table columns as raw little-endian buffers
+    for the binary table transport. Returns a list of column descriptions
+    (name, dtype and, for strings, itemsize) and a matching list of buffers.
+
+    Numeric columns are sent as typed arrays (64-bit integers are widened to
+    float64 since JavaScript typed arrays can't hold them losslessly as
+    numbers), masked numeric values become NaN, and all other columns are
+    sent as fixed-width UTF-8 strings.
+    """
+    from astropy.time import Time
+
+    columns = []
+    buffers = []
+
+    if colnames is None:
+        colnames = table.colnames
+
+    for colname in colnames:
+        column = table[colname]
+
+        if isinstance(column, Time):
+            values = column.isot
+        else:
+            values = np.asarray(column)
+
+        mask = getattr(column, "mask", None)
+        if mask is not None and not np.any(mask):
+            mask = None
+
+        kind = values.dtype.kind
+
+        if kind in "biuf":
+            if kind == "b":
+                dtype = np.uint8
+            elif kind == "f" and values.dtype.itemsize == 4:
+                dtype = np.float32
+            elif kind in "iu" and values.dtype.itemsize <= 4:
+                dtype = values.dtype
+            else:
+                dtype = np.float64
+
+            if mask is not None:
+                if dtype not in (np.float32, np.float64):
+                    dtype = np.float64
+                values = np.where(mask, np.nan, values)
+
+            values = values.astype(np.dtype(dtype).newbyteorder("<"), copy=False)
+            spec = {"name": colname, "dtype": values.dtype.name}
+        else:
+            values = values.astype(str)
+            if mask is not None:
+                values = np.where(mask, "", values)
+            values = np.char.encode(values, "utf-8")
+            spec = {"name": colname, "dtype": "str", "itemsize": values.dtype.itemsize}
+
+        columns.append(spec)
+        buffers.append(memoryview(np.ascontiguousarray(values).view(np.uint8)))
+
+    return columns, buffers
+
+
+def binary_columns_table(columns, buffers):
+    """
+    Helper function to rebuild an Astropy table from the column descriptions
+    and buffers made by `binary_table_columns`.
+    """
+    from astropy.table import Table
+
+    table = Table()
+
+    for spec, buffer in zip(columns, buffers):
+        if spec["dtype"] == "str":
+            values = np.frombuffer(buffer, dtype="S{0}".format(spec["itemsize"]))
+            values = np.char.decode(values, "utf-8")
+        else:
+            dtype = np.dtype(spec["dtype"]).newbyteorder("<")
+            values = np.frombuffer(buffer, dtype=dtype)
+        table[spec["name"]] = values
+
+    return table
+
+
+def _fits_column(column, values):
+    # Whether values can be written into part of a table column as they are,
+    # without changing the column's type or losing masks.
+    from astropy.table import Column
+
+    return (
+        isinstance(column, Column)
+        and isinstance(values, (Column, np.ndarray))
+        and values.shape[1:] == column.shape[1:]
+        and np.can_cast(values.dtype, column.dtype)
+        and (isinstance(column, np.ma.MaskedArray) or not np.ma.is_masked(values))
+    )
+
+
+def csv_table_b64(table):
+    """
+    Helper function to get Astropy tables as base64-encoded CSV, as sent to
+    the frontend.
+    """
+    csv = csv_table_win_newline(table)
+    return b64encode(csv.encode("ascii", errors="replace")).decode("ascii")
+
+
+# Keyword arguments of `add_image_layer` that are meant for toasty rather than
+# for the image layer.
+TOASTY_KEYWORDS = ["blankval", "override", "out_dir", "start"]
+
+# Keyword arguments of `add_table_layer` that aren't table layer traits.
+TABLE_OPTIONS = ["binary", "project_columns"]
+
+# In LOD mode, rows are picked in a cone this many times wider than the field
+# of view, so that small moves of the view don't need new rows.
+LOD_MARGIN = 1.5
+
+# The maximum rate, in Hz, at which LOD layers follow the view.
+LOD_UPDATE_RATE = 2.0
+
+# The HEALPix order at which density layers index their rows. Bins of any
+# coarser order are found from these indices without more trigonometry.
+DENSITY_INDEX_ORDER = 20
+
+VALID_AGGREGATES = ["count", "sum", "mean"]
+
+
 class LayerManager(object):
     """
     A simple container for layers.
     """
 
     def __init__(self, parent=None):
-        self._layers = []
+        # Layers by ID, in the order they were added
+        self._layers = OrderedDict()
         self._parent = parent
         self._tmpdir = None
+        self._order_version = 0
 
     def add_image_layer(
         self,
@@ -243,7 +440,8 @@ class LayerManager(object):
         hdu_index=None,
         verbose=True,
         name=None,
-        tiling_method=TilingMethod.AUTO_DETECT,
+        tiling_method=None,
+        parallel=None,
         **kwargs,
     ):
         """
@@ -278,22 +476,234 @@ class LayerManager(object):
         tiling_method : optional :class:`~toasty.TilingMethod`
             Can be used to force a specific tiling method, i.e. tiled
             tangential projection, TOAST, HiPS, or even untiled. Defaults
-            to auto-detection, which choses the most appropriate method.
+            to auto-detection (``None`` or ``TilingMethod.AUTO_DETECT``),
+            which choses the most appropriate method.
+        parallel : optional int, defaults to None
+            The number of processes to tile with. The files of a list are
+            sampled into the base level concurrently, and the lower levels
+            are built concurrently as well. Images that aren't tiled are
+            reprojected with this many threads. Defaults to one per CPU;
+            pass 1 to work serially. More workers than CPUs only add
+            overhead, and so do processes for a few small files.
         kwargs
             Additional keyword arguments can be used to set properties on the
             image layer or settings for the `toasty` tiling process. Common
             toasty settings include ``out_dir``, ``override``, ``blankval``,
             and ``start``.
-            See `toasty.tile_fits`.
+            See `toasty.tile_fits`. For images that aren't tiled,
+            ``block_size`` sets the size of the blocks that the image is
+            reprojected in; see `ipywwt.utils.sanitize_image`.
+
+        Returns
+        -------
+        layer : :class:`~pywwt.layers.ImageLayer` or a subclass thereof
+        """
+        from toasty import TilingMethod
+
+        if tiling_method is None:
+            tiling_method = TilingMethod.AUTO_DETECT
+        fits_list = self._fits_list(image, hdu_index=hdu_index)
+
+        if self._needs_tiling(fits_list, tiling_method):
+            return self._tile_and_serve(
+                fits_list=fits_list,
+                hdu_index=hdu_index,
+                cli_progress=verbose,
+                display_name=name,
+                tiling_method=tiling_method,
+                parallel=parallel,
+                **kwargs,
+            )
+        else:
+            return self._create_and_add_image_layer(
+                image=fits_list[0],
+                hdu_index=hdu_index,
+                name=name,
+                parallel=parallel,
+                **kwargs,
+            )
+
+    async def add_image_layer_async(
+        self,
+        image=None,
+        hdu_index=None,
+        verbose=False,
+        name=None,
+        tiling_method=None,
+        parallel=None,
+        progress=None,
+        **kwargs,
+    ):
+        """
+        Add an image layer to the current view, without blocking the kernel
+        while the image is tiled.
+
+        This takes the same arguments as `add_image_layer`, but tiling runs in
+        a separate process while the kernel and the viewer stay responsive.
+        The viewer shows the progress of the tiling.
+        Cancelling the task running this method (for instance with
+        :meth:`asyncio.Task.cancel`) stops the tiling and cleans up the
+        partial output.
+
+        Parameters
+        ----------
+        progress : callable, optional
+            A function called with a :class:`~ipywwt.tiling.TilingProgress`
+            as the tiling proceeds.
+        verbose : optional boolean, defaults False
+            If true, a progress bar is shown in the notebook.
+
+        See `add_image_layer` for the other parameters.
 
         Returns
         -------
         layer : :class:`~pywwt.layers.ImageLayer` or a subclass thereof
+
+        Examples
+        --------
+        >>> task = asyncio.ensure_future(wwt.layers.add_image_layer_async("big.fits"))
+        >>> task.cancel()  # changed our mind
         """
+        from toasty import TilingMethod
+
+        from .tiling import TilingProgress, tile_fits_async
+
+        if tiling_method is None:
+            tiling_method = TilingMethod.AUTO_DETECT
+        fits_list = self._fits_list(image, hdu_index=hdu_index)
+
+        if not self._needs_tiling(fits_list, tiling_method):
+            return self._create_and_add_image_layer(
+                image=fits_list[0],
+                hdu_index=hdu_index,
+                name=name,
+                parallel=parallel,
+                **kwargs,
+            )
+
+        bar = None
+        if verbose:
+            from tqdm.auto import tqdm
+
+            bar = tqdm(desc="Tiling")
+
+        stage = [None]
+        progress_id = str(uuid.uuid4())
+        progress_name = name or path.basename(fits_list[0])
+
+        def send_progress(report, finished=False):
+            self._parent._send_msg(
+                event="tiling_progress",
+                id=progress_id,
+                name=progress_name,
+                stage=report.stage,
+                done=report.done,
+                total=report.total,
+                finished=finished,
+            )
+
+        def on_progress(report):
+            # Reports arrive at most every tiling.PROGRESS_INTERVAL, and the
+            # widget coalesces them beyond its message_rate.
+            send_progress(report)
+            if bar is not None:
+                if report.stage != stage[0]:
+                    stage[0] = report.stage
+                    bar.reset(total=report.total)
+                    bar.set_postfix(stage=report.stage)
+                bar.update(report.done - bar.n)
+            if progress is not None:
+                progress(report)
+
+        toasty_kwargs = {
+            key: kwargs.pop(key) for key in TOASTY_KEYWORDS if key in kwargs
+        }
+
+        tiles_key = None
+        try:
+            if toasty_kwargs.get("out_dir") is None:
+                out_dir, imgset, tiles_key = await self._tile_cached_async(
+                    fits_list,
+                    progress=on_progress,
+                    hdu_index=hdu_index,
+                    tiling_method=tiling_method,
+                    parallel=parallel,
+                    **toasty_kwargs,
+                )
+            else:
+                out_dir, imgset = await tile_fits_async(
+                    fits_list,
+                    progress=on_progress,
+                    hdu_index=hdu_index,
+                    tiling_method=tiling_method,
+                    parallel=parallel,
+                    **toasty_kwargs,
+                )
+        finally:
+            if bar is not None:
+                bar.close()
+            send_progress(TilingProgress(stage=0, done=0, total=0), finished=True)
+
+        return self._add_tiled_image_layer(
+            out_dir, imgset, name, tiles_key=tiles_key, **kwargs
+        )
+
+    async def _tile_cached_async(
+        self,
+        fits_list,
+        hdu_index=None,
+        tiling_method=None,
+        override=False,
+        progress=None,
+        parallel=None,
+        **kwargs,
+    ):
+        import asyncio
+
+        from .cache import get_disk_cache
+        from .tiling import (
+            default_tile_dir,
+            load_tiles,
+            save_tiles,
+            tile_cache_key,
+            tile_fits_async,
+        )
+
+        cache = get_disk_cache()
+        loop = asyncio.get_running_loop()
+        key = await loop.run_in_executor(
+            None,
+            lambda: tile_cache_key(
+                fits_list, hdu_index=hdu_index, tiling_method=tiling_method, **kwargs
+            ),
+        )
+        if override:
+            await loop.run_in_executor(None, cache.remove, key)
+
+        async with cache.build_async(key) as tmp:
+            if tmp is not None:
+                out_dir, imgset = await tile_fits_async(
+                    fits_list,
+                    progress=progress,
+                    out_dir=path.join(
+                        tmp, path.basename(default_tile_dir(fits_list, tiling_method))
+                    ),
+                    hdu_index=hdu_index,
+                    tiling_method=tiling_method,
+                    parallel=parallel,
+                    **kwargs,
+                )
+                save_tiles(tmp, out_dir, imgset)
+
+        out_dir, imgset = load_tiles(cache.get(key))
+        return out_dir, imgset, key
+
+    def _fits_list(self, image, hdu_index=None):
+        from astropy.io import fits
 
         if isinstance(image, tuple):
             image, wcs = image
-            image = astropy.io.fits.PrimaryHDU(image, wcs.to_header())
+            image = fits.PrimaryHDU(image, wcs.to_header())
 
         # For FITS-y inputs, we create a stable filename to allow caching, which
         # can help to skip expensive processing inside Toasty in case this image
@@ -303,9 +713,9 @@ class LayerManager(object):
         if any(
             isinstance(image, fitsy_type)
             for fitsy_type in [
-                astropy.io.fits.HDUList,
-                astropy.io.fits.ImageHDU,
-                astropy.io.fits.PrimaryHDU,
+                fits.HDUList,
+                fits.ImageHDU,
+                fits.PrimaryHDU,
             ]
         ):
             image = self._write_image_for_toasty(image, hdu_index=hdu_index)
@@ -313,43 +723,35 @@ class LayerManager(object):
         if isinstance(image, str):
             image = [image]
 
-        if (
+        return image
+
+    def _needs_tiling(self, fits_list, tiling_method):
+        from toasty import TilingMethod
+
+        return (
             tiling_method == TilingMethod.TOAST
             or tiling_method == TilingMethod.HIPS
             or tiling_method == TilingMethod.TAN
         ) or (
             tiling_method == TilingMethod.AUTO_DETECT
-            and (len(image) > 1 or Path(image[0]).stat().st_size > 20e6)
-        ):  # 20 MB
-            nest_asyncio.apply()
-            loop = asyncio.get_event_loop()
-            return loop.run_until_complete(
-                self._tile_and_serve(
-                    fits_list=image,
-                    hdu_index=hdu_index,
-                    cli_progress=verbose,
-                    display_name=name,
-                    tiling_method=tiling_method,
-                    **kwargs,
-                )
-            )
-        else:
-            return self._create_and_add_image_layer(
-                image=image[0], hdu_index=hdu_index, name=name, **kwargs
-            )
+            and (len(fits_list) > 1 or Path(fits_list[0]).stat().st_size > 20e6)
+        )  # 20 MB
 
     def _write_image_for_toasty(self, image, hdu_index=None):
+        from .cache import cache_key, get_disk_cache
+
         filename = self._toasty_filename(image, hdu_index=hdu_index)
 
         try:
-            # If the magic filename already exists, assume that we've already
-            # written out the image, and save time by not rewriting this.
-            # Ideally we'd write out the image to a temporary path and rename
-            # atomically to avoid the risk of trying to read an image that some
-            # other process has only half-written.
-            if not Path(filename).is_file():
-                image.writeto(filename)
-            return filename
+            # The image is written to a cache entry named after its content,
+            # so an image that we've already written out (in this session or
+            # another one) isn't written again, and toasty can recognize it.
+            # The entry only appears once the file is complete.
+            entry = get_disk_cache().fetch(
+                cache_key("toasty_input", filename),
+                lambda tmp: image.writeto(path.join(tmp, filename)),
+            )
+            return path.join(entry, filename)
         except OSError:
             if self._tmpdir is None:
                 self._tmpdir = tempfile.TemporaryDirectory()
@@ -360,15 +762,14 @@ class LayerManager(object):
             return filepath
 
     def _toasty_filename(self, image, hdu_index=None):
-        m = self._image_md5(image, hdu_index=hdu_index)
-        hex_string = m.hexdigest()
-        return "toasty_input_{}.fits".format(hex_string)
+        m = self._image_digest(image, hdu_index=hdu_index)
+        return "toasty_input_{}.fits".format(digest_key(m))
 
-    def _image_md5(self, image, hdu_index=None):
-        from hashlib import md5
+    def _image_digest(self, image, hdu_index=None):
+        from astropy.io import fits
 
-        m = md5()
-        if isinstance(image, astropy.io.fits.HDUList):
+        m = new_digest()
+        if isinstance(image, fits.HDUList):
             if hdu_index:
                 image = image[hdu_index]  # delegate to the next stanza
             else:
@@ -384,18 +785,15 @@ class LayerManager(object):
                     if (
                         hasattr(hdu, "shape")
                         and len(hdu.shape) > 1
-                        and not isinstance(hdu, astropy.io.fits.BinTableHDU)
+                        and not isinstance(hdu, fits.BinTableHDU)
                     ):
-                        # We could `break` here, but it seems safer not to? And
-                        # the performance impact should be minimal.
-                        m.update(hdu.data[:65536])
-                        m.update(hdu.header.tostring().encode("utf-8"))
+                        # We could `break` here, but it seems safer not to.
+                        update_digest_with_hdu(m, hdu)
 
-        if isinstance(image, astropy.io.fits.ImageHDU) or isinstance(
-            image, astropy.io.fits.PrimaryHDU
+        if isinstance(image, fits.ImageHDU) or isinstance(
+            image, fits.PrimaryHDU
         ):
-            m.update(image.data[:65536])
-            m.update(image.header.tostring().encode("utf-8"))
+            update_digest_with_hdu(m, image)
         return m
 
     def _create_and_add_image_layer(self, image, **kwargs):
@@ -426,48 +824,100 @@ class LayerManager(object):
 
     # TODO this is not future proof
     def _remove_toasty_keywords(self, **kwargs):
-        kwargs.pop("blankval", None)
-        kwargs.pop("override", None)
-        kwargs.pop("out_dir", None)
-        kwargs.pop("start", None)
+        for key in TOASTY_KEYWORDS:
+            kwargs.pop(key, None)
         return kwargs
 
-    async def _tile_and_serve(
+    def _tile_and_serve(
         self,
         fits_list,
         hdu_index=None,
         cli_progress=True,
         display_name=None,
-        tiling_method=TilingMethod.AUTO_DETECT,
+        tiling_method=None,
+        parallel=None,
         **kwargs,
     ):
-        with warnings.catch_warnings():
-            # Avoid annoying AstroPy FITS-fixed warnings
-            warnings.simplefilter("ignore")
-            out_dir, builder = toasty.tile_fits(
+        import toasty
+
+        def tile(out_dir=None, **toasty_kwargs):
+            with warnings.catch_warnings():
+                # Avoid annoying AstroPy FITS-fixed warnings
+                warnings.simplefilter("ignore")
+                return toasty.tile_fits(
+                    fits_list,
+                    out_dir=out_dir,
+                    hdu_index=hdu_index,
+                    cli_progress=cli_progress,
+                    tiling_method=tiling_method,
+                    parallel=parallel,
+                    **toasty_kwargs,
+                )
+
+        toasty_kwargs = {
+            key: kwargs.pop(key) for key in TOASTY_KEYWORDS if key in kwargs
+        }
+
+        key = None
+        if toasty_kwargs.get("out_dir") is not None:
+            out_dir, builder = tile(**toasty_kwargs)
+            imgset = builder.imgset
+        else:
+            # Tile into the cache, where tiles can be shared between sessions
+            # and kernels. toasty names the image set after its output
+            # directory, so that's what it is named after here too.
+            from .cache import get_disk_cache
+            from .tiling import (
+                default_tile_dir,
+                load_tiles,
+                save_tiles,
+                tile_cache_key,
+            )
+
+            override = toasty_kwargs.pop("override", False)
+            cache = get_disk_cache()
+            key = tile_cache_key(
                 fits_list,
                 hdu_index=hdu_index,
-                cli_progress=cli_progress,
                 tiling_method=tiling_method,
-                **kwargs,
+                **toasty_kwargs,
             )
+            if override:
+                cache.remove(key)
+
+            def write(tmp):
+                out_dir, builder = tile(
+                    out_dir=path.join(
+                        tmp, path.basename(default_tile_dir(fits_list, tiling_method))
+                    ),
+                    **toasty_kwargs,
+                )
+                save_tiles(tmp, out_dir, builder.imgset)
 
-        kwargs = self._remove_toasty_keywords(**kwargs)
-        url = self._parent._serve_tree(path=out_dir)
+            out_dir, imgset = load_tiles(cache.fetch(key, write))
+
+        return self._add_tiled_image_layer(
+            out_dir, imgset, display_name, tiles_key=key, **kwargs
+        )
 
-        self._parent.load_image_collection(url=url + "index.wtml", remote_only=True)
+    def _add_tiled_image_layer(
+        self, out_dir, imgset, display_name=None, tiles_key=None, **kwargs
+    ):
+        url = self._parent._serve_tree(path=out_dir, key=tiles_key)
+
+        self._parent.load_image_collection(url=url + "index.wtml")
 
         if display_name is None:
-            display_name = builder.imgset.name
+            display_name = imgset.name
 
         image_layer = self.add_preloaded_image_layer(
-            url + builder.imgset.url, name=display_name, **kwargs
+            url + imgset.url, name=display_name, **kwargs
         )
-        if builder.imgset.pixel_cut_low > 0 or builder.imgset.pixel_cut_low < 0:
-            image_layer.vmin = builder.imgset.pixel_cut_low
-            image_layer.vmax = builder.imgset.pixel_cut_high
-            image_layer._data_min = builder.imgset.data_min
-            image_layer._data_max = builder.imgset.data_max
+        if imgset.pixel_cut_low > 0 or imgset.pixel_cut_low < 0:
+            image_layer.vmin = imgset.pixel_cut_low
+            image_layer.vmax = imgset.pixel_cut_high
+            image_layer._data_min = imgset.data_min
+            image_layer._data_max = imgset.data_max
 
         return image_layer
 
@@ -492,14 +942,7 @@ class LayerManager(object):
         layer : :class:`~pywwt.layers.TableLayer`
         """
 
-        # Validate frame
-        if frame.lower() not in VALID_FRAMES:
-            raise ValueError(
-                "frame should be one of {0}".format(
-                    "/".join(sorted(str(x) for x in VALID_FRAMES))
-                )
-            )
-        frame = frame.capitalize()
+        frame = self._validate_frame(frame)
 
         if table is not None:
             layer = TableLayer(self._parent, table=table, frame=frame, **kwargs)
@@ -510,6 +953,101 @@ class LayerManager(object):
         self._add_layer(layer)
         return layer
 
+    def add_table_layers(self, tables, frame="Sky", **kwargs):
+        """
+        Add several data layers to the current view, with the same settings.
+
+        This is much faster than calling `add_table_layer` for each table: the
+        frame and settings are checked once rather than for each layer, and
+        all the layers reach the viewer in a single message. If any of the
+        layers can't be created, none are.
+
+        Parameters
+        ----------
+        tables : iterable of :class:`~astropy.table.Table`
+            The tables containing the data to show, one per layer.
+        frame : str
+            The reference frame to use for the data. See `add_table_layer`.
+        kwargs
+            Additional keyword arguments can be used to set properties on all
+            the table layers.
+
+        Returns
+        -------
+        layers : list of :class:`~pywwt.layers.TableLayer`
+        """
+        frame = self._validate_frame(frame)
+        validate_traits(
+            TableLayer,
+            {key: value for key, value in kwargs.items() if key not in TABLE_OPTIONS},
+        )
+
+        layers = []
+        with self._parent.batch(discard_on_error=True):
+            try:
+                for table in tables:
+                    layers.append(
+                        TableLayer(
+                            self._parent,
+                            table=table,
+                            frame=frame,
+                            _validated=True,
+                            **kwargs,
+                        )
+                    )
+            except BaseException:
+                # None of the messages of the batch are sent, so this only
+                # cleans up after the layers on our side.
+                for layer in layers:
+                    layer.remove()
+                raise
+
+            for layer in layers:
+                self._add_layer(layer)
+
+        return layers
+
+    def add_density_layer(self, table=None, frame="Sky", **kwargs):
+        """
+        Add a layer showing the density of a catalog, binned into HEALPix
+        pixels.
+
+        This is meant for tables with too many rows to show as markers:
+        only the non-empty pixels are sent to the viewer.
+
+        Parameters
+        ----------
+        table : :class:`~astropy.table.Table`
+            The table containing the catalog.
+        frame : str
+            The reference frame to use for the data. See `add_table_layer`.
+        kwargs
+            Additional keyword arguments can be used to set properties on the
+            density layer, such as ``order``, ``aggregate`` and ``value_att``.
+
+        Returns
+        -------
+        layer : :class:`~pywwt.layers.DensityLayer`
+        """
+
+        frame = self._validate_frame(frame)
+
+        if table is None:
+            raise ValueError("The table argument is required")
+
+        layer = DensityLayer(self._parent, table=table, frame=frame, **kwargs)
+        self._add_layer(layer)
+        return layer
+
+    def _validate_frame(self, frame):
+        if frame.lower() not in VALID_FRAMES:
+            raise ValueError(
+                "frame should be one of {0}".format(
+                    "/".join(sorted(str(x) for x in VALID_FRAMES))
+                )
+            )
+        return frame.capitalize()
+
     async def __add_hips_catalog_layer(self, name, **kwargs):
         """
         Add a HiPS catalog layer to the current view.
@@ -578,45 +1116,145 @@ class LayerManager(object):
         return self.add_table_layer(*args, **kwargs)
 
     def _add_layer(self, layer):
-        if layer in self._layers:
+        if layer.id in self._layers:
             raise ValueError("layer already exists in layer manager")
-        self._layers.append(layer)
+        self._layers[layer.id] = layer
         layer._manager = self
 
+    def _resolve(self, layer):
+        # Accept layers or their IDs, and check that they're ours.
+        if isinstance(layer, str):
+            found = self._layers.get(layer)
+            if found is None:
+                raise ValueError(
+                    "no layer with ID {0!r} in layer manager".format(layer)
+                )
+            return found
+        if self._layers.get(layer.id) is not layer:
+            raise ValueError("layer not in layer manager")
+        return layer
+
+    def get(self, id, default=None):
+        """
+        Return the layer with the given ID, or ``default`` if there isn't one.
+
+        Parameters
+        ----------
+        id : str
+            The ID of the layer.
+        default : optional
+            What to return if there is no such layer.
+        """
+        return self._layers.get(id, default)
+
     def remove_layer(self, layer):
         """
         Remove a layer from the view.
 
         Parameters
         ----------
-        layer : :class:`TableLayer` or :class:`ImageLayer`
-            The layer to remove.
+        layer : :class:`TableLayer`, :class:`ImageLayer` or str
+            The layer to remove, or its ID.
         """
 
-        if layer not in self._layers:
-            raise ValueError("layer not in layer manager")
+        layer = self._resolve(layer)
         layer.remove()
         # By this point, the call to remove() above may already have resulted
         # in the layer getting removed, so we check first if it's still present.
-        if layer in self._layers:
-            self._layers.remove(layer)
+        self._layers.pop(layer.id, None)
+
+    def remove_layers(self, layers=None):
+        """
+        Remove several layers from the view, in a single message.
+
+        Parameters
+        ----------
+        layers : iterable of :class:`TableLayer`, :class:`ImageLayer` or str, optional
+            The layers to remove, or their IDs. By default, all the layers
+            are removed.
+        """
+        if layers is None:
+            layers = list(self._layers.values())
+        else:
+            layers = [self._resolve(layer) for layer in layers]
+
+        with self._parent.batch():
+            for layer in layers:
+                self.remove_layer(layer)
+
+    @property
+    def draw_order(self):
+        """
+        The image layers, in the order they are drawn: each layer is drawn on
+        top of the ones before it.
+        """
+        return [layer for layer in self if isinstance(layer, ImageLayer)]
+
+    def set_draw_order(self, layers):
+        """
+        Change the order in which image layers are drawn, in a single message.
+
+        Parameters
+        ----------
+        layers : iterable of :class:`ImageLayer` or str
+            Image layers, or their IDs, from the bottom one up. They are drawn
+            below the image layers that aren't listed, which keep their
+            relative order.
+        """
+        layers = [self._resolve(layer) for layer in layers]
+
+        ids = set()
+        for layer in layers:
+            if not isinstance(layer, ImageLayer):
+                raise TypeError("only image layers can be reordered")
+            if layer.id in ids:
+                raise ValueError("layer {0!r} is listed twice".format(layer.id))
+            ids.add(layer.id)
+
+        order = layers + [layer for layer in self.draw_order if layer.id not in ids]
+
+        # Give the image layers their new slots, leaving the other layers in
+        # place.
+        slots = iter(order)
+        reordered = [
+            next(slots) if isinstance(layer, ImageLayer) else layer for layer in self
+        ]
+        self._layers = OrderedDict((layer.id, layer) for layer in reordered)
+
+        self._order_version += 1
+        self._parent._send_msg(
+            event="image_layer_order_multi",
+            ids=[layer.id for layer in order],
+            version=self._order_version,
+        )
 
     def __len__(self):
         return len(self._layers)
 
     def __iter__(self):
-        for layer in self._layers:
+        for layer in self._layers.values():
             yield layer
 
     def __getitem__(self, item):
-        return self._layers[item]
+        if isinstance(item, slice):
+            return list(self._layers.values())[item]
+
+        # Walk to the layer from the nearest end rather than copying them all.
+        item = operator.index(item)
+        if item < 0:
+            layers, skip = reversed(self._layers.values()), -item - 1
+        else:
+            layers, skip = iter(self._layers.values()), item
+        for layer in itertools.islice(layers, skip, None):
+            return layer
+        raise IndexError("layer index out of range")
 
     def __str__(self):
         if len(self) == 0:
             return "Layer manager with no layers"
         else:
             s = "Layer manager with {0} layers:\n\n".format(len(self))
-            for ilayer, layer in enumerate(self._layers):
+            for ilayer, layer in enumerate(self):
                 s += "  [{0}]: {1}\n".format(ilayer, layer)
             return s
 
@@ -624,13 +1262,13 @@ class LayerManager(object):
 
     def _serialize_state(self):
         layer_states = []
-        for layer in self._layers:
+        for layer in self:
             layer_states.append(layer._serialize_state())
 
         return layer_states
 
     def _save_all_data_for_serialization(self, dir):
-        for layer in self._layers:
+        for layer in self:
             layer._save_data_for_serialization(dir)
 
 
@@ -715,7 +1353,6 @@ class TableLayer(HasTraits):
         allow_none=True,
     ).tag(wwt=None)
     cmap = Any(
-        cm.viridis,
         help="The Matplotlib colormap (:class:`matplotlib.colors.ListedColormap`)",
     ).tag(wwt=None)
 
@@ -763,6 +1400,15 @@ class TableLayer(HasTraits):
         True, help="Whether sources in the layer are selectable (`bool`)"
     ).tag(wwt=None)
 
+    lod = Bool(
+        False,
+        help="Whether to only send a sample of the rows in view, refined as the "
+        "view zooms in, for tables too big to show in full (`bool`)",
+    ).tag(wwt=None)
+    lod_budget = Int(
+        100000, help="The maximum number of rows shown in LOD mode (`int`)"
+    ).tag(wwt=None)
+
     # TODO: support:
     # xAxisColumn
     # yAxisColumn
@@ -778,13 +1424,26 @@ class TableLayer(HasTraits):
         frame=None,
         table_from_wwt_engine=False,
         id=None,
+        binary=False,
+        project_columns=False,
+        _validated=False,
         **kwargs,
     ):
         self.table = table
         self.notify_changes = True
 
-        # Validate frame
-        if frame.lower() not in VALID_FRAMES:
+        # Whether to send the table data as raw column buffers rather than as
+        # base64-encoded CSV.
+        self.binary = binary
+
+        # Whether to only send the columns that the layer renders, rather than
+        # the whole table. We keep track of the columns that the frontend has
+        # so that columns picked later on can be sent by themselves.
+        self.project_columns = project_columns
+        self._sent_columns = set()
+
+        # Validate frame, unless the caller already has (along with the kwargs)
+        if not _validated and frame.lower() not in VALID_FRAMES:
             raise ValueError(
                 "frame should be one of {0}".format(
                     "/".join(sorted(str(x) for x in VALID_FRAMES))
@@ -798,60 +1457,101 @@ class TableLayer(HasTraits):
             id = str(uuid.uuid4())
         self.id = id
 
+        # Older frontends get whole-table updates in place of column changes,
+        # which the widget builds from the layer.
+        self.parent._table_layers[self.id] = self
+
         # Attribute to keep track of the manager, so that we can notify the
         # manager if a layer is removed.
         self._manager = None
         self._removed = False
 
-        if not table_from_wwt_engine:
-            self._initialize_layer()
-
-            # Force defaults
-            self._on_trait_change({"name": "alt_type", "new": self.alt_type})
-            self._on_trait_change({"name": "size_scale", "new": self.size_scale})
-            self._on_trait_change({"name": "color", "new": self.color})
-            self._on_trait_change({"name": "opacity", "new": self.opacity})
-            self._on_trait_change({"name": "marker_type", "new": self.marker_type})
-            self._on_trait_change({"name": "marker_scale", "new": self.marker_scale})
-            self._on_trait_change(
-                {"name": "far_side_visible", "new": self.far_side_visible}
-            )
-            self._on_trait_change({"name": "size_att", "new": self.size_att})
-            self._on_trait_change({"name": "cmap_att", "new": self.cmap_att})
-            self._on_trait_change({"name": "time_att", "new": self.time_att})
-            self._on_trait_change({"name": "time_series", "new": self.time_series})
-            self._on_trait_change({"name": "time_decay", "new": self.time_decay})
+        # In LOD mode: the index of the positions and what it was built from,
+        # the rows shown, the table of those rows, and the view they were
+        # picked for.
+        self._lod_index = None
+        self._lod_source = None
+        self._lod_rows = None
+        self._lod_table = None
+        self._lod_view = None
+        self._lod_subscription = None
+
+        # The larger table that the table is a view of once rows have been
+        # appended, with spare room for more: the larger table, where the
+        # view starts, and the view's columns, to tell if it has changed.
+        self._row_buffer = None
+
+        # Send the layer's initial settings as a single message, or nothing if
+        # the layer can't be created.
+        with self.parent.batch(discard_on_error=True):
+            if not table_from_wwt_engine:
+                atts = self._guess_coordinate_columns(kwargs)
+                atts.update((att, kwargs[att]) for att in COLUMN_ATTS if att in kwargs)
+
+                # Only the rows in view are ever sent in LOD mode.
+                if kwargs.get("lod", False):
+                    self._build_lod_index(
+                        atts.get("lon_att"), atts.get("lat_att"), kwargs.get("lon_unit")
+                    )
+                    self._pick_lod_rows(kwargs.get("lod_budget", self.lod_budget))
+
+                self._initialize_layer(atts)
+
+                # Force defaults
+                self._on_trait_change({"name": "alt_type", "new": self.alt_type})
+                self._on_trait_change({"name": "size_scale", "new": self.size_scale})
+                self._on_trait_change({"name": "color", "new": self.color})
+                self._on_trait_change({"name": "opacity", "new": self.opacity})
+                self._on_trait_change({"name": "marker_type", "new": self.marker_type})
+                self._on_trait_change(
+                    {"name": "marker_scale", "new": self.marker_scale}
+                )
+                self._on_trait_change(
+                    {"name": "far_side_visible", "new": self.far_side_visible}
+                )
+                self._on_trait_change({"name": "size_att", "new": self.size_att})
+                self._on_trait_change({"name": "cmap_att", "new": self.cmap_att})
+                self._on_trait_change({"name": "time_att", "new": self.time_att})
+                self._on_trait_change({"name": "time_series", "new": self.time_series})
+                self._on_trait_change({"name": "time_decay", "new": self.time_decay})
 
-            self._on_trait_change({"name": "cmap", "new": self.cmap})
+                self._on_trait_change({"name": "cmap", "new": self.cmap})
 
-        self.observe(self._on_trait_change, type="change")
+            self.observe(self._on_trait_change, type="change")
 
-        # Check that all kwargs are valid -- throws error if not
-        validate_traits(self, kwargs)
-
-        super(TableLayer, self).__init__(**kwargs)
+            # Check that all kwargs are valid -- throws error if not
+            if not _validated:
+                validate_traits(self, kwargs)
 
-        if not table_from_wwt_engine:
-            if kwargs.get("coord_type") == "rectangular":
-                x_guess, y_guess, z_guess = guess_xyz_columns(self.table.colnames)
+            super(TableLayer, self).__init__(**kwargs)
 
-                if "x_att" not in kwargs:
-                    self.x_att = x_guess or self.table.colnames[0]
+            if not table_from_wwt_engine:
+                for att, colname in self._guess_coordinate_columns(kwargs).items():
+                    setattr(self, att, colname)
 
-                if "y_att" not in kwargs:
-                    self.y_att = y_guess or self.table.colnames[1]
+    @contextmanager
+    def hold_trait_notifications(self):
+        # Changes made while notifications are held reach the frontend as
+        # one multi-setting message once they are released.
+        with self.parent.batch(), super().hold_trait_notifications():
+            yield
 
-                if "z_att" not in kwargs:
-                    self.z_att = z_guess or self.table.colnames[2]
-
-            else:
-                lon_guess, lat_guess = guess_lon_lat_columns(self.table.colnames)
+    def _guess_coordinate_columns(self, kwargs):
+        """
+        Pick the coordinate columns that weren't specified in ``kwargs``.
+        """
+        colnames = self.table.colnames
 
-                if "lon_att" not in kwargs:
-                    self.lon_att = lon_guess or self.table.colnames[0]
+        if kwargs.get("coord_type") == "rectangular":
+            guesses = zip(("x_att", "y_att", "z_att"), guess_xyz_columns(colnames))
+        else:
+            guesses = zip(("lon_att", "lat_att"), guess_lon_lat_columns(colnames))
 
-                if "lat_att" not in kwargs:
-                    self.lat_att = lat_guess or self.table.colnames[1]
+        return {
+            att: guess or colnames[index]
+            for index, (att, guess) in enumerate(guesses)
+            if att not in kwargs
+        }
 
     @validate("coord_type")
     def _check_coord_type(self, proposal):
@@ -906,30 +1606,15 @@ class TableLayer(HasTraits):
 
     @validate("time_att")
     def _check_time_att(self, proposal):
-        # Parse the time_att column and make sure it's in the proper format
-        # (string in isot format, astropy Time, or datetime)
-        col = self._get_table()[proposal["value"]]
-
-        if all(isinstance(t, datetime) for t in col) or all(
-            isinstance(t, Time) for t in col
-        ):
+        # Make sure the time_att column is in a supported format (string in
+        # isot format, astropy Time, datetime64, or datetime). Only a sample
+        # of its values is parsed here; the whole column is parsed once, when
+        # it is converted for WWT.
+        if not proposal["value"]:
             return proposal["value"]
-
-        elif isinstance(col, STR_TYPE) or np.issubdtype(col.dtype, NP_STR_TYPE):
-            try:
-                Time(col, format="isot")
-                return proposal["value"]
-            except ValueError:
-                raise ValueError(
-                    "String times must conform to the ISOT"
-                    "standard (YYYY-MM-DD`T`HH:MM:SS:MS)"
-                )
-
-        else:
-            raise ValueError(
-                "A time column must only have string, "
-                "datetime.datetime, or astropy Time values"
-            )
+        col = self._get_table()[proposal["value"]]
+        ensure_utc_column(col[:TIME_SAMPLE_SIZE])
+        return proposal["value"]
 
     @validate("time_decay")
     def _check_decay(self, proposal):
@@ -1034,10 +1719,19 @@ class TableLayer(HasTraits):
                 )
             )
 
+    @default("cmap")
+    def _default_cmap(self):
+        from matplotlib import cm
+
+        return cm.viridis
+
     @validate("cmap")
     def _check_cmap(self, proposal):
+        from matplotlib import colormaps
+        from matplotlib.colors import Colormap
+
         if isinstance(proposal["value"], str):
-            return cm.get_cmap(proposal["value"])
+            return colormaps[proposal["value"]]
         elif not isinstance(proposal["value"], Colormap):
             raise TypeError("cmap should be set to a Matplotlib colormap")
         else:
@@ -1068,46 +1762,55 @@ class TableLayer(HasTraits):
         if not self.notify_changes:
             return
 
-        if self._uniform_size():
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="sizeColumn", value=-1
-            )
-        else:
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="pointScaleType", value=0
-            )
+        with self.parent.batch():
+            if self._uniform_size():
+                self.parent._send_msg(
+                    event="table_layer_set", id=self.id, setting="sizeColumn", value=-1
+                )
+            else:
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="pointScaleType",
+                    value=0,
+                )
 
-            self.parent._send_msg(
-                event="table_layer_set",
-                id=self.id,
-                setting="sizeColumn",
-                value=self.size_att,
-            )
+                self._ensure_columns(self.size_att)
 
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="normalizeSize", value=True
-            )
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="sizeColumn",
+                    value=self.size_att,
+                )
 
-            self.parent._send_msg(
-                event="table_layer_set",
-                id=self.id,
-                setting="normalizeSizeClip",
-                value=True,
-            )
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="normalizeSize",
+                    value=True,
+                )
 
-            self.parent._send_msg(
-                event="table_layer_set",
-                id=self.id,
-                setting="normalizeSizeMin",
-                value=self.size_vmin,
-            )
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="normalizeSizeClip",
+                    value=True,
+                )
 
-            self.parent._send_msg(
-                event="table_layer_set",
-                id=self.id,
-                setting="normalizeSizeMax",
-                value=self.size_vmax,
-            )
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="normalizeSizeMin",
+                    value=self.size_vmin,
+                )
+
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="normalizeSizeMax",
+                    value=self.size_vmax,
+                )
 
     @observe("cmap_att")
     def _on_cmap_att_change(self, *value):
@@ -1116,24 +1819,28 @@ class TableLayer(HasTraits):
         if not self.notify_changes:
             return
 
-        if len(self.cmap_att) == 0:
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="colorMapColumn", value=-1
-            )
+        with self.parent.batch():
+            if len(self.cmap_att) == 0:
+                self.parent._send_msg(
+                    event="table_layer_set",
+                    id=self.id,
+                    setting="colorMapColumn",
+                    value=-1,
+                )
 
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="colorMap", value=0
-            )
+                self.parent._send_msg(
+                    event="table_layer_set", id=self.id, setting="colorMap", value=0
+                )
 
-            return
+                return
 
-        self.cmap_vmin = None
-        self.cmap_vmax = None
+            self.cmap_vmin = None
+            self.cmap_vmax = None
 
-        column = self._get_table()[self.cmap_att]
+            column = self._get_table()[self.cmap_att]
 
-        self.cmap_vmin = np.nanmin(column)
-        self.cmap_vmax = np.nanmax(column)
+            self.cmap_vmin = np.nanmin(column)
+            self.cmap_vmax = np.nanmax(column)
 
     @observe("cmap_vmin", "cmap_vmax", "cmap")
     def _on_cmap_vmin_vmax_change(self, *value):
@@ -1142,92 +1849,103 @@ class TableLayer(HasTraits):
         if not self.notify_changes:
             return
 
-        if self._uniform_color():
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="colorMapColumn", value=-1
-            )
-
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="colorMap", value=0
-            )
-
-        else:
-            self.parent._send_msg(
-                event="table_layer_set", id=self.id, setting="colorMap", value=3
-            )
-
-            if self.cmap.name.lower() in VALID_COLORMAPS:
+        with self.parent.batch():
+            if self._uniform_color():
                 self.parent._send_msg(
                     event="table_layer_set",
                     id=self.id,
                     setting="colorMapColumn",
-                    value=self.cmap_att,
+                    value=-1,
                 )
 
                 self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="colorMapperName",
-                    value=self.cmap.name,
+                    event="table_layer_set", id=self.id, setting="colorMap", value=0
                 )
 
+            else:
                 self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="dynamicColor",
-                    value=True,
+                    event="table_layer_set", id=self.id, setting="colorMap", value=3
                 )
 
-                self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="normalizeColorMap",
-                    value=True,
-                )
+                if self.cmap.name.lower() in VALID_COLORMAPS:
+                    self._ensure_columns(self.cmap_att)
 
-                self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="normalizeColorMapMin",
-                    value=self.cmap_vmin,
-                )
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="colorMapColumn",
+                        value=self.cmap_att,
+                    )
 
-                self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="normalizeColorMapMax",
-                    value=self.cmap_vmax,
-                )
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="colorMapperName",
+                        value=self.cmap.name,
+                    )
 
-            else:
-                table = self._get_table()
-                column = table[self.cmap_att]
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="dynamicColor",
+                        value=True,
+                    )
 
-                values = (column - self.cmap_vmin) / (self.cmap_vmax - self.cmap_vmin)
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="normalizeColorMap",
+                        value=True,
+                    )
 
-                # PERF: vectorize the calculation of the hex strings
-                rgb = self.cmap(values)[:, :-1]
-                hex_values = [to_hex(x) for x in rgb]
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="normalizeColorMapMin",
+                        value=self.cmap_vmin,
+                    )
 
-                table[CMAP_COLUMN_NAME] = hex_values
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="normalizeColorMapMax",
+                        value=self.cmap_vmax,
+                    )
 
-                self.parent._send_msg(
-                    event="table_layer_update", id=self.id, table=self._table_b64
-                )
+                else:
+                    # The colors depend on several settings, which often
+                    # change together: they are only worked out, and sent,
+                    # once per batch.
+                    self.parent._send_deferred(
+                        (self.id, CMAP_COLUMN_NAME), self._update_cmap_column
+                    )
 
-                self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="dynamicColor",
-                    value=False,
-                )
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="dynamicColor",
+                        value=False,
+                    )
 
-                self.parent._send_msg(
-                    event="table_layer_set",
-                    id=self.id,
-                    setting="colorMapColumn",
-                    value=CMAP_COLUMN_NAME,
-                )
+                    self.parent._send_msg(
+                        event="table_layer_set",
+                        id=self.id,
+                        setting="colorMapColumn",
+                        value=CMAP_COLUMN_NAME,
+                    )
+
+    def _update_cmap_column(self):
+        if (
+            self._removed
+            or self._uniform_color()
+            or self.cmap.name.lower() in VALID_COLORMAPS
+        ):
+            # The colors are no longer needed.
+            return
+
+        column = self._get_table()[self.cmap_att]
+        hex_values = cmap_hex_values(self.cmap, column, self.cmap_vmin, self.cmap_vmax)
+        self.update_column(CMAP_COLUMN_NAME, hex_values)
 
     @observe("time_att")
     def _on_time_att_change(self, *value):
@@ -1241,19 +1959,20 @@ class TableLayer(HasTraits):
             )
             return
 
-        wwt_times = Column(self._get_table()[self.time_att].copy()).tolist()
-        # must specify Column so we can use tolist() on astropy Time columns
-
-        # Convert time column to UTC so WWT displays points at expected times
-        for i, tm in enumerate(wwt_times):
-            wwt_times[i] = ensure_utc(tm, str_allowed=True)
+        # Convert time column to UTC so WWT displays points at expected times.
+        # Only a sample of the column was checked before time_att was set, so
+        # this can still fail: go back to the previous column, whose values
+        # WWT still has.
+        try:
+            wwt_times = ensure_utc_column(self._get_table()[self.time_att])
+        except ValueError:
+            previous = (value[0]["old"] or "") if value else ""
+            if previous != self.time_att:
+                self.time_att = previous
+            raise
 
         # Update the table passed to WWT with the new, modified time column
-        self._get_table()[TIME_COLUMN_NAME] = Column(wwt_times)
-
-        self.parent._send_msg(
-            event="table_layer_update", id=self.id, table=self._table_b64
-        )
+        self.update_column(TIME_COLUMN_NAME, wwt_times)
 
         self.parent._send_msg(
             event="table_layer_set",
@@ -1272,16 +1991,180 @@ class TableLayer(HasTraits):
         )
 
     def _get_table(self):
+        if self._lod_table is not None:
+            return self._lod_table
         return self.table
 
-    @property
-    def _table_b64(self):
+    # Level of detail
+
+    def _lod_lon_unit(self, lon_att, lon_unit=None):
+        # The unit of longitudes, as WWT will read them.
+        if lon_unit is None:
+            lon_unit = pick_unit_if_available(self.table[lon_att].unit, VALID_LON_UNITS)
+        return u.Unit(lon_unit) if lon_unit in VALID_LON_UNITS else u.deg
+
+    def _build_lod_index(self, lon_att, lat_att, lon_unit=None):
+        from .lod import LODIndex
+
+        if self.frame != "Sky" or not lon_att or not lat_att:
+            raise ValueError("LOD mode needs spherical coordinates in the Sky frame")
+
+        lon_unit = self._lod_lon_unit(lon_att, lon_unit)
+        lon = np.asarray(self.table[lon_att], dtype=float)
+        if lon_unit != u.deg:
+            lon = lon * 15
+
+        self._lod_index = LODIndex(lon, np.asarray(self.table[lat_att], dtype=float))
+        self._lod_source = (lon_att, lat_att, lon_unit)
+        self._lod_rows = None
+        self._lod_view = None
+
+    def _pick_lod_rows(self, budget=None):
+        """
+        Pick the rows to show for the current view, returning whether they
+        changed.
+        """
+        view = self.parent.get_camera_state()
+        rows = self._lod_index.select(
+            view.ra, view.dec, LOD_MARGIN * view.fov, budget or self.lod_budget
+        )
+        self._lod_view = view
+
+        if self._lod_rows is not None and np.array_equal(rows, self._lod_rows):
+            return False
+
+        table = self.table[rows]
+        for name, values in self._derived_columns(table).items():
+            table[name] = values
+
+        self._lod_rows = rows
+        self._lod_table = table
+        return True
+
+    def _on_lod_view_change(self, widget, view):
+        last = self._lod_view
+        if last is not None and view.fov > last.fov / 2:
+            # Keep the rows while the view stays in the cone they cover and
+            # isn't zoomed in enough to need more detail.
+            distance = np.degrees(
+                np.arccos(
+                    np.clip(
+                        np.sin(np.radians(view.dec)) * np.sin(np.radians(last.dec))
+                        + np.cos(np.radians(view.dec))
+                        * np.cos(np.radians(last.dec))
+                        * np.cos(np.radians(view.ra - last.ra)),
+                        -1,
+                        1,
+                    )
+                )
+            )
+            if distance + view.fov <= LOD_MARGIN * last.fov:
+                return
+
+        if self._pick_lod_rows():
+            self._update_layer()
+
+    @observe("lod")
+    def _on_lod_change(self, changed):
+        if not self.notify_changes:
+            return
+
+        if changed["new"]:
+            if self._lod_index is None:
+                self._build_lod_index(self.lon_att, self.lat_att, self.lon_unit)
+                self._pick_lod_rows()
+                self._update_layer()
+            if self._lod_subscription is None:
+                self._lod_subscription = self.parent.subscribe_camera(
+                    self._on_lod_view_change, max_rate=LOD_UPDATE_RATE
+                )
+        else:
+            if self._lod_subscription is not None:
+                self._lod_subscription.cancel()
+                self._lod_subscription = None
+
+            derived = self._derived_columns(self.table)
+            self._lod_index = self._lod_source = None
+            self._lod_rows = self._lod_table = self._lod_view = None
+            for name, values in derived.items():
+                self.table[name] = values
+            self._update_layer()
+
+    @observe("lod_budget")
+    def _on_lod_budget_change(self, changed):
+        if self.notify_changes and self._lod_index is not None:
+            self._lod_rows = None
+            self._pick_lod_rows()
+            self._update_layer()
+
+    @observe("lon_att", "lat_att", "lon_unit")
+    def _on_lod_positions_change(self, changed):
+        if not self.notify_changes or self._lod_index is None:
+            return
+        if not self.lon_att or not self.lat_att:
+            # Wait for both columns to be picked.
+            return
+
+        lon_unit = self._lod_lon_unit(self.lon_att, self.lon_unit)
+        if self._lod_source != (self.lon_att, self.lat_att, lon_unit):
+            self._build_lod_index(self.lon_att, self.lat_att, self.lon_unit)
+            self._pick_lod_rows()
+            self._update_layer()
+
+    def _table_b64(self, colnames):
         # TODO: We need to make sure that the table has ra/dec columns since
         # WWT absolutely needs that upon creation.
 
-        csv = csv_table_win_newline(self._get_table())
+        table = self._get_table()
+        if colnames != table.colnames:
+            table = table[colnames]
+
+        return csv_table_b64(table)
+
+    def _transport_columns(self, atts=None):
+        """
+        The names of the columns to send to the frontend: either the whole
+        table or, when projecting, only the columns that ``atts`` (by default
+        the current column traits) refer to, plus our derived columns.
+        """
+        colnames = self._get_table().colnames
+
+        if not self.project_columns:
+            return colnames
+
+        if atts is None:
+            atts = {att: getattr(self, att) for att in COLUMN_ATTS}
 
-        return b64encode(csv.encode("ascii", errors="replace")).decode("ascii")
+        needed = set(atts.values()) | {CMAP_COLUMN_NAME, TIME_COLUMN_NAME}
+        return [colname for colname in colnames if colname in needed]
+
+    def _ensure_columns(self, *colnames):
+        # When projecting, send any columns the frontend doesn't have yet
+        # before a setting refers to them.
+        if not self.project_columns:
+            return
+
+        table = self._get_table()
+        missing = [
+            colname
+            for colname in colnames
+            if colname
+            and colname not in self._sent_columns
+            and colname in table.colnames
+        ]
+
+        if missing:
+            self._upsert_columns(missing)
+
+    def _upsert_columns(self, colnames):
+        columns, buffers = binary_table_columns(self._get_table(), colnames)
+        self.parent._send_msg(
+            event="table_layer_upsert_columns",
+            id=self.id,
+            columns=columns,
+            buffers=buffers,
+        )
+        self._sent_columns.update(colnames)
 
     def _uniform_color(self):
         return not self.cmap_att or self.cmap_vmin is None or self.cmap_vmax is None
@@ -1289,22 +2172,63 @@ class TableLayer(HasTraits):
     def _uniform_size(self):
         return not self.size_att or self.size_vmin is None or self.size_vmax is None
 
-    def _initialize_layer(self):
-        self.parent._send_msg(
-            event="table_layer_create",
-            id=self.id,
-            table=self._table_b64,
-            frame=self.frame,
-        )
+    def _initialize_layer(self, atts=None):
+        colnames = self._transport_columns(atts)
+
+        if self.binary:
+            columns, buffers = binary_table_columns(self._get_table(), colnames)
+            self.parent._send_msg(
+                event="table_layer_create_binary",
+                id=self.id,
+                columns=columns,
+                frame=self.frame,
+                buffers=buffers,
+            )
+        else:
+            self.parent._send_msg(
+                event="table_layer_create",
+                id=self.id,
+                table=self._table_b64(colnames),
+                frame=self.frame,
+            )
+
+        self._sent_columns = set(colnames)
+
+    def _update_layer(self):
+        colnames = self._transport_columns()
+
+        if self.binary:
+            columns, buffers = binary_table_columns(self._get_table(), colnames)
+            self.parent._send_msg(
+                event="table_layer_update_binary",
+                id=self.id,
+                columns=columns,
+                buffers=buffers,
+            )
+        else:
+            self.parent._send_msg(
+                event="table_layer_update", id=self.id, table=self._table_b64(colnames)
+            )
+
+        self._sent_columns = set(colnames)
 
     def update_data(self, table=None):
         """
         Update the underlying data.
         """
         self.table = table.copy(copy_data=False)
-        self.parent._send_msg(
-            event="table_layer_update", id=self.id, table=self._table_b64
-        )
+        if self._lod_index is not None:
+            # Index the columns that the layer will use, as picked below.
+            colnames = self.table.colnames
+            lon_att, lat_att, _ = self._lod_source
+            lon_guess, lat_guess = guess_lon_lat_columns(colnames)
+            if lon_att not in colnames:
+                lon_att = lon_guess or colnames[0]
+            if lat_att not in colnames:
+                lat_att = lat_guess or colnames[1]
+            self._build_lod_index(lon_att, lat_att, self.lon_unit)
+            self._pick_lod_rows()
+        self._update_layer()
 
         if len(self.alt_att) > 0:
             if self.alt_att in self.table.colnames:
@@ -1322,6 +2246,144 @@ class TableLayer(HasTraits):
         if self.lat_att not in self.table.colnames:
             self.lat_att = lat_guess or self.table.colnames[1]
 
+    def update_column(self, name, values=None):
+        """
+        Add or replace a single column of the underlying data.
+
+        Only this column is sent to the viewer, so this is much cheaper than
+        :meth:`update_data` when just one column of a large table changes.
+
+        Parameters
+        ----------
+        name : str
+            The name of the column.
+        values : array-like, optional
+            The new values of the column, one per row of the table. If not
+            given, the current contents of the column are sent.
+        """
+        if values is not None:
+            self._get_table()[name] = values
+        self._upsert_columns([name])
+
+    def append_rows(self, rows, max_rows=None):
+        """
+        Add rows at the end of the underlying data.
+
+        Only the new rows are sent to the viewer, and the layer's settings are
+        left as they are, so this is much cheaper than :meth:`update_data`
+        for tables that grow over time. The color and size ranges aren't
+        updated for the new rows.
+
+        The table keeps spare room for new rows, of up to its own size, so
+        that each call only costs in proportion to the number of rows added,
+        on average. After this, ``table`` is a view of that larger table.
+
+        Parameters
+        ----------
+        rows : :class:`~astropy.table.Table`
+            The rows to add, with the same columns as the table.
+        max_rows : int, optional
+            If given, the oldest rows are dropped so that the table keeps at
+            most this many rows.
+        """
+        from astropy.table import Table
+
+        if self.lod:
+            raise ValueError("rows can't be appended to a layer in LOD mode")
+        if max_rows is not None and max_rows < 0:
+            raise ValueError("max_rows should be non-negative")
+
+        rows = Table(rows, copy=False)
+        table = self._get_table()
+
+        expected = [
+            name
+            for name in table.colnames
+            if name not in (CMAP_COLUMN_NAME, TIME_COLUMN_NAME)
+        ]
+        if sorted(rows.colnames) != sorted(expected):
+            raise ValueError(
+                "rows should have the same columns as the table: {0}".format(
+                    ", ".join(expected)
+                )
+            )
+
+        for name, values in self._derived_columns(rows).items():
+            rows[name] = values
+
+        # The frontend drops the oldest rows it has before adding the new
+        # ones, all of which it may not need to see.
+        evict = 0
+        if max_rows is not None and len(table) + len(rows) > max_rows:
+            evict = min(len(table) + len(rows) - max_rows, len(table))
+            rows = rows[len(rows) - min(len(rows), max_rows) :]
+
+        self.table = self._append_to_table(table, rows, evict)
+
+        colnames = [name for name in rows.colnames if name in self._sent_columns]
+        columns, buffers = binary_table_columns(rows, colnames)
+        self.parent._send_msg(
+            event="table_layer_append_rows",
+            id=self.id,
+            columns=columns,
+            evict=evict,
+            buffers=buffers,
+        )
+
+    def _append_to_table(self, table, rows, evict):
+        # The table with ``evict`` rows dropped from its start and ``rows``
+        # added at its end. The rows are written into the spare room at the
+        # end of the table that ``table`` is a view of, if it still is one and
+        # the rows fit, and otherwise the table is copied with as much spare
+        # room as it has rows.
+        from astropy.table import vstack
+
+        buffer, start, columns = self._row_buffer or (None, 0, ())
+        stop = start + len(table)
+        if (
+            buffer is None
+            or len(columns) != len(table.columns)
+            or any(a is not b for a, b in zip(columns, table.columns.values()))
+            or stop + len(rows) > len(buffer)
+            or not all(
+                _fits_column(buffer[name], rows[name]) for name in table.colnames
+            )
+        ):
+            table = vstack([table[evict:], rows], join_type="exact")
+            if not len(table):
+                self._row_buffer = None
+                return table
+            buffer = vstack([table, table[np.zeros(len(table), dtype=int)]])
+            start, stop = 0, len(table)
+        else:
+            for name in table.colnames:
+                buffer[name][stop : stop + len(rows)] = rows[name]
+            start, stop = start + evict, stop + len(rows)
+
+        table = buffer[start:stop]
+        self._row_buffer = (buffer, start, tuple(table.columns.values()))
+        return table
+
+    def _derived_columns(self, rows):
+        # The values of our own columns for new rows, computed like those of
+        # the existing rows.
+        table = self._get_table()
+        derived = {}
+
+        if CMAP_COLUMN_NAME in table.colnames:
+            if self._uniform_color() or self.cmap_att not in rows.colnames:
+                fill = table[CMAP_COLUMN_NAME][0] if len(table) else ""
+                derived[CMAP_COLUMN_NAME] = [fill] * len(rows)
+            else:
+                derived[CMAP_COLUMN_NAME] = cmap_hex_values(
+                    self.cmap, rows[self.cmap_att], self.cmap_vmin, self.cmap_vmax
+                )
+
+        if TIME_COLUMN_NAME in table.colnames:
+            derived[TIME_COLUMN_NAME] = ensure_utc_column(rows[self.time_att])
+
+        return derived
+
     def remove(self):
         """
         Remove the layer.
@@ -1330,6 +2392,9 @@ class TableLayer(HasTraits):
             return
         self.parent._send_msg(event="table_layer_remove", id=self.id)
         self._removed = True
+        if self._lod_subscription is not None:
+            self._lod_subscription.cancel()
+            self._lod_subscription = None
         if self._manager is not None:
             self._manager.remove_layer(self)
 
@@ -1353,6 +2418,8 @@ class TableLayer(HasTraits):
                 value = VALID_ALT_UNITS[self._check_xyz_unit({"value": value})]
             elif changed["name"] == "time_decay":
                 value = value.to(u.day).value
+            elif wwt_name.endswith("Column"):
+                self._ensure_columns(value)
             self.parent._send_msg(
                 event="table_layer_set", id=self.id, setting=wwt_name, value=value
             )
@@ -1430,13 +2497,15 @@ class CatalogHipsLayer(TableLayer):
 
     size_vmin = Float(
         None,
-        help="The minimum point size. Found automagically once size_att is set (`float`)",
+        help="The minimum point size. Found automagically once size_att is set "
+        "(`float`)",
         allow_none=True,
     ).tag(wwt="normalizeSizeMin")
 
     size_vmax = Float(
         None,
-        help="The maximum point size. Found automagically once size_att is set (`float`)",
+        help="The maximum point size. Found automagically once size_att is set "
+        "(`float`)",
         allow_none=True,
     ).tag(wwt="normalizeSizeMax")
 
@@ -1462,6 +2531,8 @@ class CatalogHipsLayer(TableLayer):
 
         self.notify_changes = False
 
+        from astropy.table import Table
+
         # skeleton table so that we can reverse-map column names:
         self.table = Table(names=app_msg["spreadsheetInfo"]["header"])
 
@@ -1511,7 +2582,8 @@ class CatalogHipsLayer(TableLayer):
     def _get_table(self):
         if not len(self.table):
             raise Exception(
-                "HiPS catalog table must be refreshed asynchronously: `await table.refresh()`"
+                "HiPS catalog table must be refreshed asynchronously: "
+                "`await table.refresh()`"
             )
         return self.table
 
@@ -1532,6 +2604,8 @@ class CatalogHipsLayer(TableLayer):
             limit=True,
         )
 
+        from astropy.table import Table
+
         reply = await fut
         self.table = Table.read(reply["data"], format="ascii.tab")
         return self.table
@@ -1541,10 +2615,191 @@ class CatalogHipsLayer(TableLayer):
             "HiPS catalogs data can only be updated by changing the field of view"
         )
 
+    def append_rows(self, rows, max_rows=None):
+        raise Exception(
+            "HiPS catalogs data can only be updated by changing the field of view"
+        )
+
     def __str__(self):
         return "Catalog HiPS Layer: {0}".format(self.id)
 
 
+class DensityLayer(TableLayer):
+    """
+    A layer showing a catalog binned into HEALPix pixels, with one marker at
+    the center of each non-empty pixel.
+
+    The markers are colored by the number of rows in each pixel, or by the
+    sum or mean of a column over them, through the usual ``cmap_att``,
+    ``cmap_vmin`` and ``cmap_vmax`` settings. The binned table is available
+    as ``table``, and the catalog as ``source_table``.
+    """
+
+    order = Int(
+        6, help="The HEALPix order of the pixels, from 0 to 20 (`int`)"
+    ).tag(wwt=None)
+    aggregate = Unicode(
+        "count",
+        help="What to show for each pixel: the number of rows ('count'), or "
+        "the 'sum' or 'mean' of value_att (`str`)",
+    ).tag(wwt=None)
+    value_att = Unicode(help="The column to aggregate (`str`)").tag(wwt=None)
+
+    def __init__(self, parent=None, table=None, frame="Sky", **kwargs):
+        from astropy_healpix import lonlat_to_healpix
+
+        self.source_table = table
+
+        # lon_att and lat_att name the columns of the catalog; those of the
+        # binned table are always "lon" and "lat".
+        lon_guess, lat_guess = guess_lon_lat_columns(table.colnames)
+        lon_att = kwargs.pop("lon_att", None) or lon_guess or table.colnames[0]
+        lat_att = kwargs.pop("lat_att", None) or lat_guess or table.colnames[1]
+
+        lon_unit = pick_unit_if_available(table[lon_att].unit, VALID_LON_UNITS)
+        lon = np.asarray(table[lon_att], dtype=float)
+        if lon_unit in (u.hour, u.hourangle):
+            lon = lon * 15
+        lat = np.asarray(table[lat_att], dtype=float)
+
+        # Index the rows once, sorted by pixel so that the pixels of any
+        # coarser order are runs of consecutive rows.
+        self._rows = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        pix = lonlat_to_healpix(
+            lon[self._rows] % 360 * u.deg,
+            lat[self._rows] * u.deg,
+            2**DENSITY_INDEX_ORDER,
+            order="nested",
+        )
+        by_pixel = np.argsort(pix)
+        self._rows = self._rows[by_pixel]
+        self._pix = pix[by_pixel]
+
+        binning = {
+            "order": kwargs.get("order", self.order),
+            "aggregate": kwargs.get("aggregate", self.aggregate),
+            "value_att": kwargs.get("value_att", self.value_att),
+        }
+        self._binned_with = binning
+        if len(self._rows):
+            kwargs.setdefault("cmap_att", binning["aggregate"])
+
+        # The binned table is all numbers, which are much cheaper to send as
+        # raw buffers than as CSV.
+        kwargs.setdefault("binary", True)
+
+        super().__init__(
+            parent,
+            table=self._bin(**binning),
+            frame=frame,
+            lon_att="lon",
+            lat_att="lat",
+            **kwargs,
+        )
+
+    @validate("order")
+    def _check_order(self, proposal):
+        if 0 <= proposal["value"] <= DENSITY_INDEX_ORDER:
+            return proposal["value"]
+        else:
+            raise ValueError(
+                "order should be between 0 and {0}".format(DENSITY_INDEX_ORDER)
+            )
+
+    @validate("aggregate")
+    def _check_aggregate(self, proposal):
+        if proposal["value"] in VALID_AGGREGATES:
+            return proposal["value"]
+        else:
+            raise ValueError(
+                "aggregate should be one of {0}".format("/".join(VALID_AGGREGATES))
+            )
+
+    def _bin(self, order, aggregate, value_att):
+        from astropy.table import Table
+        from astropy_healpix import healpix_to_lonlat
+
+        if not 0 <= order <= DENSITY_INDEX_ORDER:
+            raise ValueError(
+                "order should be between 0 and {0}".format(DENSITY_INDEX_ORDER)
+            )
+        if aggregate not in VALID_AGGREGATES:
+            raise ValueError(
+                "aggregate should be one of {0}".format("/".join(VALID_AGGREGATES))
+            )
+        if aggregate != "count" and value_att not in self.source_table.colnames:
+            raise ValueError("value_att should be a column of the table")
+
+        from .lod import group_bounds
+
+        pix = self._pix >> (2 * (DENSITY_INDEX_ORDER - order))
+        bounds = group_bounds(pix)
+        starts = bounds[:-1]
+        pixels = pix[starts]
+
+        # Only the centers of the non-empty pixels need trigonometry.
+        lon, lat = healpix_to_lonlat(pixels, 2**order, order="nested")
+
+        binned = Table()
+        binned["lon"] = lon.to_value(u.deg)
+        binned["lat"] = lat.to_value(u.deg)
+        binned["lon"].unit = u.deg
+        binned["lat"].unit = u.deg
+        binned["count"] = np.diff(bounds)
+
+        if aggregate != "count":
+            values = np.asarray(self.source_table[value_att], dtype=float)
+            values = values[self._rows]
+            finite = np.isfinite(values)
+            if len(starts):
+                sums = np.add.reduceat(np.where(finite, values, 0), starts)
+                counts = np.add.reduceat(finite.astype(np.int64), starts)
+            else:
+                sums = counts = np.zeros(0)
+            if aggregate == "sum":
+                binned["sum"] = sums
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    binned["mean"] = sums / counts
+
+        return binned
+
+    @observe("order", "aggregate", "value_att")
+    def _on_binning_change(self, changed):
+        if not self.notify_changes:
+            return
+
+        binning = {
+            "order": self.order,
+            "aggregate": self.aggregate,
+            "value_att": self.value_att,
+        }
+        if binning == self._binned_with:
+            return
+
+        if binning["aggregate"] != "count" and not binning["value_att"]:
+            # Wait for the column to aggregate.
+            return
+
+        previous = self._binned_with
+        table = self._bin(**binning)
+        self._binned_with = binning
+
+        with self.parent.batch():
+            self.update_data(table)
+            if self.cmap_att == previous["aggregate"] != binning["aggregate"]:
+                self.cmap_att = binning["aggregate"]
+            elif self.cmap_att:
+                # The range of the values changes with the binning.
+                self._on_cmap_att_change()
+
+    def append_rows(self, rows, max_rows=None):
+        raise Exception("Density layers can't be appended to")
+
+    def __str__(self):
+        return "DensityLayer with {0} pixels".format(len(self.table))
+
+
 class ImageLayer(HasTraits):
     """
     An image layer.
@@ -1555,7 +2810,6 @@ class ImageLayer(HasTraits):
     stretch = Unicode("linear")
     opacity = Float(1, help="The opacity of the image").tag(wwt="opacity")
     cmap = Any(
-        cm.viridis,
         help="The Matplotlib colormap (:class:`matplotlib.colors.ListedColormap`)",
     ).tag(wwt=None)
 
@@ -1583,23 +2837,31 @@ class ImageLayer(HasTraits):
 
             # "Classic" mode, processing a single FITS-like input. Transform the
             # image so that it is always acceptable to WWT (Equatorial, TAN
-            # projection, double values) and write out to a temporary file.
-            self._sanitized_image = tempfile.mktemp()
-            sanitize_image(image, self._sanitized_image, **kwargs)
-            kwargs.pop("hdu_index", None)
+            # projection, double values) and write out to a temporary file,
+            # which layers showing the same data share.
+            self._sanitized_image = acquire_sanitized_image(
+                image,
+                hdu_index=kwargs.pop("hdu_index", None),
+                block_size=kwargs.pop("block_size", None),
+                parallel=kwargs.pop("parallel", None),
+            )
 
             # The first thing we need to do is make sure the image is being served.
             # For now we assume that image is a filename, but we could do more
             # detailed checks and reproject on-the-fly for example.
 
             self._image_url = self.parent._serve_file(
-                self._sanitized_image, extension=".fits"
+                self._sanitized_image,
+                extension=".fits",
+                key=sanitized_image_key(self._sanitized_image),
             )
 
-            data = fits.getdata(self._sanitized_image)
-            self.vmin, self.vmax = np.nanpercentile(data, [0.5, 99.5])
-            self._data_min = np.nanmin(data)
-            self._data_max = np.nanmax(data)
+            from .stats import get_image_stats
+
+            stats = get_image_stats(self._sanitized_image, percentiles=(0.5, 99.5))
+            self.vmin, self.vmax = stats.percentiles
+            self._data_min = stats.data_min
+            self._data_max = stats.data_max
 
             self.parent._send_msg(
                 event="image_layer_create",
@@ -1649,8 +2911,17 @@ class ImageLayer(HasTraits):
                 )
             )
 
+    @default("cmap")
+    def _default_cmap(self):
+        from matplotlib import cm
+
+        return cm.viridis
+
     @validate("cmap")
     def _check_cmap(self, proposal):
+        from matplotlib import colormaps
+        from matplotlib.colors import Colormap
+
         if isinstance(proposal["value"], str):
             if proposal["value"] not in VALID_COLORMAPS:
                 raise ValueError(
@@ -1658,7 +2929,7 @@ class ImageLayer(HasTraits):
                     + "/".join(VALID_COLORMAPS)
                     + " (got {0})".format(proposal["value"])
                 )
-            return cm.get_cmap(proposal["value"])
+            return colormaps[proposal["value"]]
         elif not isinstance(proposal["value"], Colormap):
             raise TypeError("cmap should be set to a Matplotlib colormap")
         else:
@@ -1678,6 +2949,8 @@ class ImageLayer(HasTraits):
             return
         self.parent._send_msg(event="image_layer_remove", id=self.id)
         self._removed = True
+        if self._sanitized_image is not None:
+            release_sanitized_image(self._sanitized_image)
         if self._manager is not None:
             self._manager.remove_layer(self)
 
@@ -1687,7 +2960,6 @@ class ImageLayer(HasTraits):
         self.parent._send_msg(
             event="image_layer_cmap",
             id=self.id,
-            setting="colorMapperName",
             cmap=self.cmap.name,
             version=self._cmap_version,
         )
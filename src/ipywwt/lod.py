@@ -0,0 +1,199 @@
+"""
+Level-of-detail sampling of large tables of sky positions.
+
+WWT draws every row of a table layer, which doesn't scale to millions of
+points. Instead, the rows are given levels once, using HEALPix: a row has
+level ``k`` if it is among the first ``per_pixel`` rows, in a random order,
+of its HEALPix pixel at order ``k``. The rows of level ``k`` or less are then a
+sample of the table that is uniform down to the scale of those pixels, so
+the rows in view with the lowest levels, up to a point budget, give a fair
+picture of the data at any zoom level.
+"""
+
+import numpy as np
+
+__all__ = ["LODIndex", "group_bounds"]
+
+# The HEALPix order of the finest level, whose pixels are about 3.4' across.
+DEFAULT_ORDER = 10
+
+# The number of rows of each level in each pixel of that level's order.
+DEFAULT_PER_PIXEL = 16
+
+# The size of an order 0 HEALPix pixel, in degrees.
+PIXEL_SIZE_0 = 58.6
+
+
+class LODIndex:
+    """
+    Levels of detail for a set of sky positions.
+
+    Parameters
+    ----------
+    lon, lat : array-like
+        The positions, in degrees. Rows with non-finite positions are never
+        selected.
+    order : int, optional
+        The HEALPix order of the finest level.
+    per_pixel : int, optional
+        The number of rows of each level per pixel.
+    seed : int, optional
+        The seed of the random order of the rows within pixels.
+    """
+
+    def __init__(
+        self, lon, lat, order=DEFAULT_ORDER, per_pixel=DEFAULT_PER_PIXEL, seed=None
+    ):
+        import astropy.units as u
+        from astropy_healpix import lonlat_to_healpix
+
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+
+        self.order = order
+        self.per_pixel = per_pixel
+
+        rows = np.flatnonzero(np.isfinite(lon) & np.isfinite(lat))
+        pix = lonlat_to_healpix(
+            lon[rows] % 360 * u.deg, lat[rows] * u.deg, 2**order, order="nested"
+        )
+
+        # Shuffle the rows, then sort them by pixel, keeping the random order
+        # within each pixel: that is the priority of the rows.
+        rng = np.random.default_rng(seed)
+        shuffle = rng.permutation(len(rows))
+        by_pixel = shuffle[np.argsort(pix[shuffle], kind="stable")]
+
+        self._rows = rows[by_pixel]
+        self._pix = pix[by_pixel]
+        priority = np.empty(len(rows), dtype=np.int64)
+        priority[shuffle] = np.arange(len(rows))
+        self._priority = priority[by_pixel]
+        self._levels = self._compute_levels()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _compute_levels(self):
+        levels = np.full(len(self._rows), self.order + 1, dtype=np.int8)
+
+        # At the finest order, rows are already in priority order within
+        # their pixel.
+        ranks = _group_ranks(self._pix)
+        kept = np.flatnonzero(ranks < self.per_pixel)
+        levels[kept] = self.order
+
+        # The rows kept in a pixel are among those kept in its children, so
+        # each coarser level only looks at the rows of the previous one.
+        for order in range(self.order - 1, -1, -1):
+            shift = 2 * (self.order - order)
+            pix = self._pix[kept] >> shift
+            counts = np.diff(group_bounds(pix))
+            full = np.repeat(counts > self.per_pixel, counts)
+
+            if full.any():
+                # Only the rows of pixels with too many rows need sorting.
+                crowded = kept[full]
+                key = pix[full] * len(self._rows) + self._priority[crowded]
+                crowded = crowded[np.argsort(key)]
+                ranks = _group_ranks(self._pix[crowded] >> shift)
+                kept = np.sort(
+                    np.concatenate([kept[~full], crowded[ranks < self.per_pixel]])
+                )
+
+            levels[kept] = order
+
+        return levels
+
+    def select(self, lon, lat, radius, budget):
+        """
+        Return the indices of the rows to show in a field of view.
+
+        Parameters
+        ----------
+        lon, lat : float
+            The center of the view, in degrees.
+        radius : float
+            The radius of the view, in degrees.
+        budget : int
+            The maximum number of rows to return.
+
+        Returns
+        -------
+        rows : `~numpy.ndarray`
+            The indices of the rows, in increasing order.
+        """
+        candidates = self._cone(lon, lat, radius)
+        levels = self._levels[candidates]
+
+        counts = np.cumsum(np.bincount(levels, minlength=self.order + 2))
+        if counts[-1] <= budget:
+            return np.sort(self._rows[candidates])
+
+        # Take whole levels while they fit, then the rows of the next level
+        # with the highest priority.
+        level = np.searchsorted(counts, budget, side="right")
+        selected = candidates[levels < level]
+
+        remaining = budget - len(selected)
+        if remaining > 0:
+            partial = candidates[levels == level]
+            best = np.argpartition(self._priority[partial], remaining - 1)
+            selected = np.concatenate([selected, partial[best[:remaining]]])
+
+        return np.sort(self._rows[selected])
+
+    def _cone(self, lon, lat, radius):
+        # The positions, in the index, of the rows in pixels that touch the
+        # cone, found with a cone search at an order coarse enough to return
+        # a few hundred pixels at most.
+        if radius >= 90:
+            return np.arange(len(self._rows))
+
+        import astropy.units as u
+        from astropy_healpix import HEALPix
+
+        order = np.floor(np.log2(PIXEL_SIZE_0 / radius)) + 2
+        order = int(np.clip(order, 0, self.order))
+        pixels = HEALPix(2**order, order="nested").cone_search_lonlat(
+            lon * u.deg, lat * u.deg, radius * u.deg
+        )
+        pixels = np.sort(pixels)
+
+        shift = 2 * (self.order - order)
+        starts = np.searchsorted(self._pix, pixels << shift)
+        ends = np.searchsorted(self._pix, (pixels + 1) << shift)
+
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.arange(lengths.sum()) + offsets
+
+
+def group_bounds(values):
+    """
+    Return where each run of equal values of a sorted array starts, followed
+    by the length of the array.
+
+    The runs are then ``values[bounds[i]:bounds[i + 1]]``, and their lengths
+    ``np.diff(bounds)``.
+
+    Parameters
+    ----------
+    values : `~numpy.ndarray`
+        The sorted values.
+
+    Returns
+    -------
+    bounds : `~numpy.ndarray`
+        The bounds of the runs. An empty array has one bound, 0, and no runs.
+    """
+    if len(values) == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(np.diff(values)) + 1
+    return np.concatenate([[0], starts, [len(values)]])
+
+
+def _group_ranks(values):
+    # The position of each value of a sorted array within its run.
+    bounds = group_bounds(values)
+    return np.arange(len(values)) - np.repeat(bounds[:-1], np.diff(bounds))
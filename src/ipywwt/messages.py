@@ -35,6 +35,43 @@ class TableLayerCreateMessage(RemoteAPIMessage):
     id: str = field(default_factory=lambda: str(uuid4()))
 
 
+@dataclass
+class TableLayerUpdateMessage(RemoteAPIMessage):
+    table: str
+    event: str = "table_layer_update"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class TableLayerCreateBinaryMessage(RemoteAPIMessage):
+    columns: list
+    frame: str
+    event: str = "table_layer_create_binary"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class TableLayerUpdateBinaryMessage(RemoteAPIMessage):
+    columns: list
+    event: str = "table_layer_update_binary"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class TableLayerUpsertColumnsMessage(RemoteAPIMessage):
+    columns: list
+    event: str = "table_layer_upsert_columns"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class TableLayerAppendRowsMessage(RemoteAPIMessage):
+    columns: list
+    evict: int = 0
+    event: str = "table_layer_append_rows"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
 @dataclass
 class TableLayerSetMessage(RemoteAPIMessage):
     setting: str
@@ -43,12 +80,102 @@ class TableLayerSetMessage(RemoteAPIMessage):
     id: str = field(default_factory=lambda: str(uuid4()))
 
 
+@dataclass
+class TableLayerSetMultiMessage(RemoteAPIMessage):
+    settings: list
+    values: list
+    event: str = "table_layer_set_multi"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class BatchMessage(RemoteAPIMessage):
+    messages: list
+    buffer_counts: list
+    event: str = "batch"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class UploadStartMessage(RemoteAPIMessage):
+    size: int
+    header_size: int
+    buffer_sizes: list
+    event: str = "upload_start"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class UploadChunkMessage(RemoteAPIMessage):
+    seq: int
+    offset: int
+    event: str = "upload_chunk"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
 @dataclass
 class TableLayerRemoveMessage(RemoteAPIMessage):
     event: str = "table_layer_remove"
     id: str = field(default_factory=lambda: str(uuid4()))
 
 
+@dataclass
+class ImageLayerCreateMessage(RemoteAPIMessage):
+    url: str
+    mode: str
+    name: str = None
+    event: str = "image_layer_create"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerRemoveMessage(RemoteAPIMessage):
+    event: str = "image_layer_remove"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerSetMessage(RemoteAPIMessage):
+    setting: str
+    value: Union[float, str]
+    event: str = "image_layer_set"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerStretchMessage(RemoteAPIMessage):
+    stretch: int
+    vmin: float
+    vmax: float
+    version: int
+    event: str = "image_layer_stretch"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerCmapMessage(RemoteAPIMessage):
+    cmap: str
+    version: int
+    event: str = "image_layer_cmap"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerOrderMessage(RemoteAPIMessage):
+    order: int
+    version: int
+    event: str = "image_layer_order"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
+@dataclass
+class ImageLayerOrderMultiMessage(RemoteAPIMessage):
+    ids: list
+    version: int
+    event: str = "image_layer_order_multi"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
 @dataclass
 class SetForegroundByNameMessage(RemoteAPIMessage):
     name: str
@@ -70,6 +197,17 @@ class SetForegroundByOpacityMessage(RemoteAPIMessage):
     id: str = field(default_factory=lambda: str(uuid4()))
 
 
+@dataclass
+class TilingProgressMessage(RemoteAPIMessage):
+    name: str
+    stage: int
+    done: int
+    total: int
+    finished: bool = False
+    event: str = "tiling_progress"
+    id: str = field(default_factory=lambda: str(uuid4()))
+
+
 @dataclass
 class ClearTileCacheMessage(RemoteAPIMessage):
     event: str = "clear_tile_cache"
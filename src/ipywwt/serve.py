@@ -0,0 +1,489 @@
+"""
+A small HTTP server that makes local files available to the WWT frontend.
+
+Image layers built from local data (sanitized FITS files, or toasty tile
+pyramids) need URLs that the browser can load. Files, and tile pyramids from
+the cache, are registered under content-addressed URLs, so that once the
+browser has fetched a tile it never needs to ask for it again.
+
+The server listens on 127.0.0.1, so it can only be reached by a browser running
+on the same machine as the kernel. When the notebook is used remotely (on
+JupyterHub, or over SSH), the files have to go through a proxy: set the
+``IPYWWT_FILE_SERVER_URL`` environment variable to the URL that reaches the
+server through it, with ``{port}`` standing for the server's port. With
+jupyter-server-proxy, for instance, that's ``/user/<name>/proxy/{port}/`` on
+JupyterHub or ``/proxy/{port}/`` otherwise.
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import tempfile
+import threading
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from .utils import file_digest
+
+__all__ = ["FileServer", "get_file_server"]
+
+logger = logging.getLogger("pywwt")
+
+# Files that are worth compressing on the fly. Image tiles are already
+# compressed.
+COMPRESSIBLE_EXTENSIONS = {".fits", ".fit", ".fts", ".wtml", ".xml", ".json", ".txt"}
+
+# Files larger than this are always sent uncompressed, in bytes.
+GZIP_MAX_SIZE = 64 * 1024 * 1024
+
+# The size of the pieces that files are read and compressed in, in bytes.
+GZIP_CHUNK_SIZE = 1024 * 1024
+
+# Content-addressed URLs never change what they point to.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Other URLs can, so browsers check their ETag before reusing them.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_file_server():
+    """
+    Return the file server shared by all widgets in this process, starting it
+    if needed.
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = FileServer(
+                public_url=os.environ.get("IPYWWT_FILE_SERVER_URL") or None
+            )
+            _server.start()
+
+    return _server
+
+
+def _key_token(key):
+    return hashlib.blake2b(b"key:" + key.encode(), digest_size=16).hexdigest()
+
+
+def _tree_token(root, key=None):
+    # Hashing every tile of a pyramid would take longer than tiling it, so a
+    # tree is only content-addressed when its content has a key already.
+    # Otherwise the URL follows its location, and isn't immutable.
+    if key is not None:
+        return _key_token(key)
+
+    digest = hashlib.blake2b(b"path:" + os.path.realpath(root).encode(), digest_size=16)
+    return digest.hexdigest()
+
+
+class _BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # Connections wait in the listen backlog while all slots are busy; the
+    # default of 5 makes browsers time out and retry.
+    request_queue_size = 128
+
+    def __init__(self, address, handler, file_server, max_connections):
+        self.file_server = file_server
+        self._slots = threading.BoundedSemaphore(max_connections)
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        # Stop accepting connections while all the slots are busy, rather
+        # than starting an unbounded number of threads.
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Idle keep-alive connections give up their slot after this many seconds.
+    timeout = 5
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_OPTIONS(self):
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self._send_cors_headers()
+        self.send_header("Access-Control-Allow-Headers", "Range")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("file server: " + format, *args)
+
+    def _send_cors_headers(self):
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header(
+            "Access-Control-Expose-Headers",
+            "Content-Length, Content-Range, Accept-Ranges, ETag",
+        )
+
+    def _send_error(self, status):
+        body = status.phrase.encode()
+        self.send_response(status)
+        self._send_cors_headers()
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _serve(self, send_body):
+        filename, immutable = self.server.file_server._resolve(
+            urlsplit(self.path).path
+        )
+        if filename is None:
+            self._send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        try:
+            f = open(filename, "rb")
+        except OSError:
+            self._send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = '"{:x}-{:x}"'.format(size, stat.st_mtime_ns)
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+            content_type = (
+                mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            )
+
+            ext = posixpath.splitext(filename)[1].lower()
+            use_gzip = (
+                self.server.file_server.gzip
+                and ext in COMPRESSIBLE_EXTENSIONS
+                and size <= GZIP_MAX_SIZE
+                and "Range" not in self.headers
+                and "gzip" in self.headers.get("Accept-Encoding", "")
+            )
+            if use_gzip:
+                etag = etag[:-1] + '-gz"'
+
+            if self._not_modified(etag, stat.st_mtime):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._send_common_headers(etag, last_modified, immutable)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = HTTPStatus.OK
+            byte_range = self.headers.get("Range")
+
+            if byte_range is not None:
+                parsed = self._parse_range(byte_range, size)
+                if parsed is None:
+                    self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    self._send_cors_headers()
+                    self.send_header("Content-Range", "bytes */{}".format(size))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                start, end = parsed
+                status = HTTPStatus.PARTIAL_CONTENT
+
+            length = end - start + 1
+
+            self.send_response(status)
+            self._send_common_headers(etag, last_modified, immutable)
+            self.send_header("Content-Type", content_type)
+            if use_gzip:
+                # The compressed length is only known at the end.
+                self.send_header("Content-Encoding", "gzip")
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.send_header("Content-Length", str(length))
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header(
+                    "Content-Range", "bytes {}-{}/{}".format(start, end, size)
+                )
+            self.end_headers()
+
+            if not send_body:
+                return
+
+            if use_gzip:
+                self._send_gzip(f)
+            elif length > 0:
+                self.wfile.flush()
+                self.connection.sendfile(f, offset=start, count=length)
+
+    def _send_gzip(self, f):
+        # Compress the file a piece at a time, so that a request only holds
+        # one piece of it in memory.
+        compressor = zlib.compressobj(5, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in iter(lambda: f.read(GZIP_CHUNK_SIZE), b""):
+            self._send_chunk(compressor.compress(chunk))
+        self._send_chunk(compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_chunk(self, data):
+        if data:
+            self.wfile.write(b"%x\r\n" % len(data) + data + b"\r\n")
+
+    def _send_common_headers(self, etag, last_modified, immutable):
+        self._send_cors_headers()
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.send_header(
+            "Cache-Control",
+            IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        )
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return etag in tags or "*" in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+
+        return False
+
+    @staticmethod
+    def _parse_range(value, size):
+        # Only single byte ranges are supported, which is all that browsers
+        # ask for when loading FITS data.
+        unit, _, spec = value.partition("=")
+        if unit.strip() != "bytes" or "," in spec:
+            return None
+
+        first, _, last = spec.strip().partition("-")
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                start = size - int(last)
+                end = size - 1
+        except ValueError:
+            return None
+
+        start = max(start, 0)
+        end = min(end, size - 1)
+        if start > end:
+            return None
+
+        return start, end
+
+
+class FileServer:
+    """
+    Serve local files and directory trees to the WWT frontend over HTTP.
+
+    The server runs in a background thread and handles each connection in its
+    own thread, up to ``max_connections`` at a time. It supports single-range
+    requests, answers conditional requests from its ``ETag`` and
+    ``Last-Modified`` headers, and can compress FITS and WTML files on the
+    fly.
+
+    The server only listens on ``host``, 127.0.0.1 by default, so a browser
+    on another machine can't reach it directly. ``public_url`` lets it be
+    reached through a proxy instead.
+
+    Parameters
+    ----------
+    host : str, optional
+        The address to listen on.
+    port : int, optional
+        The port to listen on. By default, a free port is picked.
+    max_connections : int, optional
+        The maximum number of connections handled at the same time.
+    gzip : bool, optional
+        Whether to compress compressible files for clients that accept it.
+    public_url : str, optional
+        The URL that the browser reaches the server at, if it isn't
+        ``http://<host>:<port>/``, with ``{port}`` standing for the port. For
+        instance, ``/proxy/{port}/`` with jupyter-server-proxy.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        max_connections=16,
+        gzip=True,
+        public_url=None,
+    ):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self.max_connections = max_connections
+        self.gzip = gzip
+        self._routes = {}
+        self._tmpdir = None
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        if self.public_url is not None:
+            return self.public_url.format(port=self.port).rstrip("/") + "/"
+        return "http://{}:{}/".format(self.host, self.port)
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        if self._httpd is not None:
+            return
+
+        self._httpd = _BoundedThreadingHTTPServer(
+            (self.host, self.port), _RequestHandler, self, self.max_connections
+        )
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="ipywwt-file-server", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._httpd is None:
+            return
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
+
+    def serve_file(self, filename, extension="", key=None):
+        """
+        Make a file available, and return its URL.
+
+        The URL is derived from the file's content, so serving the same data
+        twice gives the same URL.
+
+        Parameters
+        ----------
+        filename : str
+            The file to serve.
+        extension : str, optional
+            An extension to end the URL with, for clients that go by it.
+        key : str, optional
+            A key that identifies the content of the file, such as the key of
+            a sanitized image. The URL is derived from it rather than from a
+            hash of the whole file, which is slow for large files.
+        """
+        if key is not None:
+            token = _key_token(key) + extension
+        else:
+            token = file_digest(filename) + extension
+        self._routes[token] = ("file", os.path.realpath(filename), None, True)
+        return self.base_url + token
+
+    def serve_tree(self, path, key=None):
+        """
+        Make a directory and everything below it available, and return the
+        URL of the directory, ending in a slash.
+
+        Parameters
+        ----------
+        path : str
+            The directory to serve.
+        key : str, optional
+            A key that identifies the content of the directory, such as the
+            `~ipywwt.tiling.tile_cache_key` of a cached tile pyramid. The URL
+            is derived from it, and browsers keep its files for good. Without
+            a key, the URL is derived from the location of the directory, and
+            browsers check that files haven't changed before reusing them.
+        """
+        token = _tree_token(path, key)
+        url = self.base_url + token + "/"
+        overrides = {}
+
+        # toasty writes its image collection with relative URLs. WWT needs
+        # absolute ones, which we can only know now.
+        rel_wtml = os.path.join(path, "index_rel.wtml")
+        if os.path.isfile(rel_wtml) and not os.path.exists(
+            os.path.join(path, "index.wtml")
+        ):
+            overrides["index.wtml"] = self._absolutize_wtml(rel_wtml, url, token)
+
+        self._routes[token] = (
+            "tree",
+            os.path.realpath(path),
+            overrides,
+            key is not None,
+        )
+        return url
+
+    def _absolutize_wtml(self, filename, base_url, token):
+        from wwt_data_formats.folder import Folder, make_absolutizing_url_mutator
+
+        folder = Folder.from_file(filename)
+        folder.mutate_urls(make_absolutizing_url_mutator(base_url))
+
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="ipywwt-serve-")
+        output = os.path.join(self._tmpdir.name, token + ".wtml")
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(folder.to_xml_string())
+
+        return output
+
+    def resolve(self, url_path):
+        """
+        Return the local file for the path of a request, or `None` if it
+        isn't being served.
+        """
+        return self._resolve(url_path)[0]
+
+    def _resolve(self, url_path):
+        # Also returns whether the file can be cached for good.
+        token, _, relpath = unquote(url_path).lstrip("/").partition("/")
+
+        try:
+            kind, target, overrides, immutable = self._routes[token]
+        except KeyError:
+            return None, False
+
+        if kind == "file":
+            return (target if not relpath else None), immutable
+
+        if relpath in overrides:
+            return overrides[relpath], immutable
+
+        filename = os.path.realpath(os.path.join(target, relpath))
+        if os.path.commonpath([filename, target]) != target:
+            return None, False
+        return filename, immutable
@@ -0,0 +1,149 @@
+"""
+Summary statistics of image data, used to set the default display range of
+image layers.
+
+Statistics are computed in a single pass over a memory map of the file, a
+chunk at a time, so that the image never needs to fit in memory, and they are
+cached next to the file.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+__all__ = ["ImageStats", "get_image_stats"]
+
+# How much image data is read at a time, in bytes.
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# The default bound on the error of approximate percentiles, as a fraction of
+# the number of pixels: 1e-3 means that the 0.5th percentile lies between the
+# 0.4th and 0.6th percentiles.
+DEFAULT_RANK_ERROR = 1e-3
+
+# The seed of the random sample of pixels, so that an image always gets the
+# same statistics.
+SAMPLE_SEED = 0
+
+ImageStats = namedtuple("ImageStats", ["data_min", "data_max", "percentiles"])
+ImageStats.__doc__ = """
+The minimum and maximum values of an image, ignoring NaNs, and the values at
+the requested percentiles.
+"""
+
+
+def get_image_stats(filename, percentiles=(0.5, 99.5), rank_error=DEFAULT_RANK_ERROR):
+    """
+    Return the statistics of the image data in a FITS file.
+
+    The minimum and maximum are exact. Percentiles are computed from a
+    uniform random sample of the pixels, large enough for their rank to be
+    within ``rank_error`` of the requested one with 95% confidence, or from
+    all the pixels of small images.
+
+    The results are cached in a ``.stats.json`` file next to ``filename``,
+    which is used as long as the file doesn't change.
+
+    Parameters
+    ----------
+    filename : str
+        The FITS file. The first HDU with data is used.
+    percentiles : sequence of float, optional
+        The percentiles to compute, between 0 and 100.
+    rank_error : float, optional
+        The tolerated error on the rank of percentiles, as a fraction of the
+        number of pixels.
+    """
+    percentiles = [float(p) for p in percentiles]
+    stat = os.stat(filename)
+    key = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "percentiles": percentiles,
+        "rank_error": rank_error,
+    }
+    cache_file = filename + ".stats.json"
+
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return ImageStats(
+                cached["data_min"], cached["data_max"], tuple(cached["percentiles"])
+            )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    stats = _compute_image_stats(filename, percentiles, rank_error)
+
+    try:
+        with open(cache_file, "w") as f:
+            json.dump(dict(stats._asdict(), key=key), f)
+    except OSError:
+        # Not being able to cache the statistics shouldn't stop us.
+        pass
+
+    return stats
+
+
+def _compute_image_stats(filename, percentiles, rank_error):
+    from astropy.io import fits
+
+    with fits.open(filename, memmap=True) as hdul:
+        for hdu in hdul:
+            if hdu.data is not None:
+                break
+        data = hdu.data
+
+        # With n random samples, the standard error on the rank of a
+        # percentile is at most sqrt(1 / (4 n)); we take n so that twice that
+        # meets the bound. A regular sample would be no good, since it can
+        # line up with bad columns, stripes or other patterns in the image.
+        n_samples = int(np.ceil(1 / rank_error**2))
+        if data.size > n_samples:
+            rng = np.random.default_rng(SAMPLE_SEED)
+            picks = np.sort(rng.integers(0, data.size, n_samples))
+        else:
+            picks = None
+
+        data_min = np.inf
+        data_max = -np.inf
+        samples = []
+
+        rows = data.reshape(len(data), -1) if data.ndim > 1 else data.reshape(1, -1)
+        step = max(1, CHUNK_SIZE // max(rows[:1].nbytes, 1))
+        offset = 0
+
+        for start in range(0, len(rows), step):
+            # A native copy of the chunk is much faster to reduce than the
+            # big-endian values of the file.
+            chunk = np.asarray(rows[start : start + step], dtype=float).ravel()
+
+            # fmin and fmax ignore NaNs.
+            data_min = np.fmin(data_min, np.fmin.reduce(chunk))
+            data_max = np.fmax(data_max, np.fmax.reduce(chunk))
+
+            # Keep the sampled pixels of the chunk (copied, so as not to keep
+            # the chunk alive).
+            if picks is None:
+                samples.append(chunk.copy())
+            else:
+                lo, hi = np.searchsorted(picks, [offset, offset + chunk.size])
+                samples.append(chunk[picks[lo:hi] - offset])
+            offset += chunk.size
+
+        values = np.concatenate(samples)
+        values = values[np.isfinite(values)]
+
+        if values.size:
+            levels = tuple(float(v) for v in np.percentile(values, percentiles))
+        else:
+            levels = (np.nan,) * len(percentiles)
+
+    if data_min > data_max:
+        # Only NaNs
+        data_min = data_max = np.nan
+
+    return ImageStats(float(data_min), float(data_max), levels)
@@ -0,0 +1,291 @@
+"""
+Tiling of FITS images with toasty, away from the kernel's event loop.
+
+`toasty.tile_fits` is synchronous and can run for minutes on large mosaics.
+Here it runs in a separate process, which reports its progress back through a
+pipe and can be terminated if the tiling is cancelled.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from toasty import TilingMethod
+
+__all__ = [
+    "TilingProgress",
+    "default_tile_dir",
+    "load_tiles",
+    "save_tiles",
+    "tile_cache_key",
+    "tile_fits_async",
+]
+
+# The modules of toasty that create progress bars.
+TOASTY_PROGRESS_MODULES = [
+    "toasty.multi_tan",
+    "toasty.multi_wcs",
+    "toasty.pyramid",
+    "toasty.study",
+    "toasty.toast",
+    "toasty.transform",
+]
+
+# The minimum interval between two progress reports from the worker, in seconds.
+PROGRESS_INTERVAL = 0.1
+
+IMAGESET_ATTRIBUTES = [
+    "name",
+    "url",
+    "pixel_cut_low",
+    "pixel_cut_high",
+    "data_min",
+    "data_max",
+]
+
+# The file of a cache entry that describes the tiles it holds.
+TILES_META = "tiles.json"
+
+
+class TilingProgress(SimpleNamespace):
+    """
+    A progress report from a tiling job.
+
+    Attributes
+    ----------
+    stage : int
+        The number of the current stage of the tiling, starting at 1. Each
+        stage (sampling the image, building the pyramid, ...) has its own
+        progress.
+    done : int
+        The number of items processed in this stage.
+    total : int
+        The number of items to process in this stage.
+    """
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+
+def default_tile_dir(fits_list, tiling_method=TilingMethod.AUTO_DETECT):
+    """
+    The directory that `toasty.tile_fits` writes to when it isn't given one.
+    """
+    first_file_name = fits_list[0].split(".gz")[0]
+    out_dir = first_file_name[: first_file_name.rfind(".")] + "_tiled"
+
+    if tiling_method == TilingMethod.HIPS:
+        out_dir += "_HiPS"
+    if tiling_method == TilingMethod.TOAST:
+        out_dir += "_TOAST"
+
+    return out_dir
+
+
+def tile_cache_key(
+    fits_list, hdu_index=None, tiling_method=TilingMethod.AUTO_DETECT, **kwargs
+):
+    """
+    Return the cache key of the tiles of some FITS files: a hash of their
+    content and of the tiling settings.
+    """
+    from importlib.metadata import version
+
+    from .cache import cache_key
+    from .utils import file_digest
+
+    settings = sorted((key, repr(value)) for key, value in kwargs.items())
+
+    return cache_key(
+        "tiles",
+        version("toasty"),
+        [file_digest(filename) for filename in fits_list],
+        hdu_index,
+        str(tiling_method),
+        settings,
+    )
+
+
+def save_tiles(entry_dir, out_dir, imgset):
+    """
+    Record the output of `toasty.tile_fits` in a cache entry, so that it can be
+    reused without running toasty again.
+
+    Parameters
+    ----------
+    entry_dir : str
+        The directory of the entry.
+    out_dir : str
+        The directory of the tiles, within ``entry_dir``.
+    imgset
+        The image set built by toasty, or the one returned by
+        `tile_fits_async`.
+    """
+    meta = {
+        "out_dir": os.path.relpath(out_dir, entry_dir),
+        "imgset": {att: getattr(imgset, att) for att in IMAGESET_ATTRIBUTES},
+    }
+
+    with open(os.path.join(entry_dir, TILES_META), "w") as f:
+        json.dump(meta, f)
+
+
+def load_tiles(entry_dir):
+    """
+    Return the tile directory and image set recorded by `save_tiles`.
+    """
+    with open(os.path.join(entry_dir, TILES_META)) as f:
+        meta = json.load(f)
+
+    out_dir = os.path.join(entry_dir, meta["out_dir"])
+    return out_dir, SimpleNamespace(**meta["imgset"])
+
+
+class _ProgressReporter:
+    # Stands in for the tqdm bar that toasty updates, forwarding the counts.
+
+    def __init__(self, bar, stage, total, conn):
+        self._bar = bar
+        self._stage = stage
+        self._total = total
+        self._conn = conn
+        self._done = 0
+        self._last_report = 0.0
+
+    def update(self, n=1):
+        self._bar.update(n)
+        self._done += n
+
+        now = time.monotonic()
+        if now - self._last_report >= PROGRESS_INTERVAL or self._done >= self._total:
+            self._last_report = now
+            self._conn.send(("progress", self._stage, self._done, self._total))
+
+    def __getattr__(self, name):
+        return getattr(self._bar, name)
+
+
+def _install_progress_hooks(conn):
+    import importlib
+
+    from toasty.progress import progress_bar
+
+    stages = [0]
+
+    @contextmanager
+    def reporting_progress_bar(total=None, show=None):
+        stages[0] += 1
+        with progress_bar(total=total, show=show) as bar:
+            yield _ProgressReporter(bar, stages[0], total, conn)
+
+    for name in TOASTY_PROGRESS_MODULES:
+        module = importlib.import_module(name)
+        module.progress_bar = reporting_progress_bar
+
+
+def _tile_fits_worker(conn, fits_list, kwargs):
+    # Runs in the worker process: this is the only place where we touch
+    # toasty's module globals.
+    import warnings
+
+    import toasty
+
+    try:
+        _install_progress_hooks(conn)
+
+        with warnings.catch_warnings():
+            # Avoid annoying AstroPy FITS-fixed warnings
+            warnings.simplefilter("ignore")
+            out_dir, builder = toasty.tile_fits(fits_list, **kwargs)
+
+        imgset = {att: getattr(builder.imgset, att) for att in IMAGESET_ATTRIBUTES}
+        conn.send(("done", out_dir, imgset))
+    except BaseException as e:
+        try:
+            conn.send(("error", e))
+        except Exception:
+            # The exception itself may not survive pickling.
+            conn.send(("error", RuntimeError(repr(e))))
+    finally:
+        conn.close()
+
+
+async def tile_fits_async(fits_list, progress=None, **kwargs):
+    """
+    Tile FITS files with `toasty.tile_fits` in a worker process.
+
+    Cancelling the task that awaits this terminates the worker, and removes
+    its output directory unless that existed beforehand.
+
+    Parameters
+    ----------
+    fits_list : list of str
+        The FITS files to tile.
+    progress : callable, optional
+        A function called with a `TilingProgress` as the tiling proceeds.
+    kwargs
+        Arguments for `toasty.tile_fits`.
+
+    Returns
+    -------
+    out_dir : str
+        The directory containing the tiles.
+    imgset : `types.SimpleNamespace`
+        The name, relative URL, pixel cuts and data range of the image set.
+    """
+    loop = asyncio.get_running_loop()
+
+    out_dir = kwargs.get("out_dir")
+    if out_dir is None:
+        out_dir = default_tile_dir(
+            fits_list, kwargs.get("tiling_method", TilingMethod.AUTO_DETECT)
+        )
+        kwargs["out_dir"] = out_dir
+    keep_out_dir = os.path.isdir(out_dir) and not kwargs.get("override", False)
+
+    # Forking a kernel that runs threads is asking for trouble.
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_tile_fits_worker,
+        args=(child_conn, fits_list, kwargs),
+        name="ipywwt-tiling",
+        daemon=False,
+    )
+    process.start()
+    child_conn.close()
+
+    def receive():
+        try:
+            return parent_conn.recv()
+        except EOFError:
+            return ("error", RuntimeError("the tiling process exited unexpectedly"))
+
+    try:
+        while True:
+            message = await loop.run_in_executor(None, receive)
+
+            if message[0] == "progress":
+                if progress is not None:
+                    _, stage, done, total = message
+                    progress(TilingProgress(stage=stage, done=done, total=total))
+            elif message[0] == "done":
+                _, out_dir, imgset = message
+                return out_dir, SimpleNamespace(**imgset)
+            else:
+                raise message[1]
+    except BaseException:
+        if process.is_alive():
+            process.terminate()
+        if not keep_out_dir:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+    finally:
+        await loop.run_in_executor(None, process.join)
+        parent_conn.close()
@@ -9,14 +9,18 @@ from traitlets import (
 )
 from astropy import units as u
 
-try:
-    from matplotlib.colors import to_hex
-except ImportError:
-    from matplotlib.colors import colorConverter, rgb2hex
 
-    def to_hex(input):  # noqa
+def to_hex(input):
+    # Matplotlib is only imported once a color actually needs converting.
+    try:
+        from matplotlib.colors import to_hex
+    except ImportError:
+        from matplotlib.colors import colorConverter, rgb2hex
+
         return rgb2hex(colorConverter.to_rgb(input))
 
+    return to_hex(input)
+
 
 __all__ = [
     "Any",
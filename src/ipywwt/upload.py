@@ -0,0 +1,277 @@
+"""
+Chunked transfer of large messages to the WWT frontend.
+
+A message carrying a large table can be bigger than what the comm channel
+accepts in one go, and while it is being sent nothing else gets through. Such
+messages are encoded into one byte stream, a JSON header followed by the
+message's buffers, and sent in bounded chunks. The frontend acknowledges each
+chunk, and only a few chunks are in flight at any time, so other messages
+keep flowing. Once all the chunks have arrived, the frontend rebuilds the
+message and handles it in the order it was sent.
+"""
+
+import json
+import time
+from concurrent.futures import Future
+from dataclasses import asdict
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+
+from .messages import UploadChunkMessage, UploadStartMessage
+
+__all__ = ["Upload", "UploadProgress", "message_size"]
+
+# How late, in seconds, the timeout of an upload can fire before we take it
+# that the kernel was busy, and that acknowledgements may be waiting.
+TIMEOUT_SLACK = 1.0
+
+
+class UploadProgress(SimpleNamespace):
+    """
+    A progress report from an upload.
+
+    Attributes
+    ----------
+    id : str
+        The ID of the upload.
+    done : int
+        The number of bytes that the frontend has received.
+    total : int
+        The size of the upload, in bytes.
+    """
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 1.0
+
+
+def message_size(content, buffers=None):
+    """
+    Return a lower bound on the size of a message on the wire, in bytes: the
+    size of its buffers and of the strings it contains.
+    """
+    size = sum(memoryview(buffer).nbytes for buffer in buffers or [])
+
+    stack = [content]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+
+    return size
+
+
+def _json_default(value):
+    # Numpy values that settings can end up holding.
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(
+        "Object of type {0} is not JSON serializable".format(type(value).__name__)
+    )
+
+
+class Upload:
+    """
+    A message being sent to the frontend in chunks.
+
+    Uploads are started by the widget, which hands them the acknowledgements
+    of the frontend. They can be awaited, and complete once the frontend has
+    received the whole message.
+
+    Parameters
+    ----------
+    send : callable
+        Sends a message dictionary and its buffers over the comm.
+    content : dict
+        The message.
+    buffers : list, optional
+        The binary buffers of the message.
+    chunk_size : int
+        The maximum size of a chunk, in bytes.
+    window : int
+        The maximum number of chunks sent but not yet acknowledged.
+    progress : callable, optional
+        A function called with an `UploadProgress` whenever a chunk is
+        acknowledged.
+    timeout : float, optional
+        The time, in seconds, to wait for the next acknowledgement before
+        the upload fails with a `TimeoutError`. This needs a running event
+        loop; by default, or without one, uploads wait forever.
+    """
+
+    def __init__(
+        self,
+        send,
+        content,
+        buffers=None,
+        chunk_size=4 * 1024**2,
+        window=4,
+        progress=None,
+        timeout=None,
+    ):
+        self.id = str(uuid4())
+        self._send = send
+        self._chunk_size = max(int(chunk_size), 1)
+        self._window = max(int(window), 1)
+        self._progress = progress
+        self._timeout = timeout
+        self._timer = None
+        self._deadline = None
+        self._future = Future()
+
+        header = json.dumps(content, default=_json_default).encode("utf-8")
+        self._parts = [memoryview(header)]
+        self._parts.extend(memoryview(buffer).cast("B") for buffer in buffers or [])
+
+        self._header_size = len(header)
+        self._buffer_sizes = [part.nbytes for part in self._parts[1:]]
+        self.size = sum(part.nbytes for part in self._parts)
+
+        # Where the next chunk starts.
+        self._part = 0
+        self._part_offset = 0
+        self._offset = 0
+
+        self._seq = 0
+        self._in_flight = {}
+        self._received = 0
+
+    @property
+    def done(self):
+        """
+        Whether the frontend has received the whole message.
+        """
+        return self._future.done()
+
+    def __await__(self):
+        import asyncio
+
+        return asyncio.wrap_future(self._future).__await__()
+
+    def add_done_callback(self, callback):
+        """
+        Call a function with the upload once it completes or fails.
+        """
+        self._future.add_done_callback(lambda _: callback(self))
+
+    def exception(self):
+        """
+        The error that the upload failed with, if any.
+        """
+        return self._future.exception() if self.done else None
+
+    def start(self):
+        """
+        Announce the upload to the frontend and send the first chunks.
+        """
+        start = UploadStartMessage(
+            id=self.id,
+            size=self.size,
+            header_size=self._header_size,
+            buffer_sizes=self._buffer_sizes,
+        )
+        self._send(asdict(start), None)
+        self._fill()
+        self._arm_timer()
+
+    def acknowledge(self, seq):
+        """
+        Record that the frontend has received chunk ``seq``, and send more.
+        """
+        size = self._in_flight.pop(seq, None)
+        if size is None or self.done:
+            return
+
+        self._received += size
+
+        if self._progress is not None:
+            self._progress(
+                UploadProgress(id=self.id, done=self._received, total=self.size)
+            )
+
+        if self._received == self.size:
+            self._cancel_timer()
+            self._future.set_result(None)
+        else:
+            self._fill()
+            self._arm_timer()
+
+    def _arm_timer(self):
+        import asyncio
+
+        self._cancel_timer()
+        if self._timeout is None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing could time the upload out.
+            return
+
+        self._deadline = time.monotonic() + self._timeout
+        self._timer = loop.call_later(self._timeout, self._expire)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _expire(self):
+        self._timer = None
+        if self.done:
+            return
+
+        if time.monotonic() - self._deadline > TIMEOUT_SLACK:
+            # The kernel was busy, so the acknowledgements may just not have
+            # been processed yet: give them another chance.
+            self._arm_timer()
+            return
+
+        self._future.set_exception(
+            TimeoutError(
+                "the frontend didn't acknowledge upload {0} within {1} s".format(
+                    self.id, self._timeout
+                )
+            )
+        )
+
+    def _fill(self):
+        while len(self._in_flight) < self._window and self._offset < self.size:
+            chunk = self._next_chunk()
+            size = sum(view.nbytes for view in chunk)
+
+            seq = self._seq
+            self._seq += 1
+            self._in_flight[seq] = size
+
+            msg = UploadChunkMessage(id=self.id, seq=seq, offset=self._offset)
+            self._send(asdict(msg), chunk)
+            self._offset += size
+
+    def _next_chunk(self):
+        # Views on the parts that make up the next chunk, without copying.
+        chunk = []
+        remaining = self._chunk_size
+
+        while remaining > 0 and self._part < len(self._parts):
+            part = self._parts[self._part]
+            view = part[self._part_offset : self._part_offset + remaining]
+            if view.nbytes:
+                chunk.append(view)
+            remaining -= view.nbytes
+            self._part_offset += view.nbytes
+
+            if self._part_offset == part.nbytes:
+                self._part += 1
+                self._part_offset = 0
+
+        return chunk
@@ -1,24 +1,48 @@
+import os
+import tempfile
+import threading
+import uuid
+
 import numpy as np
-import pytz
-from astropy.io import fits
-from astropy.coordinates import ICRS
-from astropy.time import Time
 from datetime import datetime
-from reproject import reproject_interp
-from reproject.mosaicking import find_optimal_celestial_wcs
 
 __all__ = ["sanitize_image"]
 
 
-def sanitize_image(image, output_file, overwrite=False, hdu_index=None, **kwargs):
+# The side of the square blocks that large images are reprojected in, in
+# pixels. Each block being reprojected takes about 100 MB of memory.
+REPROJECT_BLOCK_SIZE = 1024
+
+# How far beyond the input pixels that an output block was found to need we
+# read, in pixels, to stay clear of interpolation edge effects.
+REPROJECT_BLOCK_MARGIN = 4
+
+
+def sanitize_image(
+    image,
+    output_file,
+    overwrite=False,
+    hdu_index=None,
+    block_size=None,
+    parallel=None,
+    **kwargs,
+):
     """
     Transform a FITS image so that it is in equatorial coordinates with a TAN
     projection and floating-point values, all of which are required to work
     correctly in WWT at the moment.
 
     Image can be a filename, an HDU, or a tuple of (array, WCS).
+
+    Images larger than ``block_size`` pixels on a side are reprojected in
+    square blocks of that size, straight into a memory-mapped output file, so
+    that memory use stays bounded whatever the size of the image. Blocks are
+    handed out to ``parallel`` threads, by default one per CPU; how much that
+    gains depends on how much of reproject's work releases the GIL.
     """
 
+    from astropy.io import fits
+
     # In case of a FITS file with more than one HDU, we need to choose one
     if isinstance(image, str):
         with fits.open(image) as hdul:
@@ -33,17 +57,27 @@ def sanitize_image(image, output_file, overwrite=False, hdu_index=None, **kwargs
                     ):
                         break
                 image = hdu
-            transform_to_wwt_supported_fits(image, output_file, overwrite)
+            transform_to_wwt_supported_fits(
+                image, output_file, overwrite, block_size, parallel
+            )
     else:
-        transform_to_wwt_supported_fits(image, output_file, overwrite)
+        transform_to_wwt_supported_fits(
+            image, output_file, overwrite, block_size, parallel
+        )
 
 
-def transform_to_wwt_supported_fits(image, output_file, overwrite):
+def transform_to_wwt_supported_fits(
+    image, output_file, overwrite, block_size=None, parallel=None
+):
     # Workaround because `reproject` currently only accepts 2D inputs. This is a
     # hack and it would be better to update reproject to do this processing.
     # Also, this logic is copy/pasting `toasty.collection.SimpleFitsCollection`.
 
     import warnings
+    from astropy.coordinates import ICRS
+    from astropy.io import fits
+    from reproject import reproject_interp
+    from reproject.mosaicking import find_optimal_celestial_wcs
     from reproject.utils import parse_input_data
 
     with warnings.catch_warnings():
@@ -84,18 +118,413 @@ def transform_to_wwt_supported_fits(image, output_file, overwrite):
     # End workaround.
 
     wcs, shape_out = find_optimal_celestial_wcs([image], frame=ICRS(), projection="TAN")
-    array = reproject_interp(image, wcs, shape_out=shape_out, return_footprint=False)
-    fits.writeto(
-        output_file, array.astype(np.float32), wcs.to_header(), overwrite=overwrite
+
+    if block_size is None:
+        block_size = REPROJECT_BLOCK_SIZE
+
+    if max(shape_out) <= block_size:
+        array = reproject_interp(
+            image, wcs, shape_out=shape_out, return_footprint=False
+        )
+        fits.writeto(
+            output_file, array.astype(np.float32), wcs.to_header(), overwrite=overwrite
+        )
+        return
+
+    output = _create_fits_memmap(output_file, shape_out, wcs.to_header(), overwrite)
+    try:
+        _reproject_blocks(image, wcs, output, block_size, parallel)
+        output.flush()
+    except BaseException:
+        del output
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
+
+
+def _create_fits_memmap(output_file, shape, header, overwrite):
+    # Write the header and reserve the space for the data without ever having
+    # it in memory, and return the data as a writable memory map.
+    from astropy.io import fits
+
+    if not overwrite and os.path.exists(output_file):
+        raise OSError(f"File {output_file!r} already exists.")
+
+    hdu = fits.PrimaryHDU(np.zeros((1, 1), dtype=np.float32))
+    hdu.header.update(header)
+    hdu.header["NAXIS1"] = shape[1]
+    hdu.header["NAXIS2"] = shape[0]
+    header_bytes = hdu.header.tostring().encode("ascii")
+
+    # FITS files are made of 2880-byte blocks.
+    data_size = -(-shape[0] * shape[1] * 4 // 2880) * 2880
+
+    with open(output_file, "wb") as f:
+        f.write(header_bytes)
+        f.truncate(len(header_bytes) + data_size)
+
+    return np.memmap(
+        output_file, dtype=">f4", mode="r+", offset=len(header_bytes), shape=shape
+    )
+
+
+def _reproject_blocks(image, wcs_out, output, block_size, parallel):
+    from concurrent.futures import ThreadPoolExecutor
+
+    ny, nx = output.shape
+    blocks = [
+        (slice(y, min(y + block_size, ny)), slice(x, min(x + block_size, nx)))
+        for y in range(0, ny, block_size)
+        for x in range(0, nx, block_size)
+    ]
+
+    def reproject_block(block):
+        output[block] = _reproject_block(image, wcs_out, block)
+
+    with ThreadPoolExecutor(parallel or os.cpu_count()) as executor:
+        # Consuming the results raises the first error, if any.
+        for _ in executor.map(reproject_block, blocks):
+            pass
+
+
+def _reproject_block(image, wcs_out, block):
+    # Reproject one block of the output from the part of the input that it
+    # covers, copied to a native float array first. That bounds the memory
+    # used by each block, and spares reproject from scanning the whole
+    # (often memory-mapped, big-endian) input for every block.
+    from astropy.wcs.utils import pixel_to_pixel
+    from reproject import reproject_interp
+
+    data, wcs_in = image
+    # astropy's WCS objects aren't thread-safe.
+    wcs_in = wcs_in.deepcopy()
+    wcs_block = wcs_out.deepcopy()[block]
+    ny = block[0].stop - block[0].start
+    nx = block[1].stop - block[1].start
+
+    # Find the input pixels that the block needs by mapping its edges and a
+    # coarse grid inside it.
+    step = max(ny, nx) // 16 or 1
+    grid_x, grid_y = np.meshgrid(
+        np.r_[np.arange(0, nx, step), nx - 1], np.r_[np.arange(0, ny, step), ny - 1]
+    )
+    rows, cols = np.arange(ny), np.arange(nx)
+    x = np.concatenate(
+        [grid_x.ravel(), np.zeros(ny), np.full(ny, nx - 1), cols, cols]
+    )
+    y = np.concatenate(
+        [grid_y.ravel(), rows, rows, np.zeros(nx), np.full(nx, ny - 1)]
+    )
+    x_in, y_in = pixel_to_pixel(wcs_block, wcs_in, x, y)
+    finite = np.isfinite(x_in) & np.isfinite(y_in)
+
+    if not finite.all():
+        # Some of the block falls outside of the input's projection, and the
+        # grid can miss what the rest of it needs near that edge, so map
+        # every pixel of the block instead.
+        y, x = np.indices((ny, nx))
+        x_in, y_in = pixel_to_pixel(wcs_block, wcs_in, x.ravel(), y.ravel())
+        finite = np.isfinite(x_in) & np.isfinite(y_in)
+        if not finite.any():
+            return np.nan
+        x_in, y_in = x_in[finite], y_in[finite]
+
+    margin = REPROJECT_BLOCK_MARGIN
+    y0 = max(int(np.floor(y_in.min())) - margin, 0)
+    y1 = min(int(np.ceil(y_in.max())) + margin + 1, data.shape[0])
+    x0 = max(int(np.floor(x_in.min())) - margin, 0)
+    x1 = min(int(np.ceil(x_in.max())) + margin + 1, data.shape[1])
+
+    if y0 >= y1 or x0 >= x1:
+        return np.nan
+
+    cutout = np.asarray(data[y0:y1, x0:x1], dtype=float)
+
+    return reproject_interp(
+        (cutout, wcs_in[y0:y1, x0:x1]),
+        wcs_block,
+        shape_out=(ny, nx),
+        return_footprint=False,
+    )
+
+
+def get_cache_dir(*subdirs):
+    """
+    Return (creating it if needed) a directory for ipywwt's on-disk caches.
+
+    The location can be set with the ``IPYWWT_CACHE_DIR`` environment
+    variable, and otherwise follows ``XDG_CACHE_HOME``.
+    """
+    root = os.environ.get("IPYWWT_CACHE_DIR")
+    if not root:
+        root = os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+            "ipywwt",
+        )
+
+    cache_dir = os.path.join(root, *subdirs)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def file_digest(filename):
+    """
+    Return a hex digest of the content of a file, read in chunks.
+    """
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+# How much image data is hashed at a time, in bytes.
+HASH_CHUNK_SIZE = 16 * 1024 * 1024
+
+# The dtypes of FITS image data, by BITPIX.
+FITS_BITPIX_DTYPES = {8: "u1", 16: ">i2", 32: ">i4", 64: ">i8", -32: ">f4", -64: ">f8"}
+
+
+def new_digest():
+    """
+    Return a new hash object for content hashes: XXH3 if the ``xxhash``
+    package is available, since it is much faster, and BLAKE2 otherwise.
+
+    The same content gives different hashes with each, so keys should be made
+    with `digest_key`, which tells them apart.
+    """
+    try:
+        import xxhash
+    except ImportError:
+        import hashlib
+
+        return hashlib.blake2b(digest_size=16)
+    else:
+        return xxhash.xxh3_128()
+
+
+def digest_key(digest):
+    """
+    Return a key for the content fed to a hash object from `new_digest`: its
+    hex digest, prefixed with the name of the algorithm, so that keys only
+    match when they were made the same way.
+    """
+    import hashlib
+
+    name = "blake2b" if isinstance(digest, hashlib.blake2b) else "xxh3"
+    return "{0}-{1}".format(name, digest.hexdigest())
+
+
+def update_digest_with_array(digest, data):
+    """
+    Feed the dtype, shape and values of an array to a hash object, a chunk of
+    rows at a time, without copying more than a chunk.
+
+    Values are hashed in big-endian order, as stored in FITS files, so an
+    array gives the same hash whether it was read from a file or not.
+    """
+    data = np.asanyarray(data)
+    dtype = data.dtype.newbyteorder(">") if data.dtype.byteorder != "|" else data.dtype
+    digest.update("{}{}".format(dtype.str, data.shape).encode("utf-8"))
+
+    if data.ndim == 0:
+        data = data.reshape(1)
+
+    step = max(1, HASH_CHUNK_SIZE // max(data[:1].nbytes, 1))
+    for start in range(0, len(data), step):
+        # Both conversions are no-ops for FITS data read from a file.
+        chunk = data[start : start + step].astype(dtype, copy=False)
+        digest.update(np.ascontiguousarray(chunk))
+
+
+def update_digest_with_hdu(digest, hdu):
+    """
+    Feed the data and header of an image HDU to a hash object.
+
+    If the data hasn't been loaded yet and is stored as is in an uncompressed
+    file, it is hashed straight from a memory map of the file, which avoids
+    having Astropy read it into memory first. Both ways give the same hash.
+    """
+    data = None
+
+    if not hdu._data_loaded and _has_raw_file_data(hdu):
+        info = hdu.fileinfo()
+        data = np.memmap(
+            info["file"].name,
+            dtype=FITS_BITPIX_DTYPES[hdu.header["BITPIX"]],
+            mode="r",
+            offset=info["datLoc"],
+            shape=hdu.shape,
+        )
+
+    if data is None:
+        data = hdu.data
+
+    if data is not None:
+        update_digest_with_array(digest, data)
+    digest.update(hdu.header.tostring().encode("utf-8"))
+
+
+def _has_raw_file_data(hdu):
+    # Whether the data of an HDU is stored in a plain file as the array that
+    # Astropy would give us, without any scaling or blanking.
+    from astropy.io import fits
+
+    if isinstance(hdu, fits.CompImageHDU):
+        return False
+
+    info = hdu.fileinfo()
+    if info is None or info["file"].compression is not None:
+        return False
+    filename = info["file"].name
+    if not isinstance(filename, str) or not os.path.isfile(filename):
+        return False
+
+    header = hdu.header
+    return (
+        header.get("BITPIX") in FITS_BITPIX_DTYPES
+        and header.get("BSCALE", 1) == 1
+        and header.get("BZERO", 0) == 0
+        and "BLANK" not in header
+        and len(hdu.shape) > 0
     )
 
 
+class _SanitizedImage:
+    def __init__(self, filename):
+        self.filename = filename
+        self.refs = 0
+        self.ready = False
+        self.lock = threading.Lock()
+
+
+# Sanitized images shared by the image layers of this process, by key.
+_sanitized_images = {}
+_sanitized_images_lock = threading.Lock()
+_sanitized_images_dir = None
+
+
+def _sanitized_image_key(image, hdu_index=None, block_size=None):
+    # A key for the result of sanitizing an image, or None if we can't tell
+    # what's in the image. The number of threads doesn't change the result.
+    from astropy.io import fits
+
+    digest = new_digest()
+    digest.update(repr((hdu_index, block_size)).encode("utf-8"))
+
+    if isinstance(image, str):
+        digest.update(file_digest(image).encode("ascii"))
+    elif isinstance(image, (fits.ImageHDU, fits.PrimaryHDU, fits.CompImageHDU)):
+        update_digest_with_hdu(digest, image)
+    elif isinstance(image, tuple) and len(image) == 2:
+        array, wcs = image
+        update_digest_with_array(digest, array)
+        digest.update(wcs.to_header_string(relax=True).encode("utf-8"))
+    else:
+        return None
+
+    return digest_key(digest)
+
+
+def acquire_sanitized_image(image, hdu_index=None, block_size=None, parallel=None):
+    """
+    Return a sanitized copy of an image (see `sanitize_image`), sanitizing it
+    only if no copy of the same data is in use already.
+
+    Each call must be balanced by a call to `release_sanitized_image`, which
+    removes the copy once it isn't used anymore.
+    """
+    global _sanitized_images_dir
+
+    key = _sanitized_image_key(image, hdu_index=hdu_index, block_size=block_size)
+    if key is None:
+        key = uuid.uuid4().hex
+
+    with _sanitized_images_lock:
+        if _sanitized_images_dir is None:
+            _sanitized_images_dir = tempfile.TemporaryDirectory(
+                prefix="ipywwt-sanitized-"
+            )
+
+        entry = _sanitized_images.get(key)
+        if entry is None:
+            entry = _sanitized_images[key] = _SanitizedImage(
+                os.path.join(_sanitized_images_dir.name, key + ".fits")
+            )
+        entry.refs += 1
+
+    try:
+        with entry.lock:
+            if not entry.ready:
+                sanitize_image(
+                    image,
+                    entry.filename,
+                    overwrite=True,
+                    hdu_index=hdu_index,
+                    block_size=block_size,
+                    parallel=parallel,
+                )
+                entry.ready = True
+    except BaseException:
+        release_sanitized_image(entry.filename)
+        raise
+
+    return entry.filename
+
+
+def sanitized_image_key(filename):
+    """
+    Return the key of a sanitized image returned by `acquire_sanitized_image`.
+
+    The key identifies the content of the image: while the image is in use,
+    the file is never rewritten with different data.
+    """
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def release_sanitized_image(filename):
+    """
+    Stop using a sanitized image returned by `acquire_sanitized_image`,
+    removing it if nothing else uses it.
+    """
+    key = sanitized_image_key(filename)
+
+    with _sanitized_images_lock:
+        entry = _sanitized_images.get(key)
+        if entry is None or entry.filename != filename:
+            return
+
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+
+        del _sanitized_images[key]
+
+    # Along with the statistics cached next to it.
+    for name in (filename, filename + ".stats.json"):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
+
+
 def validate_traits(cls, traits):
     """
     Helper function to ensure user-provided trait names match those of the
-    class they're being used to instantiate.
+    class they're being used to instantiate. ``cls`` can be the class or an
+    instance of it.
     """
-    mismatch = [key for key in traits if key not in cls.trait_names()]
+    if isinstance(cls, type):
+        names = cls.class_trait_names()
+    else:
+        names = cls.trait_names()
+    mismatch = [key for key in traits if key not in names]
     if mismatch:
         raise KeyError(
             "Key{0} {1} do{2}n't match any layer trait name".format(
@@ -112,6 +541,8 @@ def ensure_utc(tm, str_allowed):
     if str_allowed == True) into UTC before passing it to WWT.
     str_allowed is True for wwt.set_current_time (core.py) and False for TableLayer's 'time_att' implementation (layers.py).
     """
+    import pytz
+    from astropy.time import Time
 
     if tm is None:
         utc_tm = datetime.utcnow().astimezone(pytz.UTC).isoformat()
@@ -135,3 +566,42 @@ def ensure_utc(tm, str_allowed):
             raise ValueError("Time must be a datetime or astropy.Time object")
 
     return utc_tm
+
+
+def ensure_utc_column(times):
+    """
+    Vectorized counterpart of `ensure_utc` for whole table columns: convert a
+    column of astropy Times, numpy datetime64 values, datetimes or ISOT
+    strings into an array of UTC ISO 8601 strings, in a single bulk
+    conversion rather than one element at a time. Naive datetimes are assumed
+    to be in UTC, as in `ensure_utc`.
+
+    Raises `ValueError` if any of the values isn't a valid time.
+    """
+    from astropy.time import Time
+
+    if not isinstance(times, Time):
+        times = np.asarray(times)
+        kind = times.dtype.kind
+
+        if kind in "US":
+            try:
+                times = Time(times, format="isot")
+            except ValueError:
+                raise ValueError(
+                    "String times must conform to the ISOT "
+                    "standard (YYYY-MM-DD`T`HH:MM:SS:MS)"
+                ) from None
+        else:
+            try:
+                if kind not in "MO":
+                    raise TypeError(times.dtype)
+                times = Time(times)
+            except (ValueError, TypeError):
+                raise ValueError(
+                    "A time column must only have string, "
+                    "datetime.datetime, or astropy Time values"
+                ) from None
+
+    utc_tm = Time(times, precision=6, copy=False).utc.isot
+    return np.char.add(utc_tm, "+00:00")
@@ -20,6 +20,20 @@ const ReferenceFramesRadius = {
     Callisto: 2410300
 };
 
+// The extended messages that this frontend handles, reported to pywwt so
+// that it doesn't send them to older builds.
+const FRONTEND_FEATURES = [
+    "batch",
+    "image_layer_order_multi",
+    "table_layer_append_rows",
+    "table_layer_create_binary",
+    "table_layer_set_multi",
+    "table_layer_update_binary",
+    "table_layer_upsert_columns",
+    "tiling_progress",
+    "upload_start",
+];
+
 export function createRender(app) {
 	return ({ model, el }) => {
         // let _appUrl = location.toString();
@@ -56,13 +70,104 @@ export function createRender(app) {
         vm.layers = {};
 
         // Setup custom message handling
-        model.on("msg:custom", (msg) => {
+        model.on("msg:custom", (msg, buffers) => {
+            // Binary payloads arrive as DataViews; hand the app standalone
+            // ArrayBuffers so that typed arrays can be built on them directly.
+            if (buffers && buffers.length > 0) {
+                msg.buffers = buffers.map((view) =>
+                    view.buffer.slice(view.byteOffset, view.byteOffset + view.byteLength));
+            }
+
+            receiveMessage(msg);
+        })
+
+        // Large messages arrive in chunks. Messages sent after an upload
+        // started wait for it here, so that everything is handled in the
+        // order pywwt sent it.
+        const uploads = {};
+        const held = [];
+        const textDecoder = new TextDecoder();
+
+        function receiveMessage(msg) {
+            switch (msg.event) {
+                case "upload_start":
+                    uploads[msg.id] = {
+                        start: msg,
+                        data: new Uint8Array(msg.size),
+                        received: 0,
+                        msg: null,
+                    };
+                    held.push(uploads[msg.id]);
+                    break;
+                case "upload_chunk":
+                    receiveChunk(msg);
+                    break;
+                default:
+                    if (held.length > 0) {
+                        held.push({ msg: msg });
+                    } else {
+                        handleMessage(msg);
+                    }
+            }
+        }
+
+        function receiveChunk(msg) {
+            const upload = uploads[msg.id];
+            let offset = msg.offset;
+            msg.buffers.forEach((buffer) => {
+                upload.data.set(new Uint8Array(buffer), offset);
+                offset += buffer.byteLength;
+            });
+            upload.received += offset - msg.offset;
+
+            // Let pywwt send the next chunk.
+            model.send({ type: "wwt_upload_ack", id: msg.id, seq: msg.seq });
+
+            if (upload.received < upload.data.length) {
+                return;
+            }
+
+            // The message is JSON, followed by its buffers.
+            const start = upload.start;
+            upload.msg = JSON.parse(
+                textDecoder.decode(upload.data.subarray(0, start.header_size)));
+            let position = start.header_size;
+            const buffers = start.buffer_sizes.map((size) => {
+                const buffer = upload.data.buffer.slice(position, position + size);
+                position += size;
+                return buffer;
+            });
+            if (buffers.length > 0) {
+                upload.msg.buffers = buffers;
+            }
+            upload.data = null;
+            delete uploads[msg.id];
+
+            while (held.length > 0 && held[0].msg !== null) {
+                handleMessage(held.shift().msg);
+            }
+        }
+
+        function handleMessage(msg) {
             let layerId = null;
             let proxyLayer = null;
             let layer = null;
             let event = null;
 
             switch (msg.event) {
+                case "batch":
+                    // Messages sent together by pywwt, each followed by its
+                    // share of the buffers.
+                    let offset = 0;
+                    msg.messages.forEach((submsg, index) => {
+                        const count = msg.buffer_counts[index];
+                        if (count > 0) {
+                            submsg.buffers = msg.buffers.slice(offset, offset + count);
+                        }
+                        offset += count;
+                        handleMessage(submsg);
+                    });
+                    break;
                 case "center_on_coordinates":
                     console.log(classicPywwt.isCenterOnCoordinatesMessage(msg));
                     window.postMessage(msg);
@@ -81,16 +186,21 @@ export function createRender(app) {
 
                     window.postMessage(msg);
                     break;
+                case "table_layer_create_binary":
+                case "table_layer_update_binary":
+                case "table_layer_upsert_columns":
+                case "table_layer_append_rows":
+                    window.postMessage(msg, "*", msg.buffers);
+                    break;
                 case "table_layer_set":
-                    [layerId, proxyLayer] = Object.entries(vm.wwtSpreadSheetLayers).filter( ([key, item]) => item.name === msg['id']).at(0);
-                    layer = vm.spreadSheetLayerById(layerId);
-
                     let name = msg['setting'];
                     let value = null;
 
                     //if (name.includes('Column')) { // compatability issues?
                     if (name.indexOf('Column') >= 0) {
-                        value = layer.get__table().header.indexOf(msg['value']);
+                        // Column names are resolved against the layer's header by
+                        // the app itself, after any pending column uploads land.
+                        value = msg['value'];
                     } else if (name == 'color') {
                         // value = wwtlib.Color.fromHex(msg['value']);
                         value = msg['value']; // expects a hex string
@@ -119,10 +229,24 @@ export function createRender(app) {
                     msg['value'] = value;
                     window.postMessage(msg);
                     break;
+                case "table_layer_set_multi":
+                    // Values are resolved by the app, like the per-setting
+                    // messages it receives from pywwt.
+                    window.postMessage(msg);
+                    break;
                 case 'table_layer_remove':
                     layer = vm.layers[msg['id']];
                     window.postMessage(msg);
                     break;
+                case "image_layer_create":
+                case "image_layer_remove":
+                case "image_layer_set":
+                case "image_layer_stretch":
+                case "image_layer_cmap":
+                case "image_layer_order":
+                case "image_layer_order_multi":
+                    window.postMessage(msg);
+                    break;
                 case "load_image_collection":
                     window.postMessage(msg);
                     break;
@@ -138,10 +262,13 @@ export function createRender(app) {
                 case "clear_tile_cache":
                     window.postMessage(msg);
                     break;
+                case "tiling_progress":
+                    window.postMessage(msg);
+                    break;
                 default:
                     console.log(`Received uncaught custom message of type ${msg.event}.`)
             }
-        })
+        }
 
         // Forward events from within the Vue app to the python model
         window.addEventListener(
@@ -149,6 +276,7 @@ export function createRender(app) {
             (event) => {
                 if (event.data.event === "research_app_ready") {
                     console.log("Research app ready");
+                    model.set("frontend_features", FRONTEND_FEATURES);
                     model.set("mounted", true);
                     model.save_changes();
                     return ;
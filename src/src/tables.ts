@@ -0,0 +1,197 @@
+/** Decoding of the binary columnar table transport used by ipywwt.
+ *
+ * Instead of a base64-encoded CSV string, table data can arrive as a list of
+ * column descriptions plus one raw little-endian buffer per column, delivered
+ * through the widget's binary `buffers` channel. The engine still ingests
+ * tables as CSV text, so here we turn the typed arrays back into that form
+ * without any base64 decoding or per-value parsing on the Python side.
+ */
+
+/** A description of one column of a binary table message. */
+export interface BinaryColumn {
+  name: string;
+  dtype: string;
+  itemsize?: number;
+}
+
+export interface CreateTableLayerBinaryMessage {
+  event: "table_layer_create_binary";
+  id: string;
+  frame: string;
+  columns: BinaryColumn[];
+  buffers: ArrayBuffer[];
+}
+
+export interface UpdateTableLayerBinaryMessage {
+  event: "table_layer_update_binary";
+  id: string;
+  columns: BinaryColumn[];
+  buffers: ArrayBuffer[];
+}
+
+export interface UpsertTableLayerColumnsMessage {
+  event: "table_layer_upsert_columns";
+  id: string;
+  columns: BinaryColumn[];
+  buffers: ArrayBuffer[];
+}
+
+export interface AppendTableLayerRowsMessage {
+  event: "table_layer_append_rows";
+  id: string;
+  columns: BinaryColumn[];
+  evict: number;
+  buffers: ArrayBuffer[];
+}
+
+/** The parts of the engine's spreadsheet `Table` that we touch. */
+export interface TableData {
+  header: string[];
+  rows: string[][];
+}
+
+function isBinaryColumnMessage(o: any): boolean {  // eslint-disable-line @typescript-eslint/no-explicit-any
+  return (
+    typeof o.id === "string" &&
+    Array.isArray(o.columns) &&
+    Array.isArray(o.buffers) &&
+    o.columns.length === o.buffers.length
+  );
+}
+
+export function isCreateTableLayerBinaryMessage(o: any): o is CreateTableLayerBinaryMessage {  // eslint-disable-line @typescript-eslint/no-explicit-any
+  return (
+    o.event === "table_layer_create_binary" &&
+    typeof o.frame === "string" &&
+    isBinaryColumnMessage(o)
+  );
+}
+
+export function isUpdateTableLayerBinaryMessage(o: any): o is UpdateTableLayerBinaryMessage {  // eslint-disable-line @typescript-eslint/no-explicit-any
+  return o.event === "table_layer_update_binary" && isBinaryColumnMessage(o);
+}
+
+export function isUpsertTableLayerColumnsMessage(o: any): o is UpsertTableLayerColumnsMessage {  // eslint-disable-line @typescript-eslint/no-explicit-any
+  return o.event === "table_layer_upsert_columns" && isBinaryColumnMessage(o);
+}
+
+export function isAppendTableLayerRowsMessage(o: any): o is AppendTableLayerRowsMessage {  // eslint-disable-line @typescript-eslint/no-explicit-any
+  return (
+    o.event === "table_layer_append_rows" &&
+    typeof o.evict === "number" &&
+    isBinaryColumnMessage(o)
+  );
+}
+
+const typedArrays = {
+  float64: Float64Array,
+  float32: Float32Array,
+  int8: Int8Array,
+  int16: Int16Array,
+  int32: Int32Array,
+  uint8: Uint8Array,
+  uint16: Uint16Array,
+  uint32: Uint32Array,
+};
+
+const textDecoder = new TextDecoder();
+
+function csvValue(value: string): string {
+  if (value.indexOf(",") >= 0 || value.indexOf("\"") >= 0) {
+    return "\"" + value.replace(/"/g, "\"\"") + "\"";
+  }
+  return value;
+}
+
+/** Decode a single column buffer into the string values the engine expects. */
+export function decodeColumn(column: BinaryColumn, buffer: ArrayBuffer): string[] {
+  if (column.dtype === "str") {
+    // Fixed-width, NUL-padded UTF-8.
+    const bytes = new Uint8Array(buffer);
+    const size = column.itemsize ?? 1;
+    const count = size > 0 ? bytes.length / size : 0;
+    const values: string[] = new Array(count);
+
+    for (let i = 0; i < count; i++) {
+      const start = i * size;
+      let end = start + size;
+      while (end > start && bytes[end - 1] === 0) {
+        end--;
+      }
+      values[i] = textDecoder.decode(bytes.subarray(start, end));
+    }
+
+    return values;
+  }
+
+  const ArrayType = typedArrays[column.dtype as keyof typeof typedArrays];
+  if (ArrayType === undefined) {
+    throw new Error(`unsupported column dtype ${column.dtype}`);
+  }
+
+  return Array.from(new ArrayType(buffer), (value) => String(value));
+}
+
+/** Rebuild the CSV text of a table from its binary columns. */
+export function columnsToCsv(columns: BinaryColumn[], buffers: ArrayBuffer[]): string {
+  const values = columns.map((column, index) => decodeColumn(column, buffers[index]));
+  const nrows = values.length > 0 ? values[0].length : 0;
+  const rows: string[][] = new Array(nrows);
+
+  for (let row = 0; row < nrows; row++) {
+    rows[row] = values.map((column) => column[row]);
+  }
+
+  return tableToCsv({ header: columns.map((column) => column.name), rows });
+}
+
+/** Serialize a header and rows of string values to the CSV the engine reads. */
+export function tableToCsv(table: TableData): string {
+  const lines: string[] = new Array(table.rows.length + 1);
+
+  lines[0] = table.header.map(csvValue).join(",");
+  for (let row = 0; row < table.rows.length; row++) {
+    lines[row + 1] = table.rows[row].map(csvValue).join(",");
+  }
+
+  return lines.join("\r\n");
+}
+
+/** Insert or replace the given columns in an existing table, in place. */
+export function upsertColumns(table: TableData, columns: BinaryColumn[], buffers: ArrayBuffer[]) {
+  columns.forEach((column, index) => {
+    const values = decodeColumn(column, buffers[index]);
+    let colIndex = table.header.indexOf(column.name);
+
+    if (colIndex < 0) {
+      colIndex = table.header.length;
+      table.header.push(column.name);
+    }
+
+    const nrows = Math.min(table.rows.length, values.length);
+    for (let row = 0; row < nrows; row++) {
+      table.rows[row][colIndex] = values[row];
+    }
+  });
+}
+
+/** Decode binary columns into rows laid out like an existing table's header.
+ * Columns that the message doesn't carry are left empty. */
+export function columnsToRows(table: TableData, columns: BinaryColumn[], buffers: ArrayBuffer[]): string[][] {
+  const values = columns.map((column, index) => decodeColumn(column, buffers[index]));
+  const indices = columns.map((column) => table.header.indexOf(column.name));
+  const nrows = values.length > 0 ? values[0].length : 0;
+  const rows: string[][] = new Array(nrows);
+
+  for (let row = 0; row < nrows; row++) {
+    const rowValues: string[] = new Array(table.header.length).fill("");
+    indices.forEach((colIndex, index) => {
+      if (colIndex >= 0) {
+        rowValues[colIndex] = values[index][row];
+      }
+    });
+    rows[row] = rowValues;
+  }
+
+  return rows;
+}
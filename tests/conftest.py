@@ -1,10 +1,76 @@
 """
-    Dummy conftest.py for ipywwt.
+Fixtures shared by the ipywwt tests.
 
-    If you don't know what this is for, just leave it empty.
-    Read more about conftest.py under:
-    - https://docs.pytest.org/en/stable/fixture.html
-    - https://docs.pytest.org/en/stable/writing_plugins.html
+The widget is never displayed here: messages that would go to the frontend
+are recorded instead, and the frontend is simulated by setting ``mounted``
+and ``frontend_features`` like the real one does.
 """
 
-# import pytest
+import pytest
+from anywidget import AnyWidget
+
+import ipywwt
+from ipywwt import EXTENDED_EVENTS, WWTWidget
+
+# Everything that the frontend in src/src handles.
+ALL_FEATURES = sorted(EXTENDED_EVENTS | {"upload_start"})
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """
+    The messages sent to the frontend, as ``(content, buffers)`` pairs.
+    """
+    messages = []
+
+    def send(self, content, buffers=None):
+        messages.append((content, buffers))
+
+    monkeypatch.setattr(AnyWidget, "send", send)
+    return messages
+
+
+def _make_widget(monkeypatch, features):
+    # Don't go looking for the imagery collection.
+    monkeypatch.setattr(ipywwt, "load_imagery_layers", lambda *args, **kwargs: None)
+    monkeypatch.setattr(ipywwt, "get_imagery_layers", lambda *args, **kwargs: {})
+
+    widget = WWTWidget()
+    with widget.hold_trait_notifications():
+        widget.frontend_features = features
+        widget.mounted = True
+    return widget
+
+
+@pytest.fixture
+def wwt(sent, monkeypatch):
+    """
+    A widget whose frontend handles all the messages we send.
+    """
+    widget = _make_widget(monkeypatch, ALL_FEATURES)
+    sent.clear()
+    return widget
+
+
+@pytest.fixture
+def legacy_wwt(sent, monkeypatch):
+    """
+    A widget whose frontend only handles the original messages, like the
+    bundle in ipywwt/static until it is rebuilt.
+    """
+    widget = _make_widget(monkeypatch, [])
+    sent.clear()
+    return widget
+
+
+def events(sent):
+    """
+    The events of the messages sent, with those of batches listed in place.
+    """
+    names = []
+    for content, _ in sent:
+        if content["event"] == "batch":
+            names.extend(msg["event"] for msg in content["messages"])
+        else:
+            names.append(content["event"])
+    return names
@@ -0,0 +1,197 @@
+import astropy.table
+import numpy as np
+import pytest
+from astropy.table import Table
+from matplotlib.colors import LinearSegmentedColormap
+
+from ipywwt.layers import (
+    CMAP_COLUMN_NAME,
+    TIME_COLUMN_NAME,
+    binary_columns_table,
+    cmap_hex_values,
+)
+
+
+def rows(start, stop):
+    values = np.arange(start, stop, dtype=float)
+    return Table({"ra": values, "dec": -values, "v": values * 10})
+
+
+@pytest.fixture
+def layer(wwt, sent):
+    layer = wwt.layers.add_table_layer(rows(0, 5), binary=True)
+    sent.clear()
+    return layer
+
+
+def appended(sent):
+    # The rows sent by the last append, and how many rows were evicted.
+    for content, buffers in reversed(sent):
+        if content["event"] == "table_layer_append_rows":
+            return binary_columns_table(content["columns"], buffers), content["evict"]
+
+
+def test_only_new_rows_are_sent(layer, sent):
+    layer.append_rows(rows(5, 8))
+
+    new, evict = appended(sent)
+    assert evict == 0
+    assert new["ra"].tolist() == [5, 6, 7]
+    assert new["v"].tolist() == [50, 60, 70]
+    assert layer.table["ra"].tolist() == list(range(8))
+
+
+def test_rows_need_the_same_columns(layer, sent):
+    with pytest.raises(ValueError, match="same columns"):
+        layer.append_rows(rows(5, 6)[["ra", "dec"]])
+    with pytest.raises(ValueError, match="non-negative"):
+        layer.append_rows(rows(5, 6), max_rows=-1)
+
+    assert sent == []
+    assert len(layer.table) == 5
+
+
+# Eviction
+
+
+def test_oldest_rows_are_evicted(layer, sent):
+    layer.append_rows(rows(5, 8), max_rows=6)
+
+    new, evict = appended(sent)
+    assert evict == 2
+    assert new["ra"].tolist() == [5, 6, 7]
+    assert layer.table["ra"].tolist() == [2, 3, 4, 5, 6, 7]
+
+
+def test_more_rows_than_max_rows(layer, sent):
+    layer.append_rows(rows(5, 9), max_rows=2)
+
+    # The rows that would be evicted right away aren't sent.
+    new, evict = appended(sent)
+    assert evict == 5
+    assert new["ra"].tolist() == [7, 8]
+    assert layer.table["ra"].tolist() == [7, 8]
+
+
+def test_zero_max_rows(layer, sent):
+    layer.append_rows(rows(5, 8), max_rows=0)
+
+    new, evict = appended(sent)
+    assert evict == 5
+    assert len(new) == 0
+    assert len(layer.table) == 0
+
+    layer.append_rows(rows(8, 10))
+    assert appended(sent)[0]["ra"].tolist() == [8, 9]
+    assert layer.table["ra"].tolist() == [8, 9]
+
+
+def test_rolling_window(layer, sent):
+    for start in range(5, 500, 3):
+        before = len(layer.table)
+        layer.append_rows(rows(start, start + 3), max_rows=10)
+        assert layer.table["ra"].tolist() == list(range(max(start - 7, 0), start + 3))
+        assert appended(sent)[1] == before + 3 - len(layer.table)
+
+
+# Storage
+
+
+def test_appending_is_amortized(layer, monkeypatch):
+    copies = []
+    vstack = astropy.table.vstack
+
+    def counting(*args, **kwargs):
+        copies.append(args)
+        return vstack(*args, **kwargs)
+
+    monkeypatch.setattr(astropy.table, "vstack", counting)
+    for start in range(5, 1005):
+        layer.append_rows(rows(start, start + 1))
+
+    # The table is copied each time it doubles in size.
+    assert len(copies) <= 2 * np.log2(1005)
+    assert layer.table["ra"].tolist() == list(range(1005))
+    assert layer.table["v"].tolist() == [10 * i for i in range(1005)]
+
+
+def test_changed_tables_are_copied(layer):
+    layer.append_rows(rows(5, 6))
+    layer.update_column("v", np.zeros(6))
+    layer.append_rows(rows(6, 7))
+    assert layer.table["v"].tolist() == [0] * 6 + [60]
+
+    layer.update_data(rows(0, 2))
+    layer.append_rows(rows(2, 3))
+    assert layer.table["ra"].tolist() == [0, 1, 2]
+
+
+def test_column_types_can_change(wwt):
+    table = Table({"ra": [1.0], "dec": [2.0], "name": ["a"]})
+    layer = wwt.layers.add_table_layer(table)
+    layer.append_rows(Table({"ra": [3.0], "dec": [4.0], "name": ["b"]}))
+    layer.append_rows(Table({"ra": [5], "dec": [6], "name": ["longer"]}))
+
+    assert layer.table["name"].tolist() == ["a", "b", "longer"]
+    assert layer.table["ra"].tolist() == [1, 3, 5]
+
+    masked = Table({"ra": [7.0], "dec": [8.0], "name": ["c"]}, masked=True)
+    masked["name"].mask = [True]
+    layer.append_rows(masked)
+    assert layer.table["name"].mask.tolist() == [False] * 3 + [True]
+
+
+# Derived columns
+
+
+@pytest.fixture
+def cmap():
+    return LinearSegmentedColormap.from_list("custom", ["red", "blue"])
+
+
+def test_colors_of_new_rows(wwt, sent, cmap):
+    layer = wwt.layers.add_table_layer(rows(0, 5), cmap_att="v", cmap=cmap)
+    layer.cmap_vmin = 0
+    layer.cmap_vmax = 100
+    layer.append_rows(rows(5, 11), max_rows=8)
+
+    expected = cmap_hex_values(cmap, np.arange(30, 110, 10), 0, 100)
+    assert layer.table[CMAP_COLUMN_NAME].tolist() == list(expected)
+    new, _ = appended(sent)
+    assert new[CMAP_COLUMN_NAME].tolist() == list(expected[-6:])
+
+
+def test_uniform_color_of_new_rows(wwt, sent, cmap):
+    layer = wwt.layers.add_table_layer(rows(0, 5), cmap_att="v", cmap=cmap)
+    layer.cmap_att = ""
+    fill = layer.table[CMAP_COLUMN_NAME][0]
+    layer.append_rows(rows(5, 7))
+
+    assert layer.table[CMAP_COLUMN_NAME][5:].tolist() == [fill] * 2
+    assert appended(sent)[0][CMAP_COLUMN_NAME].tolist() == [fill] * 2
+
+
+def test_times_of_new_rows(wwt, sent):
+    table = rows(0, 2)
+    table["t"] = ["2020-01-01T00:00:00", "2020-01-02T00:00:00"]
+    layer = wwt.layers.add_table_layer(
+        table, time_att="t", time_series=True, binary=True
+    )
+
+    new = rows(2, 3)
+    new["t"] = ["2020-01-03T12:00:00"]
+    layer.append_rows(new)
+
+    assert layer.table[TIME_COLUMN_NAME].tolist() == [
+        "2020-01-01T00:00:00.000000+00:00",
+        "2020-01-02T00:00:00.000000+00:00",
+        "2020-01-03T12:00:00.000000+00:00",
+    ]
+    assert appended(sent)[0][TIME_COLUMN_NAME].tolist() == [
+        "2020-01-03T12:00:00.000000+00:00"
+    ]
+
+    new["t"] = ["noon"]
+    with pytest.raises(ValueError, match="ISOT"):
+        layer.append_rows(new)
+    assert len(layer.table) == 3
@@ -0,0 +1,159 @@
+import base64
+
+import numpy as np
+import pytest
+from astropy.table import MaskedColumn, Table
+from astropy.time import Time
+
+from ipywwt.layers import binary_columns_table, binary_table_columns
+
+from conftest import events
+
+
+def decode(spec, buffer):
+    # What the frontend reads from a buffer.
+    if spec["dtype"] == "str":
+        return np.char.decode(
+            np.frombuffer(buffer, dtype="S{0}".format(spec["itemsize"])), "utf-8"
+        )
+    return np.frombuffer(buffer, dtype=np.dtype(spec["dtype"]).newbyteorder("<"))
+
+
+def encode_one(values):
+    columns, buffers = binary_table_columns(Table({"x": values}))
+    assert len(columns) == len(buffers) == 1
+    return columns[0], decode(columns[0], buffers[0])
+
+
+@pytest.mark.parametrize(
+    "dtype, wire_dtype",
+    [
+        (np.int8, "int8"),
+        (np.uint16, "uint16"),
+        (np.int32, "int32"),
+        (np.uint32, "uint32"),
+        (np.float32, "float32"),
+        (np.float64, "float64"),
+        (np.bool_, "uint8"),
+    ],
+)
+def test_numeric_dtypes_are_kept(dtype, wire_dtype):
+    spec, values = encode_one(np.array([0, 1, 1, 0], dtype=dtype))
+    assert spec == {"name": "x", "dtype": wire_dtype}
+    np.testing.assert_array_equal(values, [0, 1, 1, 0])
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.array([-(2**40), 3, 2**52], dtype=np.int64),
+        np.array([0, 3, 2**52], dtype=np.uint64),
+    ],
+)
+def test_64_bit_integers_are_widened_to_float64(values):
+    # JavaScript numbers can't hold all 64-bit integers.
+    spec, decoded = encode_one(values)
+    assert spec["dtype"] == "float64"
+    assert decoded.dtype == np.dtype("<f8")
+    np.testing.assert_array_equal(decoded, values.astype(float))
+
+
+def test_big_endian_columns_are_sent_little_endian():
+    spec, values = encode_one(np.arange(4, dtype=">f8"))
+    assert spec["dtype"] == "float64"
+    np.testing.assert_array_equal(values, [0, 1, 2, 3])
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.int64, np.float32, np.float64])
+def test_masked_values_become_nan(dtype):
+    column = MaskedColumn([1, 2, 3, 4], mask=[False, True, False, True], dtype=dtype)
+    spec, values = encode_one(column)
+    assert spec["dtype"] in ("float32", "float64")
+    np.testing.assert_array_equal(np.isnan(values), [False, True, False, True])
+    np.testing.assert_array_equal(values[[0, 2]], [1, 3])
+
+
+def test_unmasked_masked_columns_keep_their_dtype():
+    spec, _ = encode_one(MaskedColumn([1, 2], mask=[False, False], dtype=np.int16))
+    assert spec["dtype"] == "int16"
+
+
+def test_strings_are_fixed_width_utf8():
+    spec, values = encode_one(np.array(["a", "bcd", "Sérsic", ""]))
+    assert spec["dtype"] == "str"
+    assert spec["itemsize"] == len("Sérsic".encode("utf-8"))
+    assert values.tolist() == ["a", "bcd", "Sérsic", ""]
+
+
+def test_masked_strings_become_empty():
+    column = MaskedColumn(["a", "b", "c"], mask=[False, True, False])
+    _, values = encode_one(column)
+    assert values.tolist() == ["a", "", "c"]
+
+
+def test_objects_are_sent_as_strings():
+    _, values = encode_one(np.array([1, "two", 3.5], dtype=object))
+    assert values.tolist() == ["1", "two", "3.5"]
+
+
+def test_times_are_sent_as_isot():
+    table = Table({"t": Time(["2020-01-01T00:00:00", "2021-06-15T12:30:00"])})
+    columns, buffers = binary_table_columns(table)
+    assert decode(columns[0], buffers[0]).tolist() == [
+        "2020-01-01T00:00:00.000",
+        "2021-06-15T12:30:00.000",
+    ]
+
+
+def test_column_selection_and_order():
+    table = Table({"a": [1.0], "b": [2.0], "c": [3.0]})
+    columns, buffers = binary_table_columns(table, ["c", "a"])
+    assert [spec["name"] for spec in columns] == ["c", "a"]
+    assert [decode(spec, buffer)[0] for spec, buffer in zip(columns, buffers)] == [3, 1]
+
+
+def test_buffers_share_memory_when_possible():
+    values = np.arange(10, dtype=np.float64)
+    table = Table({"x": values}, copy=False)
+    _, buffers = binary_table_columns(table)
+    assert np.shares_memory(np.asarray(buffers[0]), values)
+
+
+def test_round_trip():
+    table = Table(
+        {
+            "ra": np.linspace(0, 360, 7),
+            "n": np.arange(7, dtype=np.int32),
+            "name": ["s{0}".format(i) for i in range(7)],
+        }
+    )
+    columns, buffers = binary_table_columns(table)
+    # Buffers go over the wire as bytes.
+    result = binary_columns_table(columns, [bytes(buffer) for buffer in buffers])
+    assert result.colnames == table.colnames
+    for name in table.colnames:
+        assert result[name].tolist() == table[name].tolist()
+
+
+def test_binary_layer_sends_buffers(wwt, sent):
+    table = Table({"ra": np.arange(5.0), "dec": np.arange(5.0), "n": np.arange(5)})
+    wwt.layers.add_table_layer(table, binary=True)
+
+    (content, buffers), = sent
+    create = content["messages"][0]
+    assert create["event"] == "table_layer_create_binary"
+    assert [spec["name"] for spec in create["columns"]] == ["ra", "dec", "n"]
+    assert content["buffer_counts"][0] == 3
+    np.testing.assert_array_equal(np.frombuffer(buffers[2], dtype="<f8"), np.arange(5))
+
+
+def test_binary_layer_falls_back_to_csv(legacy_wwt, sent):
+    table = Table({"ra": [1.5, 2.5], "dec": [-3.0, 4.0], "name": ["a", "b"]})
+    legacy_wwt.layers.add_table_layer(table, binary=True)
+
+    assert "table_layer_create_binary" not in events(sent)
+    content, buffers = sent[0]
+    assert content["event"] == "table_layer_create"
+    assert buffers is None
+    csv = base64.b64decode(content["table"]).decode("ascii")
+    assert csv.split("\r\n")[:3] == ["ra,dec,name", "1.5,-3.0,a", "2.5,4.0,b"]
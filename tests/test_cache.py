@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from ipywwt import cache as cache_module
+from ipywwt.cache import DiskCache, cache_key
+
+# Holds an entry in another process until its input is closed.
+USER_SCRIPT = """
+import sys
+from ipywwt.cache import DiskCache
+
+cache = DiskCache(sys.argv[1])
+assert cache.get(sys.argv[2]) is not None
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DiskCache(str(tmp_path), max_size=0)
+
+
+def add(cache, key, data=b"x" * 100):
+    def write(tmp):
+        with open(os.path.join(tmp, "data"), "wb") as f:
+            f.write(data)
+
+    return cache.fetch(key, write)
+
+
+def keys(cache):
+    return sorted(key for _, _, key in cache._entries())
+
+
+def forget(cache, key):
+    # As if another process had used the entry, and exited.
+    cache._unmark_used(key)
+
+
+def test_cache_key_separates_parts():
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+    assert cache_key("a", 1) == cache_key("a", 1)
+
+
+def test_fetch_builds_once(cache):
+    calls = []
+    entry = cache.fetch("k", lambda tmp: calls.append(tmp))
+    assert cache.fetch("k", lambda tmp: calls.append(tmp)) == entry
+    assert len(calls) == 1
+    assert cache.get("missing") is None
+
+
+def test_failed_builds_leave_nothing(cache):
+    with pytest.raises(RuntimeError):
+        with cache.build("k") as tmp:
+            open(os.path.join(tmp, "data"), "w").close()
+            raise RuntimeError()
+
+    assert cache.get("k") is None
+    assert os.listdir(cache.root) == [".locks"]
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.max_size = 1000
+    for key in ["a", "b", "c"]:
+        add(cache, key)
+        forget(cache, key)
+        time.sleep(0.01)
+    cache.get("a")
+    forget(cache, "a")
+
+    cache.max_size = 250
+    cache.evict()
+    assert keys(cache) == ["a", "c"]
+
+
+def test_entries_used_by_this_process_are_kept(cache):
+    add(cache, "a")
+    add(cache, "b")
+    forget(cache, "b")
+
+    cache.evict()
+    assert keys(cache) == ["a"]
+
+
+@pytest.mark.skipif(not cache_module.SHARED_LOCKS, reason="needs shared file locks")
+def test_entries_used_by_other_processes_are_kept(cache):
+    add(cache, "a")
+    forget(cache, "a")
+
+    user = subprocess.Popen(
+        [sys.executable, "-c", USER_SCRIPT, cache.root, "a"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert user.stdout.readline() == "ready\n"
+        cache.clear()
+        assert keys(cache) == ["a"]
+    finally:
+        user.stdin.close()
+        user.wait()
+
+    # The lock went away with the process.
+    cache.clear()
+    assert keys(cache) == []
+
+
+def test_without_shared_locks_recent_entries_are_kept(cache, monkeypatch):
+    monkeypatch.setattr(cache_module, "SHARED_LOCKS", False)
+    add(cache, "a")
+    forget(cache, "a")
+
+    cache.evict()
+    assert keys(cache) == ["a"]
+
+    monkeypatch.setattr(cache_module, "IN_USE_WINDOW", 0)
+    cache.evict()
+    assert keys(cache) == []
+
+
+def test_remove(cache):
+    add(cache, "a")
+    cache.remove("a")
+    assert cache.get("a") is None
+    assert "a" not in cache._used
@@ -0,0 +1,165 @@
+import asyncio
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ipywwt import camera
+from ipywwt.camera import CameraHistory, CameraState
+
+
+def state(i):
+    return CameraState(float(i), i + 0.1, i + 0.2, i + 0.3, i + 0.4)
+
+
+def move(wwt, fov):
+    wwt._on_app_message_received(
+        wwt,
+        {
+            "type": "wwt_view_state",
+            "raRad": math.radians(10.0),
+            "decRad": math.radians(20.0),
+            "fovDeg": fov,
+            "rollDeg": 0.0,
+            "engineClockISOT": "2020-01-01T00:00:00",
+            "systemClockISOT": "2020-01-01T00:00:00",
+            "engineClockRateFactor": 1.0,
+        },
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A clock for the subscriptions that only moves when told to.
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(camera, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+# History
+
+
+def test_history_keeps_states_in_order():
+    history = CameraHistory(4)
+    for i in range(3):
+        history.append(state(i))
+
+    assert len(history) == 3
+    assert history.to_array().tolist() == [list(state(i)) for i in range(3)]
+
+
+def test_history_overwrites_oldest_states():
+    history = CameraHistory(4)
+    for i in range(10):
+        history.append(state(i))
+
+    assert len(history) == 4
+    assert history.time.tolist() == [6, 7, 8, 9]
+    assert history.to_array().tolist() == [list(state(i)) for i in range(6, 10)]
+
+
+def test_history_columns():
+    history = CameraHistory(3)
+    for i in range(5):
+        history.append(state(i))
+
+    for index, name in enumerate(CameraState._fields):
+        np.testing.assert_array_equal(
+            getattr(history, name), [state(i)[index] for i in range(2, 5)]
+        )
+    with pytest.raises(AttributeError):
+        history.zoom
+
+
+def test_empty_history():
+    history = CameraHistory(0)
+    history.append(state(0))
+
+    assert len(history) == 0
+    assert history.to_array().shape == (0, len(CameraState._fields))
+
+
+def test_widget_history_is_resized(wwt):
+    for fov in range(1, 11):
+        move(wwt, fov)
+
+    wwt.camera_history_size = 3
+    assert wwt.camera_history.size == 3
+    assert wwt.camera_history.fov.tolist() == [8, 9, 10]
+
+    wwt.camera_history_size = 5
+    move(wwt, 11)
+    assert wwt.camera_history.fov.tolist() == [8, 9, 10, 11]
+
+
+# Subscriptions
+
+
+def test_subscription_gets_every_update(wwt):
+    calls = []
+    wwt.subscribe_camera(lambda widget, view: calls.append((widget, view)))
+
+    move(wwt, 30)
+    move(wwt, 20)
+
+    assert [view.fov for _, view in calls] == [30, 20]
+    assert calls[0][0] is wwt
+    assert calls[0][1].ra == pytest.approx(10)
+    assert calls[0][1].dec == pytest.approx(20)
+
+
+def test_subscription_is_rate_limited_without_event_loop(wwt, clock):
+    calls = []
+    wwt.subscribe_camera(lambda widget, view: calls.append(view.fov), max_rate=2)
+
+    for fov in range(1, 6):
+        move(wwt, fov)
+    assert calls == [1]
+
+    # The first update after the interval carries the latest state.
+    clock.now += 0.5
+    move(wwt, 6)
+    move(wwt, 7)
+    assert calls == [1, 6]
+
+
+def test_subscription_coalesces_updates_with_event_loop(wwt):
+    calls = []
+    wwt.subscribe_camera(lambda widget, view: calls.append(view.fov), max_rate=20)
+
+    async def burst():
+        for fov in range(1, 11):
+            move(wwt, fov)
+        assert calls == [1]
+        await asyncio.sleep(0.2)
+
+    asyncio.run(burst())
+
+    assert calls == [1, 10]
+
+
+def test_cancelled_subscription_gets_nothing(wwt):
+    calls = []
+    subscription = wwt.subscribe_camera(lambda widget, view: calls.append(view))
+
+    move(wwt, 30)
+    subscription.cancel()
+    subscription.cancel()
+    move(wwt, 20)
+
+    assert len(calls) == 1
+
+
+def test_failing_callback_is_logged(wwt, caplog):
+    calls = []
+
+    def fail(widget, view):
+        raise RuntimeError("oops")
+
+    wwt.subscribe_camera(fail)
+    wwt.subscribe_camera(lambda widget, view: calls.append(view))
+    move(wwt, 30)
+
+    assert len(calls) == 1
+    assert "unhandled Python exception" in caplog.text
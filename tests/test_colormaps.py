@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from matplotlib import colormaps
+from matplotlib.colors import LinearSegmentedColormap, to_hex
+
+from ipywwt.layers import cmap_hex_lut, cmap_hex_values
+
+
+def hex_loop(cmap, values, vmin, vmax):
+    # Converting every row, as the lookup table must reproduce.
+    rgb = cmap((values - vmin) / (vmax - vmin))[:, :-1]
+    return [to_hex(x) for x in rgb]
+
+
+@pytest.mark.parametrize(
+    "cmap",
+    [
+        colormaps["viridis"],
+        LinearSegmentedColormap.from_list("custom", ["red", "blue"], N=7),
+        colormaps["coolwarm"].with_extremes(under="black", over="white", bad="green"),
+    ],
+)
+def test_lookup_table_matches_to_hex(cmap):
+    rng = np.random.default_rng(0)
+    # Values on both sides of the range, and on its edges.
+    values = np.concatenate([rng.uniform(-5, 15, 1000), [0, 10, np.nan, np.inf]])
+    expected = hex_loop(cmap, values, 0, 10)
+    assert cmap_hex_values(cmap, values, 0, 10).tolist() == expected
+
+
+def test_masked_values_get_the_bad_color():
+    cmap = colormaps["viridis"].with_extremes(bad="red")
+    values = np.ma.MaskedArray([1.0, 2.0, 3.0], mask=[False, True, False])
+    colors = cmap_hex_values(cmap, values, 1, 3)
+    assert colors.tolist() == hex_loop(cmap, values, 1, 3)
+    assert colors[1] == "#ff0000"
+
+
+def test_lookup_table_is_cached_per_colormap():
+    cmap = colormaps["magma"].copy()
+    assert cmap_hex_lut(cmap) is cmap_hex_lut(cmap)
+    assert cmap_hex_lut(cmap.copy()) is not cmap_hex_lut(cmap)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from ipywwt.lod import group_bounds
+
+from conftest import events
+
+
+@pytest.fixture
+def table():
+    # Three rows at one position and two at another, about 0.7 degrees away:
+    # in different pixels at order 6, but in the same one at order 0.
+    return Table(
+        {
+            "ra": [10.0, 10.0, 10.0, 10.5, 10.5],
+            "dec": [10.0, 10.0, 10.0, 10.5, 10.5],
+            "v": [1.0, 2.0, 3.0, 10.0, np.nan],
+        }
+    )
+
+
+def binned(layer, column):
+    # The values of a column of the binned table, largest count first.
+    order = np.argsort(-np.asarray(layer.table["count"]), kind="stable")
+    return np.asarray(layer.table[column])[order].tolist()
+
+
+def test_group_bounds():
+    assert group_bounds(np.array([1, 1, 2, 5, 5, 5])).tolist() == [0, 2, 3, 6]
+    assert group_bounds(np.array([4])).tolist() == [0, 1]
+    assert group_bounds(np.array([], dtype=int)).tolist() == [0]
+
+
+def test_count(wwt, table):
+    layer = wwt.layers.add_density_layer(table)
+
+    assert binned(layer, "count") == [3, 2]
+    assert layer.cmap_att == "count"
+    assert layer.source_table is table
+
+
+def test_sum_and_mean_skip_missing_values(wwt, table):
+    layer = wwt.layers.add_density_layer(table, aggregate="sum", value_att="v")
+    assert binned(layer, "sum") == [6.0, 10.0]
+
+    layer = wwt.layers.add_density_layer(table, aggregate="mean", value_att="v")
+    assert binned(layer, "mean") == [2.0, 10.0]
+    assert layer.cmap_att == "mean"
+
+
+def test_mean_of_pixel_without_values_is_nan(wwt, table):
+    table["v"][:3] = np.nan
+    layer = wwt.layers.add_density_layer(table, aggregate="mean", value_att="v")
+
+    means = binned(layer, "mean")
+    assert np.isnan(means[0])
+    assert means[1] == 10.0
+
+
+def test_changing_order_rebins(wwt, sent, table):
+    layer = wwt.layers.add_density_layer(table)
+    sent.clear()
+
+    layer.order = 0
+    assert binned(layer, "count") == [5]
+    assert "table_layer_create" not in events(sent)
+    assert events(sent)
+
+    sent.clear()
+    layer.order = 6
+    assert binned(layer, "count") == [3, 2]
+    assert events(sent)
+
+
+def test_changing_aggregate_rebins_and_recolors(wwt, table):
+    layer = wwt.layers.add_density_layer(table)
+
+    layer.value_att = "v"
+    layer.aggregate = "mean"
+    assert binned(layer, "mean") == [2.0, 10.0]
+    assert layer.cmap_att == "mean"
+
+
+def test_aggregate_waits_for_value_att(wwt, table):
+    layer = wwt.layers.add_density_layer(table)
+
+    layer.aggregate = "sum"
+    assert layer.table.colnames == ["lon", "lat", "count"]
+
+    layer.value_att = "v"
+    assert binned(layer, "sum") == [6.0, 10.0]
+
+
+def test_invalid_binning(wwt, table):
+    layer = wwt.layers.add_density_layer(table)
+
+    with pytest.raises(ValueError, match="order"):
+        layer.order = 21
+    with pytest.raises(ValueError, match="aggregate"):
+        layer.aggregate = "median"
+    with pytest.raises(ValueError, match="value_att"):
+        wwt.layers.add_density_layer(table, aggregate="sum", value_att="w")
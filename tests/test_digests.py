@@ -0,0 +1,135 @@
+import sys
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from ipywwt import utils
+from ipywwt.utils import (
+    digest_key,
+    new_digest,
+    update_digest_with_array,
+    update_digest_with_hdu,
+)
+
+
+def array_key(data):
+    digest = new_digest()
+    update_digest_with_array(digest, data)
+    return digest_key(digest)
+
+
+def hdu_key(hdu):
+    digest = new_digest()
+    update_digest_with_hdu(digest, hdu)
+    return digest_key(digest)
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).normal(size=(64, 48)).astype(np.float32)
+
+
+@pytest.fixture
+def fits_file(tmp_path, image):
+    filename = str(tmp_path / "image.fits")
+    header = fits.Header({"OBJECT": "test"})
+    fits.PrimaryHDU(image, header).writeto(filename)
+    return filename
+
+
+# Arrays
+
+
+def test_byte_order_and_layout_dont_change_key(image):
+    key = array_key(image)
+    assert key == array_key(image.astype(image.dtype.newbyteorder(">")))
+    assert key == array_key(np.asfortranarray(image))
+    assert key == array_key(image.copy())
+
+
+def test_same_bytes_with_another_dtype_or_shape_differ(image):
+    key = array_key(image)
+    assert key != array_key(image.view(np.int32))
+    assert key != array_key(image.reshape(48, 64))
+    assert key != array_key(image.ravel())
+
+
+def test_any_difference_is_seen(image, monkeypatch):
+    # Hash in small chunks, so that the change is in a later one.
+    monkeypatch.setattr(utils, "HASH_CHUNK_SIZE", image[:1].nbytes * 4)
+    changed = image.copy()
+    changed[-1, -1] += 1
+    assert array_key(image) != array_key(changed)
+
+
+def test_non_contiguous_array(image):
+    view = image[::2, ::3]
+    assert array_key(view) == array_key(np.ascontiguousarray(view))
+
+
+# HDUs
+
+
+def test_file_data_is_memory_mapped(fits_file):
+    with fits.open(fits_file) as hdul:
+        key = hdu_key(hdul[0])
+        # The data was hashed without Astropy reading it.
+        assert not hdul[0]._data_loaded
+
+    with fits.open(fits_file) as hdul:
+        hdul[0].data
+        assert hdul[0]._data_loaded
+        assert hdu_key(hdul[0]) == key
+
+
+def test_file_and_memory_give_same_key(fits_file, image):
+    with fits.open(fits_file) as hdul:
+        key = hdu_key(hdul[0])
+        header = hdul[0].header.copy()
+
+    assert hdu_key(fits.PrimaryHDU(image, header)) == key
+
+
+def test_scaled_file_data_is_read_by_astropy(tmp_path, image):
+    filename = str(tmp_path / "scaled.fits")
+    hdu = fits.PrimaryHDU((image * 100).astype(np.int16))
+    hdu.scale("int16", bscale=0.5, bzero=10)
+    hdu.writeto(filename)
+
+    with fits.open(filename) as hdul:
+        key = hdu_key(hdul[0])
+        assert hdul[0]._data_loaded
+
+    # The scaled values are hashed, not the stored ones.
+    with fits.open(filename, do_not_scale_image_data=True) as hdul:
+        assert hdu_key(hdul[0]) != key
+
+
+def test_headers_are_part_of_key(image):
+    first = fits.PrimaryHDU(image, fits.Header({"CRVAL1": 10.0}))
+    second = fits.PrimaryHDU(image, fits.Header({"CRVAL1": 11.0}))
+    assert hdu_key(first) != hdu_key(second)
+
+
+# Keys
+
+
+def test_key_names_algorithm(image, monkeypatch):
+    monkeypatch.setitem(sys.modules, "xxhash", None)
+    assert array_key(image).startswith("blake2b-")
+
+
+def test_xxhash_keys_differ(image, monkeypatch):
+    pytest.importorskip("xxhash")
+    xxh3_key = array_key(image)
+    monkeypatch.setitem(sys.modules, "xxhash", None)
+    assert xxh3_key.startswith("xxh3-")
+    assert xxh3_key != array_key(image)
+
+
+def test_toasty_input_names(wwt, image):
+    hdu = fits.PrimaryHDU(image)
+    name = wwt.layers._toasty_filename(hdu)
+    assert name == wwt.layers._toasty_filename(fits.HDUList([hdu]))
+    assert name == "toasty_input_{0}.fits".format(hdu_key(hdu))
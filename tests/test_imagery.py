@@ -0,0 +1,164 @@
+import pytest
+import requests
+
+from ipywwt import imagery
+from ipywwt.imagery import get_imagery_layers, load_imagery_layers
+
+URL = "https://example.org/imagery.wtml"
+
+
+def wtml(*names):
+    imagesets = "".join(
+        '<ImageSet Name="{0}"><ThumbnailUrl>{0}.jpg</ThumbnailUrl></ImageSet>'.format(
+            name
+        )
+        for name in names
+    )
+    return "<Folder>{0}</Folder>".format(imagesets).encode()
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(self.status_code)
+
+
+class FakeServer:
+    """
+    Stands in for ``requests.get``, answering with ``responses`` in order and
+    recording the headers of each request.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def __call__(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    monkeypatch.setenv("IPYWWT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(imagery, "_loads", {})
+    monkeypatch.setattr(imagery, "_retry_at", {})
+    server = FakeServer()
+    monkeypatch.setattr(requests, "get", server)
+    return server
+
+
+def new_process(monkeypatch):
+    # Forget what was loaded in this process, keeping the disk cache.
+    monkeypatch.setattr(imagery, "_loads", {})
+
+
+def test_collection_is_loaded_once_per_process(server):
+    server.responses.append(FakeResponse(content=wtml("DSS", "WISE")))
+
+    layers = get_imagery_layers(URL)
+    assert list(layers) == ["DSS", "WISE"]
+    assert layers["DSS"] == {"thumbnail": "DSS.jpg"}
+
+    assert load_imagery_layers(URL).result() is layers
+    assert len(server.requests) == 1
+
+
+def test_recent_copy_on_disk_is_used(server, monkeypatch):
+    server.responses.append(FakeResponse(content=wtml("DSS")))
+    get_imagery_layers(URL)
+
+    new_process(monkeypatch)
+    assert list(get_imagery_layers(URL)) == ["DSS"]
+    assert len(server.requests) == 1
+
+
+def test_old_copy_is_revalidated(server, monkeypatch):
+    server.responses.append(
+        FakeResponse(
+            content=wtml("DSS"),
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+    )
+    get_imagery_layers(URL)
+
+    monkeypatch.setattr(imagery, "CACHE_TTL", 0)
+    new_process(monkeypatch)
+    server.responses.append(FakeResponse(status_code=304, headers={"ETag": '"v1"'}))
+    assert list(get_imagery_layers(URL)) == ["DSS"]
+    assert server.requests[-1] == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+
+    # A new version replaces the copy on disk.
+    new_process(monkeypatch)
+    server.responses.append(
+        FakeResponse(content=wtml("DSS", "WISE"), headers={"ETag": '"v2"'})
+    )
+    assert list(get_imagery_layers(URL)) == ["DSS", "WISE"]
+
+    monkeypatch.setattr(imagery, "CACHE_TTL", 3600)
+    new_process(monkeypatch)
+    assert list(get_imagery_layers(URL)) == ["DSS", "WISE"]
+    assert len(server.requests) == 3
+
+
+def test_stale_copy_is_used_when_offline(server, monkeypatch):
+    server.responses.append(FakeResponse(content=wtml("DSS")))
+    get_imagery_layers(URL)
+
+    monkeypatch.setattr(imagery, "CACHE_TTL", 0)
+    new_process(monkeypatch)
+    server.responses.append(requests.ConnectionError())
+    assert list(get_imagery_layers(URL)) == ["DSS"]
+
+
+@pytest.mark.parametrize(
+    "failure", [requests.ConnectionError(), FakeResponse(status_code=503)]
+)
+def test_fallback_is_used_when_offline(server, tmp_path, failure):
+    fallback = tmp_path / "fallback.wtml"
+    fallback.write_bytes(wtml("Bundled"))
+
+    server.responses.append(failure)
+    assert list(get_imagery_layers(URL, fallback=str(fallback))) == ["Bundled"]
+    assert URL in imagery._retry_at
+
+
+def test_fallback_is_replaced_once_server_is_back(server, monkeypatch, tmp_path):
+    fallback = tmp_path / "fallback.wtml"
+    fallback.write_bytes(wtml("Bundled"))
+
+    server.responses.append(requests.ConnectionError())
+    assert list(get_imagery_layers(URL, fallback=str(fallback))) == ["Bundled"]
+
+    # Within the retry interval, the fallback is kept.
+    assert list(get_imagery_layers(URL, fallback=str(fallback))) == ["Bundled"]
+    assert len(server.requests) == 1
+
+    monkeypatch.setattr(imagery, "_retry_at", {URL: 0})
+    server.responses.append(FakeResponse(content=wtml("DSS")))
+    assert list(get_imagery_layers(URL, fallback=str(fallback))) == ["DSS"]
+    assert imagery._retry_at == {}
+
+    # A download is kept for the rest of the process.
+    assert list(get_imagery_layers(URL, fallback=str(fallback))) == ["DSS"]
+    assert len(server.requests) == 2
+
+
+def test_failure_without_any_copy_is_retried(server):
+    server.responses.append(requests.ConnectionError())
+    with pytest.raises(requests.ConnectionError):
+        get_imagery_layers(URL)
+
+    server.responses.append(FakeResponse(content=wtml("DSS")))
+    assert list(get_imagery_layers(URL)) == ["DSS"]
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import and only needed by some features.
+DEFERRED_MODULES = [
+    "astropy.coordinates",
+    "astropy.io.fits",
+    "astropy.table",
+    "astropy.time",
+    "matplotlib",
+    "reproject",
+    "requests",
+    "toasty",
+]
+
+
+@pytest.fixture(scope="module")
+def imported_modules():
+    # A fresh interpreter, since the tests themselves import these modules.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, ipywwt; print('\\n'.join(sys.modules))",
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize("module", DEFERRED_MODULES)
+def test_module_is_not_imported_eagerly(imported_modules, module):
+    assert module not in imported_modules
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+from astropy.table import Table
+from astropy.wcs import WCS
+
+from conftest import events
+
+
+@pytest.fixture
+def table():
+    return Table({"ra": np.arange(5.0), "dec": np.arange(5.0)})
+
+
+@pytest.fixture
+def image():
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [10.0, 20.0]
+    wcs.wcs.crpix = [5, 5]
+    wcs.wcs.cdelt = [-1e-3, 1e-3]
+    return np.arange(100.0).reshape(10, 10), wcs
+
+
+@pytest.fixture
+def layers(wwt, sent, table, image):
+    # Image layers between table layers.
+    layers = [
+        wwt.layers.add_table_layer(table),
+        wwt.layers.add_image_layer(image),
+        wwt.layers.add_image_layer(image),
+        wwt.layers.add_table_layer(table),
+        wwt.layers.add_image_layer(image),
+    ]
+    sent.clear()
+    yield layers
+    wwt.layers.remove_layers()
+
+
+def order_sent(sent):
+    # The IDs of the last draw order sent.
+    for content, _ in reversed(sent):
+        if content["event"] == "image_layer_order_multi":
+            return content["ids"]
+
+
+# Access
+
+
+def test_indexing(wwt, layers):
+    assert [wwt.layers[i] for i in range(5)] == layers
+    assert [wwt.layers[i] for i in range(-5, 0)] == layers
+    assert wwt.layers[np.int64(1)] is layers[1]
+    assert wwt.layers[1:4] == layers[1:4]
+    assert wwt.layers[::-2] == layers[::-2]
+    assert list(wwt.layers) == layers
+
+    for index in (5, -6):
+        with pytest.raises(IndexError):
+            wwt.layers[index]
+    with pytest.raises(TypeError):
+        wwt.layers["0"]
+
+
+def test_get(wwt, layers):
+    assert wwt.layers.get(layers[3].id) is layers[3]
+    assert wwt.layers.get("nonsense") is None
+    assert wwt.layers.get("nonsense", layers[0]) is layers[0]
+
+    layers[3].remove()
+    assert wwt.layers.get(layers[3].id) is None
+
+
+# Removal
+
+
+def test_remove_layers_in_one_message(wwt, sent, layers):
+    wwt.layers.remove_layers([layers[0], layers[1].id, layers[4]])
+
+    assert len(sent) == 1
+    assert events(sent) == [
+        "table_layer_remove",
+        "image_layer_remove",
+        "image_layer_remove",
+    ]
+    assert list(wwt.layers) == [layers[2], layers[3]]
+    assert wwt.layers[-1] is layers[3]
+
+
+def test_remove_all_layers(wwt, sent, layers):
+    wwt.layers.remove_layers()
+
+    assert len(sent) == 1
+    assert sorted(events(sent)) == ["image_layer_remove"] * 3 + [
+        "table_layer_remove"
+    ] * 2
+    assert len(wwt.layers) == 0
+    assert all(layer._removed for layer in layers)
+
+
+def test_remove_unknown_layers_removes_nothing(wwt, sent, layers):
+    with pytest.raises(ValueError, match="no layer with ID"):
+        wwt.layers.remove_layers([layers[0], "nonsense"])
+
+    layers[1].remove()
+    sent.clear()
+    with pytest.raises(ValueError, match="not in layer manager"):
+        wwt.layers.remove_layers([layers[0], layers[1]])
+
+    assert sent == []
+    assert len(wwt.layers) == 4
+
+
+# Draw order
+
+
+def test_draw_order(wwt, layers):
+    assert wwt.layers.draw_order == [layers[1], layers[2], layers[4]]
+
+
+def test_set_draw_order(wwt, sent, layers):
+    wwt.layers.set_draw_order([layers[4], layers[1].id])
+
+    assert events(sent) == ["image_layer_order_multi"]
+    assert order_sent(sent) == [layers[4].id, layers[1].id, layers[2].id]
+    assert wwt.layers.draw_order == [layers[4], layers[1], layers[2]]
+    # The table layers keep their places.
+    assert list(wwt.layers) == [layers[0], layers[4], layers[1], layers[3], layers[2]]
+
+
+def test_draw_order_versions_increase(wwt, sent, layers):
+    wwt.layers.set_draw_order([layers[2]])
+    wwt.layers.set_draw_order([layers[4]])
+
+    versions = [content["version"] for content, _ in sent]
+    assert len(versions) == 2 and versions[0] < versions[1]
+
+
+def test_set_draw_order_checks_layers(wwt, sent, layers):
+    with pytest.raises(TypeError):
+        wwt.layers.set_draw_order([layers[1], layers[0]])
+    with pytest.raises(ValueError, match="listed twice"):
+        wwt.layers.set_draw_order([layers[1], layers[1].id])
+    with pytest.raises(ValueError):
+        wwt.layers.set_draw_order(["nonsense"])
+
+    assert sent == []
+    assert list(wwt.layers) == layers
+
+
+def test_set_draw_order_for_older_frontends(legacy_wwt, sent, image):
+    layers = [legacy_wwt.layers.add_image_layer(image) for _ in range(3)]
+    sent.clear()
+
+    legacy_wwt.layers.set_draw_order([layers[2]])
+
+    assert events(sent) == ["image_layer_order"] * 3
+    messages = [content for content, _ in sent]
+    assert [msg["id"] for msg in messages] == [layers[i].id for i in (2, 0, 1)]
+    assert [msg["order"] for msg in messages] == [0, 1, 2]
+    legacy_wwt.layers.remove_layers()
@@ -0,0 +1,249 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from ipywwt import camera
+from ipywwt.layers import LOD_MARGIN, binary_columns_table
+from ipywwt.lod import LODIndex
+
+from conftest import events
+
+
+def sky(n, seed=0):
+    # Positions spread uniformly over the sky, in degrees.
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(0, 360, n)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    return lon, lat
+
+
+def distance(lon, lat, lon0, lat0):
+    # The angular distance of positions from a point, in degrees.
+    lon, lat, lon0, lat0 = map(np.radians, (lon, lat, lon0, lat0))
+    cos = np.sin(lat) * np.sin(lat0) + np.cos(lat) * np.cos(lat0) * np.cos(lon - lon0)
+    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+
+
+@pytest.fixture(scope="module")
+def positions():
+    return sky(100000)
+
+
+@pytest.fixture(scope="module")
+def index(positions):
+    return LODIndex(*positions, seed=0)
+
+
+# Index
+
+
+def test_small_selections_are_complete(positions, index):
+    lon, lat = positions
+    rows = index.select(30, 40, 2, budget=10000)
+
+    near = distance(lon, lat, 30, 40)
+    # Whole pixels around the cone are selected, and nothing far from it.
+    assert set(np.flatnonzero(near <= 2)) <= set(rows)
+    assert near[rows].max() < 2 + 58.6 / 2**4
+    assert np.all(np.diff(rows) > 0)
+
+
+@pytest.mark.parametrize("budget", [0, 1, 100, 1234, 50000])
+def test_budget_is_respected(index, budget):
+    rows = index.select(0, 0, 90, budget)
+    assert len(rows) == budget
+    assert len(np.unique(rows)) == budget
+
+
+def test_selection_follows_center(positions, index):
+    lon, lat = positions
+    first = index.select(30, 40, 5, budget=1000)
+    second = index.select(200, -20, 5, budget=1000)
+
+    assert set(first).isdisjoint(second)
+    assert np.median(distance(lon[first], lat[first], 30, 40)) < 5
+    assert np.median(distance(lon[second], lat[second], 200, -20)) < 5
+
+
+def test_zooming_in_refines_selection(positions, index):
+    lon, lat = positions
+    wide = index.select(30, 40, 60, budget=1000)
+    narrow = index.select(30, 40, 10, budget=1000)
+
+    # The same number of rows, over a smaller area: many more of them are
+    # near the center.
+    def central(rows):
+        return np.sum(distance(lon[rows], lat[rows], 30, 40) < 10)
+
+    assert len(narrow) == len(wide) == 1000
+    assert central(narrow) > 10 * central(wide)
+
+
+def test_sample_is_spread_out(positions, index):
+    # A sample of the whole sky covers it evenly, rather than being the
+    # first rows of some area.
+    lon, lat = positions
+    rows = index.select(0, 0, 90, budget=3000)
+    north = np.mean(lat[rows] > 0)
+    east = np.mean(lon[rows] < 180)
+    assert abs(north - 0.5) < 0.05 and abs(east - 0.5) < 0.05
+
+
+def test_non_finite_positions_are_never_selected():
+    lon, lat = sky(1000)
+    lon[::3] = np.nan
+    lat[1::7] = np.inf
+    index = LODIndex(lon, lat)
+
+    rows = index.select(0, 0, 90, budget=1000)
+    assert np.all(np.isfinite(lon[rows]) & np.isfinite(lat[rows]))
+    assert len(rows) == len(index) == np.sum(np.isfinite(lon) & np.isfinite(lat))
+
+
+def test_seed_makes_selection_reproducible(positions):
+    first = LODIndex(*positions, seed=1).select(10, 10, 20, budget=500)
+    second = LODIndex(*positions, seed=1).select(10, 10, 20, budget=500)
+    np.testing.assert_array_equal(first, second)
+
+
+# Layers
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A clock for the camera subscriptions that only moves when told to, so
+    # that the layer sees every view.
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(camera, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def look(wwt, clock):
+    wwt.view_state_rate = 0
+
+    def look(ra, dec, fov):
+        clock.now += 1
+        wwt._on_app_message_received(
+            wwt,
+            {
+                "type": "wwt_view_state",
+                "raRad": math.radians(ra),
+                "decRad": math.radians(dec),
+                "fovDeg": fov,
+                "rollDeg": 0.0,
+                "engineClockISOT": "2020-01-01T00:00:00",
+                "systemClockISOT": "2020-01-01T00:00:00",
+                "engineClockRateFactor": 1.0,
+            },
+        )
+
+    return look
+
+
+@pytest.fixture
+def table(positions):
+    lon, lat = positions
+    return Table({"ra": lon, "dec": lat, "v": np.arange(len(lon))})
+
+
+def rows_sent(sent):
+    # The values of ``v``, which are the row numbers, of the last table sent.
+    tables = []
+    for content, buffers in sent:
+        batch = content.get("messages", [content])
+        counts = content.get("buffer_counts", [len(buffers or [])])
+        offset = 0
+        for msg, count in zip(batch, counts):
+            if msg["event"].startswith(("table_layer_create", "table_layer_update")):
+                columns = buffers[offset : offset + count]
+                tables.append(binary_columns_table(msg["columns"], columns))
+            offset += count
+    return np.asarray(tables[-1]["v"], dtype=int) if tables else None
+
+
+def test_layer_sends_rows_in_view(wwt, sent, look, table):
+    look(30, 40, 10)
+    layer = wwt.layers.add_table_layer(table, lod=True, lod_budget=2000, binary=True)
+
+    rows = rows_sent(sent)
+    assert len(rows) == 2000
+    np.testing.assert_array_equal(rows, layer._lod_rows)
+    assert distance(table["ra"][rows], table["dec"][rows], 30, 40).max() < 2 * 15
+    assert len(layer.table) == len(table)
+
+
+def test_layer_follows_view(wwt, sent, look, table):
+    layer = wwt.layers.add_table_layer(table, lod=True, lod_budget=1000, binary=True)
+    sent.clear()
+
+    look(200, -20, 30)
+    assert events(sent) == ["table_layer_update_binary"]
+    rows = rows_sent(sent)
+    assert len(rows) == 1000
+    far = distance(table["ra"][rows], table["dec"][rows], 200, -20)
+    assert np.median(far) < LOD_MARGIN * 30 and far.max() < 90
+
+    # Zoomed in, there are fewer rows in view than the budget.
+    sent.clear()
+    look(200, -20, 3)
+    assert events(sent) == ["table_layer_update_binary"]
+    zoomed = rows_sent(sent)
+    near = distance(table["ra"], table["dec"], 200, -20) < 3
+    assert set(np.flatnonzero(near)) <= set(zoomed)
+    assert len(zoomed) < 1000
+    np.testing.assert_array_equal(layer._get_table()["v"], zoomed)
+
+
+def test_small_view_changes_send_nothing(wwt, sent, look, table):
+    look(30, 40, 10)
+    layer = wwt.layers.add_table_layer(table, lod=True, lod_budget=1000, binary=True)
+    rows = layer._lod_rows
+    sent.clear()
+
+    # Panning within the margin, zooming out a little, or zooming in less
+    # than twice, keeps the rows.
+    margin = (LOD_MARGIN - 1) * 10
+    look(30, 40 + margin / 2, 10)
+    look(30, 40, 10 + margin / 2)
+    look(30, 40, 6)
+    look(30, 40, 10)
+    assert sent == []
+    assert layer._lod_rows is rows
+
+
+def test_unchanged_rows_send_nothing(wwt, sent, look):
+    # With fewer rows than the budget, views that see them all pick the
+    # same rows.
+    lon, lat = sky(500)
+    table = Table({"ra": lon, "dec": lat})
+    wwt.layers.add_table_layer(table, lod=True, binary=True)
+    sent.clear()
+
+    look(100, 0, 120)
+    look(250, 30, 100)
+    assert sent == []
+
+
+def test_budget_change_sends_rows(wwt, sent, look, table):
+    layer = wwt.layers.add_table_layer(table, lod=True, lod_budget=1000, binary=True)
+    sent.clear()
+
+    layer.lod_budget = 3000
+    assert len(rows_sent(sent)) == 3000
+
+
+def test_leaving_lod_mode_sends_all_rows(wwt, sent, look, table):
+    layer = wwt.layers.add_table_layer(table, lod=True, lod_budget=1000, binary=True)
+    sent.clear()
+
+    layer.lod = False
+    assert len(rows_sent(sent)) == len(table)
+
+    # The view no longer matters.
+    sent.clear()
+    look(200, -20, 5)
+    assert sent == []
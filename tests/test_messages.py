@@ -0,0 +1,260 @@
+import asyncio
+
+import numpy as np
+import pytest
+from astropy.table import Table
+from matplotlib.colors import LinearSegmentedColormap
+
+from ipywwt.layers import CMAP_COLUMN_NAME
+
+from conftest import events
+
+
+@pytest.fixture
+def table():
+    return Table({"ra": np.arange(5.0), "dec": np.arange(5.0), "v": np.arange(5.0)})
+
+
+@pytest.fixture
+def layer(wwt, sent, table):
+    layer = wwt.layers.add_table_layer(table)
+    sent.clear()
+    return layer
+
+
+def settings_sent(sent, setting):
+    # The values of one setting, in the order they were sent.
+    values = []
+    for content, _ in sent:
+        for msg in content.get("messages", [content]):
+            if msg["event"] == "table_layer_set" and msg["setting"] == setting:
+                values.append(msg["value"])
+            elif msg["event"] == "table_layer_set_multi":
+                values.extend(
+                    value
+                    for name, value in zip(msg["settings"], msg["values"])
+                    if name == setting
+                )
+    return values
+
+
+# Batches
+
+
+def test_batch_coalesces_settings(wwt, sent, layer):
+    with wwt.batch():
+        layer.size_scale = 10
+        layer.opacity = 0.2
+        layer.size_scale = 20
+
+    (content, buffers), = sent
+    assert content["event"] == "table_layer_set_multi"
+    assert content["id"] == layer.id
+    assert content["settings"] == ["opacity", "scaleFactor"]
+    assert content["values"] == [0.2, 20]
+    assert buffers is None
+
+
+def test_batch_of_one_setting(wwt, sent, layer):
+    with wwt.batch():
+        layer.opacity = 0.1
+        layer.opacity = 0.3
+
+    (content, _), = sent
+    assert content["event"] == "table_layer_set"
+    assert content["value"] == 0.3
+
+
+def test_batch_groups_messages(wwt, sent, table):
+    with wwt.batch():
+        first = wwt.layers.add_table_layer(table, binary=True)
+        second = wwt.layers.add_table_layer(table, binary=True)
+        first.opacity = 0.5
+
+    (content, buffers), = sent
+    assert content["event"] == "batch"
+    assert [msg["event"] for msg in content["messages"]] == [
+        "table_layer_create_binary",
+        "table_layer_create_binary",
+        "table_layer_set_multi",
+        "table_layer_set_multi",
+    ]
+    # Each layer's settings follow its creation, with the last values.
+    ids = [msg["id"] for msg in content["messages"]]
+    assert ids[:2] == [first.id, second.id]
+    assert sorted(ids[2:]) == sorted(ids[:2])
+    assert sorted(settings_sent(sent, "opacity")) == sorted([0.5, second.opacity])
+    assert content["buffer_counts"] == [3, 3, 0, 0]
+    assert len(buffers) == 6
+
+
+def test_nested_batches_are_sent_once(wwt, sent, layer):
+    with wwt.batch():
+        layer.opacity = 0.1
+        with wwt.batch():
+            layer.size_scale = 3
+        assert sent == []
+
+    assert events(sent) == ["table_layer_set_multi"]
+
+
+def test_batch_discards_messages_on_error(wwt, sent, layer):
+    with wwt.batch():
+        layer.opacity = 0.1
+        with pytest.raises(RuntimeError):
+            with wwt.batch(discard_on_error=True):
+                layer.size_scale = 3
+                raise RuntimeError()
+
+    assert settings_sent(sent, "opacity") == [0.1]
+    assert settings_sent(sent, "scaleFactor") == []
+
+
+def test_failed_layer_creation_sends_nothing(wwt, sent, table):
+    table["t"] = np.arange(5.0)
+    good = table.copy()
+    good["t"] = ["2020-01-01"] * 5
+
+    with pytest.raises(ValueError):
+        wwt.layers.add_table_layers([good, table], time_att="t")
+    with pytest.raises(ValueError):
+        wwt.layers.add_table_layer(table, time_att="t")
+
+    assert sent == []
+    assert len(wwt.layers) == 0
+
+
+def test_bulk_layers_are_validated_once(wwt, sent, table, monkeypatch):
+    from ipywwt import layers
+
+    calls = []
+    validate = layers.validate_traits
+
+    def counting(cls, traits):
+        calls.append(cls)
+        return validate(cls, traits)
+
+    monkeypatch.setattr(layers, "validate_traits", counting)
+    created = wwt.layers.add_table_layers([table] * 3, frame="sky", opacity=0.5)
+    assert calls == [layers.TableLayer]
+    assert [layer.frame for layer in created] == ["Sky"] * 3
+
+    sent.clear()
+    with pytest.raises(KeyError):
+        wwt.layers.add_table_layers([table] * 3, opacity=0.5, nonsense=1)
+    with pytest.raises(ValueError):
+        wwt.layers.add_table_layers([table] * 3, frame="nowhere")
+    assert sent == []
+    assert len(wwt.layers) == 3
+
+
+def test_custom_colormap_column_is_sent_once_per_batch(wwt, sent, table):
+    cmap = LinearSegmentedColormap.from_list("custom", ["red", "blue"])
+    layer = wwt.layers.add_table_layer(table, cmap_att="v", cmap=cmap)
+    assert events(sent).count("table_layer_upsert_columns") == 1
+
+    sent.clear()
+    with wwt.batch():
+        layer.cmap_vmin = 1
+        layer.cmap_vmax = 2
+        layer.cmap_vmin = 0
+
+    assert events(sent) == ["table_layer_upsert_columns", "table_layer_set_multi"]
+    # The colors are those of the final range.
+    assert layer.table[CMAP_COLUMN_NAME].tolist() == [
+        "#ff0000",
+        "#7f0080",
+        "#0000ff",
+        "#0000ff",
+        "#0000ff",
+    ]
+
+
+# Older frontends
+
+
+def test_legacy_frontend_gets_single_settings(legacy_wwt, sent, table):
+    layer = legacy_wwt.layers.add_table_layer(table)
+    assert "batch" not in [content["event"] for content, _ in sent]
+    assert events(sent)[0] == "table_layer_create"
+    assert set(events(sent)[1:]) == {"table_layer_set"}
+
+    sent.clear()
+    with legacy_wwt.batch():
+        layer.opacity = 0.2
+        layer.size_scale = 4
+        layer.opacity = 0.3
+
+    assert events(sent) == ["table_layer_set", "table_layer_set"]
+    assert settings_sent(sent, "opacity") == [0.3]
+
+
+def test_legacy_frontend_gets_whole_table_updates(legacy_wwt, sent, table):
+    cmap = LinearSegmentedColormap.from_list("custom", ["red", "blue"])
+    layer = legacy_wwt.layers.add_table_layer(table, cmap_att="v", cmap=cmap)
+    assert events(sent).count("table_layer_update") == 1
+    assert "table_layer_upsert_columns" not in events(sent)
+
+    sent.clear()
+    layer.append_rows(table[:2][["ra", "dec", "v"]])
+    assert events(sent) == ["table_layer_update"]
+
+
+def test_legacy_frontend_gets_messages_queued_before_mount(sent, monkeypatch, table):
+    import ipywwt
+
+    monkeypatch.setattr(ipywwt, "load_imagery_layers", lambda *args, **kwargs: None)
+    monkeypatch.setattr(ipywwt, "get_imagery_layers", lambda *args, **kwargs: {})
+    widget = ipywwt.WWTWidget()
+    widget.layers.add_table_layer(table, binary=True)
+    assert sent == []
+
+    widget.mounted = True
+    assert events(sent)[:2] == ["load_image_collection", "table_layer_create"]
+
+
+# Throttling
+
+
+def test_settings_are_throttled_with_an_event_loop(wwt, sent, layer):
+    async def drag():
+        for i in range(10):
+            layer.opacity = i / 10
+        await asyncio.sleep(3 / wwt.message_rate)
+
+    asyncio.run(drag())
+
+    # The first value goes out right away, and the last one once the rate
+    # allows.
+    assert settings_sent(sent, "opacity") == [0.0, 0.9]
+
+
+def test_throttled_settings_go_before_other_messages(wwt, sent, layer):
+    async def drag():
+        layer.opacity = 0.1
+        layer.opacity = 0.2
+        layer.remove()
+
+    asyncio.run(drag())
+
+    assert events(sent) == ["table_layer_set", "table_layer_set", "table_layer_remove"]
+    assert settings_sent(sent, "opacity") == [0.1, 0.2]
+
+
+def test_settings_are_not_throttled_without_an_event_loop(wwt, sent, layer):
+    for i in range(10):
+        layer.opacity = i / 10
+
+    assert settings_sent(sent, "opacity") == [i / 10 for i in range(10)]
+
+
+def test_throttling_can_be_turned_off(wwt, sent, layer):
+    wwt.message_rate = 0
+
+    async def drag():
+        for i in range(10):
+            layer.opacity = i / 10
+
+    asyncio.run(drag())
+
+    assert settings_sent(sent, "opacity") == [i / 10 for i in range(10)]
@@ -0,0 +1,155 @@
+import base64
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from ipywwt.layers import binary_columns_table
+
+from conftest import events
+
+
+@pytest.fixture
+def table():
+    return Table(
+        {
+            "ra": np.arange(3.0),
+            "dec": np.arange(3.0),
+            "mag": np.arange(3.0) + 10,
+            "flux": np.arange(3.0) + 20,
+        }
+    )
+
+
+def messages(sent):
+    # The messages sent, with those of batches flattened, and the buffers of
+    # each.
+    for content, buffers in sent:
+        if content["event"] != "batch":
+            yield content, buffers or []
+            continue
+        offset = 0
+        for msg, count in zip(content["messages"], content["buffer_counts"]):
+            yield msg, (buffers or [])[offset : offset + count]
+            offset += count
+
+
+def upserted(sent):
+    # The tables sent by table_layer_upsert_columns, in order.
+    return [
+        binary_columns_table(msg["columns"], buffers)
+        for msg, buffers in messages(sent)
+        if msg["event"] == "table_layer_upsert_columns"
+    ]
+
+
+def test_only_coordinate_columns_are_created(wwt, sent, table):
+    wwt.layers.add_table_layer(table, binary=True, project_columns=True)
+
+    (msg, buffers), = [
+        (msg, buffers)
+        for msg, buffers in messages(sent)
+        if msg["event"] == "table_layer_create_binary"
+    ]
+    assert binary_columns_table(msg["columns"], buffers).colnames == ["ra", "dec"]
+
+
+def test_columns_given_as_arguments_are_created(wwt, sent, table):
+    wwt.layers.add_table_layer(
+        table, project_columns=True, lon_att="mag", lat_att="dec", size_att="flux"
+    )
+
+    (msg, _), = [
+        (msg, buffers)
+        for msg, buffers in messages(sent)
+        if msg["event"] == "table_layer_create"
+    ]
+    header = base64.b64decode(msg["table"]).decode("ascii").splitlines()[0]
+    assert header.split(",") == ["dec", "mag", "flux"]
+    assert upserted(sent) == []
+
+
+def test_whole_table_is_sent_without_projection(wwt, sent, table):
+    wwt.layers.add_table_layer(table, binary=True)
+
+    msg, _ = next(messages(sent))
+    assert [spec["name"] for spec in msg["columns"]] == table.colnames
+
+
+def test_picked_column_is_sent_before_setting(wwt, sent, table):
+    layer = wwt.layers.add_table_layer(table, binary=True, project_columns=True)
+    sent.clear()
+
+    layer.size_att = "mag"
+
+    events_sent = [msg["event"] for msg, _ in messages(sent)]
+    upsert = events_sent.index("table_layer_upsert_columns")
+    assert "table_layer_set_multi" in events_sent[upsert:]
+    (columns,) = upserted(sent)
+    assert columns.colnames == ["mag"]
+    assert columns["mag"].tolist() == [10.0, 11.0, 12.0]
+
+
+def test_columns_are_sent_once(wwt, sent, table):
+    layer = wwt.layers.add_table_layer(table, binary=True, project_columns=True)
+    sent.clear()
+
+    layer.size_att = "mag"
+    layer.size_att = "flux"
+    layer.size_att = "mag"
+    layer.lon_att = "ra"
+
+    assert [columns.colnames for columns in upserted(sent)] == [["mag"], ["flux"]]
+    assert layer.size_att == "mag"
+
+
+def test_coordinate_column_change_sends_column(wwt, sent, table):
+    layer = wwt.layers.add_table_layer(table, binary=True, project_columns=True)
+    sent.clear()
+
+    layer.lon_att = "flux"
+
+    assert [columns.colnames for columns in upserted(sent)] == [["flux"]]
+    settings = [
+        (msg["setting"], msg["value"])
+        for msg, _ in messages(sent)
+        if msg["event"] == "table_layer_set"
+    ]
+    assert ("lngColumn", "flux") in settings
+
+
+def test_update_resends_only_projected_columns(wwt, sent, table):
+    layer = wwt.layers.add_table_layer(table, binary=True, project_columns=True)
+    layer.size_att = "mag"
+    sent.clear()
+
+    layer.update_data(table)
+
+    (msg, buffers), = [
+        (msg, buffers)
+        for msg, buffers in messages(sent)
+        if msg["event"] == "table_layer_update_binary"
+    ]
+    assert binary_columns_table(msg["columns"], buffers).colnames == [
+        "ra",
+        "dec",
+        "mag",
+    ]
+
+    # The frontend has the new data for the column already.
+    sent.clear()
+    layer.size_att = "flux"
+    layer.size_att = "mag"
+    assert [columns.colnames for columns in upserted(sent)] == [["flux"]]
+
+
+def test_legacy_frontend_gets_whole_table_for_new_column(legacy_wwt, sent, table):
+    layer = legacy_wwt.layers.add_table_layer(
+        table, binary=True, project_columns=True
+    )
+    sent.clear()
+
+    layer.size_att = "mag"
+
+    assert "table_layer_upsert_columns" not in events(sent)
+    assert "table_layer_update" in events(sent)
@@ -0,0 +1,102 @@
+import warnings
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from ipywwt.utils import _reproject_block, _reproject_blocks, sanitize_image
+
+
+def wcs(ctype, crval, cdelt, shape):
+    w = WCS(naxis=2)
+    w.wcs.ctype = ctype
+    w.wcs.crval = crval
+    w.wcs.crpix = [shape[1] / 2 + 0.5, shape[0] / 2 + 0.5]
+    w.wcs.cdelt = [-cdelt, cdelt]
+    return w
+
+
+def tan(crval, cdelt, shape):
+    return wcs(["RA---TAN", "DEC--TAN"], crval, cdelt, shape)
+
+
+def single_pass(image, wcs_out, shape):
+    from reproject import reproject_interp
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return reproject_interp(image, wcs_out, shape_out=shape, return_footprint=False)
+
+
+class RecordingArray:
+    """
+    An array that records which parts of it are read.
+    """
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+        self.reads = []
+
+    def __getitem__(self, item):
+        self.reads.append(item)
+        return self.array[item]
+
+
+@pytest.fixture
+def noise():
+    return np.random.default_rng(0).normal(size=(120, 120))
+
+
+def test_blocks_match_single_pass(tmp_path, noise):
+    # Galactic coordinates, so that the whole image is reprojected.
+    image = (noise, wcs(["GLON-TAN", "GLAT-TAN"], [30, 10], 1e-3, noise.shape))
+    single = str(tmp_path / "single.fits")
+    blocks = str(tmp_path / "blocks.fits")
+
+    sanitize_image(image, single)
+    sanitize_image(image, blocks, block_size=32, parallel=2)
+
+    with fits.open(single) as expected, fits.open(blocks) as actual:
+        assert actual[0].data.shape == expected[0].data.shape
+        assert WCS(actual[0].header).wcs.compare(WCS(expected[0].header).wcs)
+        np.testing.assert_allclose(
+            actual[0].data, expected[0].data, rtol=1e-6, equal_nan=True
+        )
+        assert np.isfinite(actual[0].data).mean() > 0.5
+
+
+def test_blocks_partly_outside_input_projection(noise):
+    # The input's projection only covers the half of the sky around its
+    # center, which the output goes past.
+    data = RecordingArray(noise)
+    wcs_in = tan([0, 0], 1.0, noise.shape)
+    wcs_out = tan([60, 0], 1.0, (160, 160))
+
+    output = np.zeros((160, 160))
+    _reproject_blocks((data, wcs_in), wcs_out, output, 40, 2)
+
+    expected = single_pass((noise, wcs_in), wcs_out, output.shape)
+    assert 0 < np.isnan(expected).mean() < 1
+    np.testing.assert_allclose(output, expected, rtol=1e-10, equal_nan=True)
+
+    # Blocks only read the part of the input they need, and blocks that are
+    # wholly outside of the input don't read it.
+    assert 0 < len(data.reads) < 16
+    for rows, cols in data.reads:
+        assert (rows.stop - rows.start) * (cols.stop - cols.start) < noise.size / 4
+
+
+def test_block_outside_input_projection_is_blank(noise):
+    class Unreadable:
+        shape = noise.shape
+
+        def __getitem__(self, item):
+            raise AssertionError("the input was read")
+
+    wcs_in = tan([0, 0], 1.0, noise.shape)
+    wcs_out = tan([150, 0], 1.0, (40, 40))
+
+    block = (slice(0, 40), slice(0, 40))
+    assert np.isnan(_reproject_block((Unreadable(), wcs_in), wcs_out, block))
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from ipywwt import utils
+from ipywwt.utils import acquire_sanitized_image, release_sanitized_image
+
+
+@pytest.fixture
+def wcs():
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [10.0, 20.0]
+    wcs.wcs.crpix = [5, 5]
+    wcs.wcs.cdelt = [-1e-3, 1e-3]
+    return wcs
+
+
+@pytest.fixture
+def data():
+    return np.arange(100.0).reshape(10, 10)
+
+
+def exists(layer):
+    return os.path.exists(layer._sanitized_image)
+
+
+def test_layers_with_same_data_share_a_file(wwt, data, wcs):
+    first = wwt.layers.add_image_layer((data, wcs))
+    second = wwt.layers.add_image_layer((data.copy(), wcs))
+    other = wwt.layers.add_image_layer((data + 1, wcs))
+
+    assert first._sanitized_image == second._sanitized_image
+    assert other._sanitized_image != first._sanitized_image
+    assert exists(first) and exists(other)
+
+    wwt.layers.remove_layers()
+
+
+def test_file_is_removed_with_last_layer(wwt, data, wcs):
+    first = wwt.layers.add_image_layer((data, wcs))
+    second = wwt.layers.add_image_layer((data.copy(), wcs))
+    filename = first._sanitized_image
+    assert os.path.exists(filename + ".stats.json")
+
+    first.remove()
+    # Removing a layer twice doesn't give up the other layer's reference.
+    first.remove()
+    assert os.path.exists(filename)
+
+    second.remove()
+    assert not os.path.exists(filename)
+    assert not os.path.exists(filename + ".stats.json")
+
+
+def test_file_is_removed_with_removed_layers(wwt, data, wcs):
+    first = wwt.layers.add_image_layer((data, wcs))
+    second = wwt.layers.add_image_layer((data.copy(), wcs))
+    filename = first._sanitized_image
+
+    wwt.layers.remove_layers([first.id])
+    assert os.path.exists(filename)
+
+    wwt.layers.remove_layers([second])
+    assert not os.path.exists(filename)
+    assert len(wwt.layers) == 0
+
+
+def test_layers_from_one_file_share_a_file(wwt, tmp_path, data, wcs):
+    filename = str(tmp_path / "image.fits")
+    fits.PrimaryHDU(data, wcs.to_header()).writeto(filename)
+
+    from_file = wwt.layers.add_image_layer(filename)
+    with fits.open(filename) as hdul:
+        from_hdu = wwt.layers.add_image_layer(hdul[0])
+    again = wwt.layers.add_image_layer(filename)
+
+    assert from_file._sanitized_image == again._sanitized_image
+    assert exists(from_file) and exists(from_hdu)
+
+    wwt.layers.remove_layers()
+    assert not exists(from_file) and not exists(from_hdu)
+
+
+def test_failed_sanitizing_gives_up_reference(data, wcs, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("no")
+
+    monkeypatch.setattr(utils, "sanitize_image", fail)
+    with pytest.raises(RuntimeError):
+        acquire_sanitized_image((data, wcs))
+    assert utils._sanitized_images == {}
+
+    monkeypatch.undo()
+    filename = acquire_sanitized_image((data, wcs))
+    assert os.path.exists(filename)
+    release_sanitized_image(filename)
+    assert not os.path.exists(filename)
+    assert utils._sanitized_images == {}
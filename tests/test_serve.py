@@ -0,0 +1,174 @@
+import gzip
+import http.client
+import os
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pytest
+from astropy.wcs import WCS
+
+from ipywwt import serve
+from ipywwt.serve import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    FileServer,
+)
+
+
+@pytest.fixture
+def server():
+    server = FileServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "0" / "0").mkdir(parents=True)
+    (tmp_path / "0" / "0" / "0_0.png").write_bytes(b"tile")
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    return tmp_path / "0"
+
+
+def fetch(url, **headers):
+    try:
+        with urlopen(Request(url, headers=headers)) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def test_files_are_content_addressed(server, tmp_path):
+    first = tmp_path / "a.fits"
+    second = tmp_path / "b.fits"
+    first.write_bytes(b"data")
+    second.write_bytes(b"data")
+
+    url = server.serve_file(str(first), extension=".fits")
+    assert url == server.serve_file(str(second), extension=".fits")
+    assert url.endswith(".fits")
+
+    status, headers, body = fetch(url)
+    assert (status, body) == (200, b"data")
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_trees_with_a_key_are_immutable(server, tree):
+    url = server.serve_tree(str(tree), key="tiles-1")
+    assert url != server.serve_tree(str(tree), key="tiles-2")
+    assert url == server.serve_tree(str(tree), key="tiles-1")
+
+    status, headers, body = fetch(url + "0/0_0.png")
+    assert (status, body) == (200, b"tile")
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_trees_without_a_key_are_revalidated(server, tree):
+    url = server.serve_tree(str(tree))
+    tile = tree / "0" / "0_0.png"
+
+    status, headers, _ = fetch(url + "0/0_0.png")
+    assert status == 200
+    assert headers["Cache-Control"] == REVALIDATE_CACHE_CONTROL
+    status, _, _ = fetch(url + "0/0_0.png", **{"If-None-Match": headers["ETag"]})
+    assert status == 304
+
+    # Rewriting the tiles in place keeps the URL, but not the ETag.
+    tile.write_bytes(b"new tile")
+    os.utime(tile, ns=(1, 1))
+    assert server.serve_tree(str(tree)) == url
+    status, _, body = fetch(url + "0/0_0.png", **{"If-None-Match": headers["ETag"]})
+    assert (status, body) == (200, b"new tile")
+
+
+def test_trees_are_confined(server, tree):
+    url = server.serve_tree(str(tree))
+    assert fetch(url + "../secret.txt")[0] == 404
+    assert fetch(url + "%2E%2E/secret.txt")[0] == 404
+    assert fetch(url + "missing.png")[0] == 404
+
+
+def test_range_requests(server, tmp_path):
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(bytes(range(10)))
+    url = server.serve_file(str(filename))
+
+    status, headers, body = fetch(url, Range="bytes=2-4")
+    assert (status, body) == (206, bytes([2, 3, 4]))
+    assert headers["Content-Range"] == "bytes 2-4/10"
+    assert fetch(url, Range="bytes=20-")[0] == 416
+
+
+def test_public_url():
+    server = FileServer(port=1234, public_url="/user/me/proxy/{port}")
+    assert server.base_url == "/user/me/proxy/1234/"
+
+
+def test_files_with_a_key_are_not_hashed(server, tmp_path, monkeypatch):
+    filename = tmp_path / "a.fits"
+    filename.write_bytes(b"data")
+    digest_url = server.serve_file(str(filename), extension=".fits")
+
+    def fail(filename):
+        raise AssertionError("the file was hashed")
+
+    monkeypatch.setattr(serve, "file_digest", fail)
+    url = server.serve_file(str(filename), extension=".fits", key="image-1")
+    assert url == server.serve_file(str(filename), extension=".fits", key="image-1")
+    assert url != server.serve_file(str(filename), extension=".fits", key="image-2")
+    assert url != digest_url
+
+    status, headers, body = fetch(url)
+    assert (status, body) == (200, b"data")
+    assert headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_image_layers_serve_by_key(wwt, monkeypatch):
+    wcs = WCS(naxis=2)
+    wcs.wcs.ctype = ["RA---TAN", "DEC--TAN"]
+    wcs.wcs.crval = [10.0, 20.0]
+    wcs.wcs.crpix = [5, 5]
+    wcs.wcs.cdelt = [-1e-3, 1e-3]
+    data = np.arange(100.0).reshape(10, 10)
+
+    def fail(filename):
+        raise AssertionError("the file was hashed")
+
+    monkeypatch.setattr(serve, "file_digest", fail)
+    first = wwt.layers.add_image_layer((data, wcs))
+    second = wwt.layers.add_image_layer((data.copy(), wcs))
+    assert first._image_url == second._image_url
+
+    first.remove()
+    second.remove()
+
+
+def test_gzip_is_streamed(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(serve, "GZIP_CHUNK_SIZE", 1000)
+    data = b"".join(b"row %d of a table\n" % i for i in range(5000))
+    filename = tmp_path / "data.fits"
+    filename.write_bytes(data)
+    url = server.serve_file(str(filename))
+    path = "/" + url.split("/", 3)[3]
+
+    # Several responses on one connection, so that each must end properly.
+    conn = http.client.HTTPConnection(server.host, server.port, timeout=10)
+    for method in ("GET", "HEAD", "GET"):
+        conn.request(method, path, headers={"Accept-Encoding": "gzip"})
+        response = conn.getresponse()
+        body = response.read()
+        assert response.status == 200
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert response.getheader("Content-Length") is None
+        if method == "GET":
+            assert gzip.decompress(body) == data
+        else:
+            assert body == b""
+    conn.close()
+
+    # Clients that don't accept gzip get the file as is.
+    status, headers, body = fetch(url)
+    assert (status, body) == (200, data)
+    assert headers["Content-Length"] == str(len(data))
@@ -0,0 +1,131 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from ipywwt import stats
+from ipywwt.stats import get_image_stats
+
+
+def write(tmp_path, data, name="image.fits"):
+    filename = str(tmp_path / name)
+    fits.PrimaryHDU(data).writeto(filename, overwrite=True)
+    return filename
+
+
+def rank(data, value):
+    # The percentile that a value is at in some data.
+    values = data[np.isfinite(data)]
+    return 100 * np.mean(values <= value)
+
+
+@pytest.fixture
+def small(tmp_path):
+    data = np.random.default_rng(0).normal(size=(50, 40)).astype(np.float32)
+    data[3, :5] = np.nan
+    return write(tmp_path, data), data
+
+
+def test_small_images_are_exact(small):
+    filename, data = small
+    result = get_image_stats(filename, percentiles=(1, 50, 99))
+
+    assert result.data_min == np.nanmin(data)
+    assert result.data_max == np.nanmax(data)
+    np.testing.assert_allclose(
+        result.percentiles, np.nanpercentile(data, (1, 50, 99)), rtol=1e-6
+    )
+
+
+def test_structured_images_are_sampled_fairly(tmp_path, monkeypatch):
+    # Alternating columns from two distributions, and a bad column every 97:
+    # a sample of every other pixel would only ever see one kind of column.
+    monkeypatch.setattr(stats, "CHUNK_SIZE", 1 << 20)
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(1000, 400)).astype(np.float32)
+    data[:, 1::2] += 10
+    data[:, ::97] = 1000
+    data[::50, 3] = np.nan
+    filename = write(tmp_path, data)
+
+    percentiles = (0.5, 25, 50, 75, 99.5)
+    rank_error = 0.01
+    result = get_image_stats(filename, percentiles, rank_error=rank_error)
+
+    assert result.data_min == np.nanmin(data)
+    assert result.data_max == np.nanmax(data)
+    for percentile, value in zip(percentiles, result.percentiles):
+        assert abs(rank(data, value) - percentile) < 100 * rank_error
+    assert result.percentiles[-1] == 1000
+    assert 0 < result.percentiles[2] < 10
+
+
+def test_sample_is_reproducible(tmp_path):
+    data = np.random.default_rng(2).normal(size=(300, 300))
+    first = write(tmp_path, data, "first.fits")
+    second = write(tmp_path, data, "second.fits")
+
+    assert get_image_stats(first, rank_error=0.01) == get_image_stats(
+        second, rank_error=0.01
+    )
+
+
+def test_blank_images(tmp_path):
+    filename = write(tmp_path, np.full((10, 10), np.nan))
+    result = get_image_stats(filename)
+
+    assert np.isnan(result.data_min) and np.isnan(result.data_max)
+    assert all(np.isnan(value) for value in result.percentiles)
+
+
+# Cache
+
+
+def test_stats_are_cached(small, monkeypatch):
+    filename, _ = small
+    result = get_image_stats(filename)
+    assert os.path.exists(filename + ".stats.json")
+
+    def fail(*args):
+        raise AssertionError("the statistics were computed again")
+
+    monkeypatch.setattr(stats, "_compute_image_stats", fail)
+    assert get_image_stats(filename) == result
+
+
+def test_cache_is_invalidated_by_changes(small, tmp_path, monkeypatch):
+    filename, data = small
+    get_image_stats(filename)
+
+    calls = []
+    compute = stats._compute_image_stats
+
+    def counting(*args):
+        calls.append(args)
+        return compute(*args)
+
+    monkeypatch.setattr(stats, "_compute_image_stats", counting)
+
+    # Other settings.
+    get_image_stats(filename, percentiles=(1, 99))
+    get_image_stats(filename, percentiles=(1, 99), rank_error=0.01)
+    assert len(calls) == 2
+
+    # New data in the file.
+    write(tmp_path, data * 2)
+    os.utime(filename, ns=(1, 1))
+    result = get_image_stats(filename, percentiles=(1, 99), rank_error=0.01)
+    assert len(calls) == 3
+    assert result.data_max == np.nanmax(data * 2)
+
+
+def test_broken_cache_is_ignored(small):
+    filename, data = small
+    with open(filename + ".stats.json", "w") as f:
+        f.write("{not json")
+
+    assert get_image_stats(filename).data_max == np.nanmax(data)
+    with open(filename + ".stats.json") as f:
+        assert json.load(f)["data_max"] == np.nanmax(data)
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from toasty import TilingMethod
+
+from ipywwt import tiling
+from ipywwt.tiling import TilingProgress
+
+from conftest import events
+
+
+@pytest.fixture
+def fake_tiling(monkeypatch, tmp_path):
+    # Stands in for the worker process, reporting three steps.
+    async def tile_fits_async(fits_list, progress=None, **kwargs):
+        for done in range(1, 4):
+            progress(TilingProgress(stage=1, done=done, total=3))
+            await asyncio.sleep(0)
+        imgset = SimpleNamespace(
+            name="image",
+            url="{1}/{3}/{3}_{2}.fits",
+            pixel_cut_low=0,
+            pixel_cut_high=0,
+            data_min=0,
+            data_max=0,
+        )
+        return kwargs["out_dir"], imgset
+
+    monkeypatch.setattr(tiling, "tile_fits_async", tile_fits_async)
+    return str(tmp_path)
+
+
+def add_image_layer(widget, out_dir, **kwargs):
+    coroutine = widget.layers.add_image_layer_async(
+        "image.fits", tiling_method=TilingMethod.TAN, out_dir=out_dir, **kwargs
+    )
+    return asyncio.run(coroutine)
+
+
+def progress_sent(sent):
+    return [
+        content
+        for content, _ in sent
+        for content in content.get("messages", [content])
+        if content["event"] == "tiling_progress"
+    ]
+
+
+def test_progress_is_sent_to_the_frontend(wwt, sent, fake_tiling):
+    wwt.message_rate = 0
+    reports = []
+    add_image_layer(wwt, fake_tiling, name="M31", progress=reports.append)
+
+    assert [report.done for report in reports] == [1, 2, 3]
+    messages = progress_sent(sent)
+    assert [(msg["done"], msg["total"]) for msg in messages[:-1]] == [
+        (1, 3),
+        (2, 3),
+        (3, 3),
+    ]
+    assert [msg["finished"] for msg in messages] == [False, False, False, True]
+    assert {msg["id"] for msg in messages} == {messages[0]["id"]}
+    assert {msg["name"] for msg in messages} == {"M31"}
+    # The job ends before the layer is added.
+    assert events(sent).index("load_image_collection") > events(sent).index(
+        "tiling_progress"
+    )
+
+
+def test_progress_is_coalesced(wwt, sent, fake_tiling):
+    add_image_layer(wwt, fake_tiling)
+
+    messages = progress_sent(sent)
+    assert messages[0]["done"] == 1
+    assert messages[-1]["finished"]
+    assert len(messages) < 4
+
+
+def test_older_frontends_get_no_progress(legacy_wwt, sent, fake_tiling):
+    add_image_layer(legacy_wwt, fake_tiling)
+
+    assert progress_sent(sent) == []
+    assert "load_image_collection" in events(sent)
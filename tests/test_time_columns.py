@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+from astropy.table import Table
+from astropy.time import Time
+
+from ipywwt import layers
+from ipywwt.layers import TIME_COLUMN_NAME, TIME_SAMPLE_SIZE
+from ipywwt.utils import ensure_utc_column
+
+
+def table_with_times(times):
+    n = len(times)
+    return Table({"ra": np.arange(n, dtype=float), "dec": np.zeros(n), "t": times})
+
+
+@pytest.mark.parametrize(
+    "times",
+    [
+        ["2020-01-01T00:00:00", "2020-01-02T12:00:00"],
+        np.array(["2020-01-01T00:00", "2020-01-02T12:00"], dtype="datetime64"),
+        np.array([datetime(2020, 1, 1), datetime(2020, 1, 2, 12)], dtype=object),
+        Time(["2020-01-01T00:00:00", "2020-01-02T12:00:00"]),
+    ],
+)
+def test_time_columns_are_converted_to_utc(wwt, times):
+    table = table_with_times(times)
+    layer = wwt.layers.add_table_layer(table, time_att="t", time_series=True)
+    assert layer.table[TIME_COLUMN_NAME].tolist() == [
+        "2020-01-01T00:00:00.000000+00:00",
+        "2020-01-02T12:00:00.000000+00:00",
+    ]
+
+
+@pytest.mark.parametrize(
+    "times, message",
+    [
+        (np.arange(3.0), "A time column"),
+        (["2020-01-01", "noon", "2020-01-03"], "ISOT"),
+        (np.array([datetime(2020, 1, 1), 3], dtype=object), "A time column"),
+    ],
+)
+def test_invalid_time_columns_are_rejected(wwt, sent, times, message):
+    with pytest.raises(ValueError, match=message):
+        table = table_with_times(times)
+        wwt.layers.add_table_layer(table, time_att="t", time_series=True)
+    assert sent == []
+
+
+def test_only_a_sample_is_checked(wwt, monkeypatch):
+    n = 10 * TIME_SAMPLE_SIZE
+    table = table_with_times(["2020-01-01T00:00:00"] * n)
+    layer = wwt.layers.add_table_layer(table, time_series=True)
+
+    sizes = []
+
+    def counting(times):
+        sizes.append(len(times))
+        return ensure_utc_column(times)
+
+    monkeypatch.setattr(layers, "ensure_utc_column", counting)
+    layer.time_att = "t"
+
+    # The sample, then the single conversion of the whole column.
+    assert sizes == [TIME_SAMPLE_SIZE, n]
+
+
+def test_invalid_values_past_the_sample_fail_the_conversion(wwt, sent):
+    times = ["2020-01-01T00:00:00"] * (2 * TIME_SAMPLE_SIZE) + ["noon"]
+    with pytest.raises(ValueError, match="ISOT"):
+        table = table_with_times(times)
+        wwt.layers.add_table_layer(table, time_att="t", time_series=True)
+    assert sent == []
+    assert len(wwt.layers) == 0
+
+
+@pytest.mark.parametrize("previous", ["", "t0"])
+def test_failed_conversion_restores_previous_column(wwt, sent, previous):
+    n = 2 * TIME_SAMPLE_SIZE
+    table = table_with_times(["2020-01-01T00:00:00"] * n)
+    table["t0"] = ["2021-06-01T00:00:00"] * n
+    table["t"][TIME_SAMPLE_SIZE + 1] = "noon"
+
+    layer = wwt.layers.add_table_layer(table, time_att=previous, time_series=True)
+    before = layer.table[TIME_COLUMN_NAME].tolist() if previous else None
+    sent.clear()
+
+    with pytest.raises(ValueError, match="ISOT"):
+        layer.time_att = "t"
+
+    assert layer.time_att == previous
+    if previous:
+        assert layer.table[TIME_COLUMN_NAME].tolist() == before
+    else:
+        assert TIME_COLUMN_NAME not in layer.table.colnames
+
+    # WWT is pointed back at the previous column, if any.
+    settings = [
+        msg["value"]
+        for content, _ in sent
+        for msg in content.get("messages", [content])
+        if msg.get("setting") == "startDateColumn"
+    ]
+    assert settings[-1] == (TIME_COLUMN_NAME if previous else -1)
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ipywwt import upload as upload_module
+from ipywwt.upload import TIMEOUT_SLACK, Upload, message_size
+
+CONTENT = {"event": "table_layer_create_binary", "id": "layer", "columns": ["ra"]}
+
+# Buffers of all sizes, including an empty one, and one that isn't bytes.
+BUFFERS = [b"abc", b"", bytes(range(10)), np.arange(5, dtype=np.int16)]
+
+
+class FakeComm:
+    """
+    Records what an upload sends, and reassembles the bytes of its chunks.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, content, buffers):
+        self.messages.append((content, buffers))
+
+    def chunks(self):
+        return [
+            (content, buffers)
+            for content, buffers in self.messages
+            if content["event"] == "upload_chunk"
+        ]
+
+    def seqs(self):
+        return [content["seq"] for content, _ in self.chunks()]
+
+    def reassemble(self):
+        data = bytearray()
+        for content, buffers in self.chunks():
+            assert content["offset"] == len(data)
+            for view in buffers:
+                data += bytes(view)
+        return bytes(data)
+
+
+def expected_bytes(content=CONTENT, buffers=BUFFERS):
+    header = json.dumps(content).encode("utf-8")
+    return header + b"".join(memoryview(buffer).cast("B") for buffer in buffers)
+
+
+def new_upload(comm, content=CONTENT, buffers=BUFFERS, **kwargs):
+    upload = Upload(comm.send, content, buffers, **kwargs)
+    upload.start()
+    return upload
+
+
+def acknowledge_all(upload, comm):
+    # Acknowledge chunks as they are sent, until there are no more.
+    acknowledged = set()
+    while not upload.done:
+        seq = min(set(comm.seqs()) - acknowledged)
+        acknowledged.add(seq)
+        upload.acknowledge(seq)
+
+
+@pytest.fixture
+def comm():
+    return FakeComm()
+
+
+# Chunks
+
+
+def test_start_message(comm):
+    upload = new_upload(comm, chunk_size=1000)
+
+    content, buffers = comm.messages[0]
+    header = json.dumps(CONTENT).encode("utf-8")
+    assert content["event"] == "upload_start"
+    assert content["id"] == upload.id
+    assert content["header_size"] == len(header)
+    assert content["buffer_sizes"] == [3, 0, 10, 10]
+    assert content["size"] == upload.size == len(expected_bytes())
+    assert buffers is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 13, 50, 1000])
+def test_chunks_reassemble_to_message(comm, chunk_size):
+    upload = new_upload(comm, chunk_size=chunk_size, window=3)
+    acknowledge_all(upload, comm)
+
+    assert comm.reassemble() == expected_bytes()
+    assert comm.seqs() == list(range(len(comm.chunks())))
+    assert upload.done and upload.exception() is None
+
+    sizes = [sum(view.nbytes for view in buffers) for _, buffers in comm.chunks()]
+    assert all(size == chunk_size for size in sizes[:-1])
+    assert 0 < sizes[-1] <= chunk_size
+
+
+def test_chunks_span_parts(comm):
+    header_size = len(json.dumps(CONTENT).encode("utf-8"))
+    # The first chunk ends three bytes into the buffers, after the empty one.
+    new_upload(comm, chunk_size=header_size + 4, window=1)
+
+    _, buffers = comm.chunks()[0]
+    assert [view.nbytes for view in buffers] == [header_size, 3, 1]
+    assert bytes(buffers[2]) == b"\x00"
+
+
+def test_chunks_are_views(comm):
+    buffer = bytearray(100)
+    new_upload(comm, {"event": "x"}, [buffer], chunk_size=40)
+
+    # Changing the buffer changes the chunks already sent: nothing was copied.
+    buffer[-1] = 1
+    assert bytes(comm.chunks()[-1][1][-1])[-1] == 1
+
+
+def test_message_without_buffers(comm):
+    upload = new_upload(comm, {"event": "x", "values": [1, 2]}, None, chunk_size=4)
+    acknowledge_all(upload, comm)
+    assert comm.reassemble() == expected_bytes({"event": "x", "values": [1, 2]}, [])
+
+
+def test_numpy_values_in_content(comm):
+    content = {"event": "x", "value": np.float32(1.5), "values": np.arange(2)}
+    upload = new_upload(comm, content, None, chunk_size=1000)
+    acknowledge_all(upload, comm)
+    assert json.loads(comm.reassemble()) == {
+        "event": "x",
+        "value": 1.5,
+        "values": [0, 1],
+    }
+
+
+def test_message_size():
+    assert message_size({"a": "xyz", "b": [{"c": "de"}, 1]}, [b"1234"]) == 9
+    assert message_size(CONTENT, BUFFERS) <= len(expected_bytes())
+
+
+# Acknowledgements
+
+
+def test_window_limits_chunks_in_flight(comm):
+    upload = new_upload(comm, chunk_size=4, window=3)
+    assert comm.seqs() == [0, 1, 2]
+
+    # Each acknowledgement lets one more chunk go.
+    upload.acknowledge(0)
+    assert comm.seqs() == [0, 1, 2, 3]
+    upload.acknowledge(2)
+    upload.acknowledge(1)
+    assert comm.seqs() == [0, 1, 2, 3, 4, 5]
+
+
+def test_out_of_order_acknowledgements(comm):
+    upload = new_upload(comm, chunk_size=5, window=4)
+    while not upload.done:
+        # Always the latest chunk first.
+        upload.acknowledge(max(upload._in_flight))
+
+    assert comm.reassemble() == expected_bytes()
+
+
+def test_duplicate_and_unknown_acknowledgements(comm):
+    reports = []
+    upload = new_upload(comm, chunk_size=10, window=2, progress=reports.append)
+
+    upload.acknowledge(0)
+    upload.acknowledge(0)
+    upload.acknowledge(1000)
+    upload.acknowledge(None)
+    assert [report.done for report in reports] == [10]
+    assert comm.seqs() == [0, 1, 2]
+
+    acknowledge_all(upload, comm)
+    sent = len(comm.messages)
+    upload.acknowledge(1)
+    assert len(comm.messages) == sent
+
+    done = [report.done for report in reports]
+    assert done == sorted(set(done))
+    assert reports[-1].done == reports[-1].total == upload.size
+    assert reports[-1].fraction == 1
+
+
+# Timeouts
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A clock for the timeouts that only moves when told to.
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        upload_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def test_upload_times_out(comm):
+    async def run():
+        upload = new_upload(comm, chunk_size=5, timeout=0.05)
+        upload.acknowledge(0)
+        with pytest.raises(TimeoutError, match=upload.id):
+            await upload
+        return upload
+
+    upload = asyncio.run(run())
+    assert isinstance(upload.exception(), TimeoutError)
+
+    # Late acknowledgements don't bring it back.
+    upload.acknowledge(1)
+    assert isinstance(upload.exception(), TimeoutError)
+
+
+def test_acknowledgements_push_back_timeout(comm):
+    async def run():
+        upload = new_upload(comm, chunk_size=5, window=1, timeout=0.2)
+        for _ in range(4):
+            await asyncio.sleep(0.1)
+            upload.acknowledge(comm.seqs()[-1])
+        assert not upload.done
+        upload._cancel_timer()
+
+    asyncio.run(run())
+
+
+def test_late_timeout_gives_acknowledgements_a_chance(comm, clock):
+    async def run():
+        upload = new_upload(comm, chunk_size=5, timeout=10)
+        deadline = upload._deadline
+
+        # The timer fired long after it should have: the kernel was busy.
+        clock.now = deadline + TIMEOUT_SLACK + 1
+        upload._expire()
+        assert not upload.done
+        assert upload._deadline == clock.now + 10
+
+        # On time, with nothing acknowledged.
+        clock.now = upload._deadline + TIMEOUT_SLACK / 2
+        upload._expire()
+        assert isinstance(upload.exception(), TimeoutError)
+
+    asyncio.run(run())
+
+
+def test_no_timeout_without_event_loop(comm):
+    upload = new_upload(comm, chunk_size=5, timeout=0.01)
+    assert upload._timer is None
+    acknowledge_all(upload, comm)
+    assert upload.exception() is None
+
+
+# Widget
+
+
+def ack(wwt, content):
+    wwt._on_app_message_received(
+        wwt, {"type": "wwt_upload_ack", "id": content["id"], "seq": content["seq"]}
+    )
+
+
+def upload_chunks(sent):
+    return [content for content, _ in sent if content["event"] == "upload_chunk"]
+
+
+@pytest.fixture
+def chunked(wwt, sent):
+    wwt.upload_chunk_size = 64
+    wwt.upload_window = 2
+    return wwt
+
+
+def test_large_messages_are_uploaded(chunked, sent):
+    reports = []
+    chunked.set_upload_progress_callback(lambda widget, report: reports.append(report))
+    chunked._send_msg(event="table_layer_remove", id="x" * 200)
+
+    assert [content["event"] for content, _ in sent] == [
+        "upload_start",
+        "upload_chunk",
+        "upload_chunk",
+    ]
+    (upload,) = chunked._uploads.values()
+
+    acknowledged = set()
+    while not upload.done:
+        chunks = upload_chunks(sent)
+        content = next(c for c in chunks if c["seq"] not in acknowledged)
+        acknowledged.add(content["seq"])
+        ack(chunked, content)
+
+    assert upload.done and chunked._uploads == {}
+    assert reports[-1].fraction == 1
+    asyncio.run(chunked.wait_for_uploads())
+
+
+def test_small_messages_are_not_uploaded(chunked, sent):
+    chunked._send_msg(event="table_layer_remove", id="x")
+    assert [content["event"] for content, _ in sent] == ["table_layer_remove"]
+
+
+def test_failed_upload_is_reported(chunked, sent, caplog):
+    chunked.upload_timeout = 0.05
+
+    async def run():
+        chunked._send_msg(event="table_layer_remove", id="x" * 200)
+        with pytest.raises(TimeoutError):
+            await chunked.wait_for_uploads()
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+
+    assert chunked._uploads == {}
+    assert "could not be sent" in caplog.text
+    # The uploads are forgotten, so there's nothing left to wait for.
+    asyncio.run(chunked.wait_for_uploads())
@@ -0,0 +1,103 @@
+import asyncio
+import math
+
+import pytest
+
+
+def view_state(ra=0.0, dec=0.0, fov=60.0, clock="2020-01-01T00:00:00"):
+    # A wwt_view_state message, as the frontend sends it.
+    return {
+        "type": "wwt_view_state",
+        "raRad": math.radians(ra),
+        "decRad": math.radians(dec),
+        "fovDeg": fov,
+        "rollDeg": 0.0,
+        "engineClockISOT": clock,
+        "systemClockISOT": clock,
+        "engineClockRateFactor": 1.0,
+    }
+
+
+def receive(wwt, payload):
+    wwt._on_app_message_received(wwt, payload)
+
+
+def parses(wwt):
+    # Each parse of a view state records it in the camera history.
+    return len(wwt.camera_history)
+
+
+def test_every_state_is_parsed_by_default(wwt):
+    for fov in range(1, 11):
+        receive(wwt, view_state(fov=fov))
+
+    assert parses(wwt) == 10
+    assert wwt.camera_history.fov.tolist() == list(range(1, 11))
+
+
+def test_burst_is_parsed_once_per_interval(wwt):
+    wwt.view_state_rate = 1
+    for fov in range(1, 51):
+        receive(wwt, view_state(fov=fov))
+
+    # Only the first state of the burst has been parsed.
+    assert parses(wwt) == 1
+    assert wwt.camera_history.fov.tolist() == [1]
+
+
+def test_reading_the_view_parses_latest_state(wwt):
+    wwt.view_state_rate = 1
+    for fov in range(1, 51):
+        receive(wwt, view_state(ra=fov, fov=fov))
+
+    assert wwt.get_fov().value == 50
+    assert parses(wwt) == 2
+
+    # Nothing new to parse.
+    assert wwt.get_center().ra.deg == pytest.approx(50)
+    assert parses(wwt) == 2
+
+
+@pytest.mark.parametrize(
+    "read",
+    [
+        lambda wwt: wwt.get_fov(),
+        lambda wwt: wwt.get_roll(),
+        lambda wwt: wwt.get_center(),
+        lambda wwt: wwt.get_camera_state(),
+        lambda wwt: wwt._engineTime,
+        lambda wwt: wwt._systemTime,
+    ],
+)
+def test_every_reader_parses_pending_state(wwt, read):
+    wwt.view_state_rate = 1
+    receive(wwt, view_state(fov=1))
+    receive(wwt, view_state(fov=2, clock="2021-06-01T12:00:00"))
+
+    read(wwt)
+    assert wwt.camera_history.fov.tolist() == [1, 2]
+    assert wwt._engineTime.isot == "2021-06-01T12:00:00.000"
+
+
+def test_last_state_of_a_burst_is_parsed_later(wwt):
+    wwt.view_state_rate = 20
+
+    async def burst():
+        for fov in range(1, 11):
+            receive(wwt, view_state(fov=fov))
+        assert parses(wwt) == 1
+        await asyncio.sleep(3 / wwt.view_state_rate)
+
+    asyncio.run(burst())
+
+    assert wwt.camera_history.fov.tolist() == [1, 10]
+
+
+def test_invalid_state_is_ignored(wwt):
+    receive(wwt, view_state(fov=5))
+    payload = view_state(fov=10)
+    payload["fovDeg"] = "wide"
+    receive(wwt, payload)
+
+    assert wwt.get_fov().value == 5
+    assert parses(wwt) == 1